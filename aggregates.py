@@ -0,0 +1,325 @@
+"""
+Precomputed aggregate cube over scraped job records for charts and summaries
+"""
+
+import csv
+import json
+import os
+from itertools import repeat
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from normalize import (parse_az_date, parse_az_date_column, parse_int, parse_salary,
+                       parse_salary_column)
+
+AGGREGATES_FILE = "vipkadr_aggregates.json"
+
+# Bumped whenever record_contribution changes, so saved cubes are rebuilt
+CUBE_VERSION = 2
+# Categorical dimensions the cube is keyed by; "month" is the added date as YYYY-MM
+DIMENSIONS = ('company', 'title', 'experience', 'work_type', 'gender', 'month')
+# Numeric fields kept as exact value -> count maps, so histograms and medians stay exact
+VALUE_FIELDS = ('salary', 'views', 'duration', 'added')
+
+
+def parse_columns(records: List[Dict]) -> Optional[List[Dict]]:
+    """Salary midpoint and dates of many records, parsed column-wise
+
+    Uses the vectorized parsers from normalize.py and returns one
+    ``{'salary', 'added', 'end'}`` dict per record, or None when pandas is
+    not installed, in which case records are parsed one at a time.
+    """
+    try:
+        import pandas as pd
+    except ImportError:
+        return None
+    
+    frame = pd.DataFrame.from_records(records, columns=['salary', 'added_date', 'end_date'])
+    salary = parse_salary_column(frame['salary'])['salary_mid']
+    added = parse_az_date_column(frame['added_date'])
+    end = parse_az_date_column(frame['end_date'])
+    return [
+        {
+            'salary': None if pd.isna(mid) else float(mid),
+            'added': None if pd.isna(start) else start.date(),
+            'end': None if pd.isna(stop) else stop.date(),
+        }
+        for mid, start, stop in zip(salary, added, end)
+    ]
+
+
+def record_contribution(record: Dict, parsed: Optional[Dict] = None) -> Dict:
+    """The part of a record the cube aggregates over
+
+    ``parsed`` holds the record's salary and dates when they were already
+    parsed column-wise (see ``parse_columns``).
+    """
+    if parsed is None:
+        parsed = {
+            'salary': parse_salary(record.get('salary'))['salary_mid'],
+            'added': parse_az_date(record.get('added_date')),
+            'end': parse_az_date(record.get('end_date')),
+        }
+    added, end = parsed['added'], parsed['end']
+    dims = {dim: (record.get(dim) or '').strip() or None for dim in DIMENSIONS if dim != 'month'}
+    # Title variants roll up under their canonical title (see titles.py)
+    dims['title'] = (record.get('title_canonical') or '').strip() or dims['title']
+    dims['month'] = added.strftime('%Y-%m') if added else None
+    return {
+        'dims': dims,
+        'salary': parsed['salary'],
+        'views': parse_int(record.get('views')),
+        'duration': (end - added).days if added and end else None,
+        'added': added.isoformat() if added else None,
+    }
+
+
+def _bump(counter: Dict, key, amount):
+    value = counter.get(key, 0) + amount
+    if value:
+        counter[key] = value
+    else:
+        counter.pop(key, None)
+
+
+def _weighted_median(items: List[Tuple[float, int]]) -> Optional[float]:
+    """Median of sorted (value, count) pairs, averaging the middle two like pandas"""
+    total = sum(count for _, count in items)
+    if not total:
+        return None
+    
+    lower, upper = (total - 1) // 2, total // 2
+    low = high = None
+    seen = 0
+    for value, count in items:
+        if low is None and seen + count > lower:
+            low = value
+        if seen + count > upper:
+            high = value
+            break
+        seen += count
+    return (low + high) / 2
+
+
+class AggregateCube:
+    """Counts, salary sums and value histograms, updated one record at a time
+
+    Every record's contribution is remembered by URL, so adding a record
+    that is already in the cube first retracts its old contribution. The
+    cube therefore always reflects the latest version of each posting, and
+    reading it costs time proportional to the number of groups, not the
+    number of postings. The cube can be used directly as a scraper writer.
+
+    With ``collapse_duplicates`` (the default), records whose
+    ``duplicate_of`` field is set are reposts of another posting (see
+    dedup.py) and are tracked in ``duplicates`` instead of being counted.
+    """
+    
+    def __init__(self, collapse_duplicates: bool = True):
+        self.collapse_duplicates = collapse_duplicates
+        self.duplicates: Dict[str, str] = {}
+        self.total = 0
+        self.counts: Dict[str, Dict[str, int]] = {dim: {} for dim in DIMENSIONS}
+        self.salary_sum: Dict[str, Dict[str, float]] = {dim: {} for dim in DIMENSIONS}
+        self.salary_count: Dict[str, Dict[str, int]] = {dim: {} for dim in DIMENSIONS}
+        self.values: Dict[str, Dict[str, int]] = {field: {} for field in VALUE_FIELDS}
+        self.salary_views: Dict[str, int] = {}
+        self.records: Dict[str, Dict] = {}
+        self.source_mtime: Optional[float] = None
+    
+    def _apply(self, contribution: Dict, sign: int):
+        self.total += sign
+        salary = contribution['salary']
+        for dim, value in contribution['dims'].items():
+            if value is None:
+                continue
+            _bump(self.counts[dim], value, sign)
+            if salary is not None:
+                _bump(self.salary_sum[dim], value, sign * salary)
+                _bump(self.salary_count[dim], value, sign)
+        
+        for field in VALUE_FIELDS:
+            if contribution[field] is not None:
+                _bump(self.values[field], str(contribution[field]), sign)
+        if salary is not None and contribution['views']:
+            _bump(self.salary_views, f"{salary}|{contribution['views']}", sign)
+    
+    def add(self, record: Dict, parsed: Optional[Dict] = None) -> bool:
+        """Add or replace a record; returns False if it did not change the cube"""
+        key = record.get('url') or str(record.get('job_id'))
+        if self.collapse_duplicates:
+            duplicate_of = record.get('duplicate_of')
+            if duplicate_of:
+                changed = self.duplicates.get(key) != duplicate_of or key in self.records
+                self.duplicates[key] = duplicate_of
+                self.remove(key)
+                return changed
+            self.duplicates.pop(key, None)
+        contribution = record_contribution(record, parsed)
+        previous = self.records.get(key)
+        if previous == contribution:
+            return False
+        if previous is not None:
+            self._apply(previous, -1)
+        self._apply(contribution, 1)
+        self.records[key] = contribution
+        return True
+    
+    write = add
+    
+    def remove(self, key: str):
+        """Retract the record stored under ``key`` (its URL)"""
+        previous = self.records.pop(key, None)
+        if previous is not None:
+            self._apply(previous, -1)
+    
+    def sync(self, records: Iterable[Dict], parsed: Optional[Iterable[Dict]] = None) -> int:
+        """Make the cube match a full snapshot of records
+
+        Records that are unchanged cost a comparison; records missing from
+        the snapshot are retracted. ``parsed`` optionally gives each
+        record's pre-parsed values (see ``parse_columns``). Returns the
+        number of records changed.
+        """
+        seen = set()
+        changed = 0
+        if parsed is None:
+            parsed = repeat(None)
+        for record, values in zip(records, parsed):
+            seen.add(record.get('url') or str(record.get('job_id')))
+            changed += self.add(record, values)
+        for key in [key for key in self.records if key not in seen]:
+            self.remove(key)
+            changed += 1
+        for key in [key for key in self.duplicates if key not in seen]:
+            del self.duplicates[key]
+            changed += 1
+        return changed
+    
+    # Queries
+    
+    def top(self, dim: str, n: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Most frequent values of a dimension, ties broken by value"""
+        ranked = sorted(self.counts[dim].items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:n] if n is not None else ranked
+    
+    def salary_means(self, dim: str, min_count: int = 1) -> List[Tuple[str, float]]:
+        """Average salary per value of a dimension, highest first
+
+        Only values with at least ``min_count`` salaried postings are kept.
+        """
+        means = [
+            (value, self.salary_sum[dim][value] / count)
+            for value, count in self.salary_count[dim].items()
+            if count >= min_count
+        ]
+        return sorted(means, key=lambda item: (-item[1], item[0]))
+    
+    def value_counts(self, field: str) -> List[Tuple[float, int]]:
+        """Sorted (value, count) pairs of a numeric field"""
+        if field == 'added':
+            return sorted(self.values[field].items())
+        return sorted((float(value), count) for value, count in self.values[field].items())
+    
+    def histogram(self, field: str, bins: List[float], above: Optional[float] = None) -> List[int]:
+        """Counts per bin with ``numpy.histogram`` edges: [a, b) and a closed last bin
+
+        With ``above``, only values strictly greater than it are counted.
+        """
+        counts = [0] * (len(bins) - 1)
+        for value, count in self.value_counts(field):
+            if above is not None and value <= above:
+                continue
+            for i in range(len(counts)):
+                last = i == len(counts) - 1
+                if bins[i] <= value < bins[i + 1] or (last and value == bins[-1]):
+                    counts[i] += count
+                    break
+        return counts
+    
+    def stats(self, field: str) -> Dict[str, Optional[float]]:
+        """Count, mean, median, min and max of a numeric field"""
+        items = self.value_counts(field)
+        n = sum(count for _, count in items)
+        if not n:
+            return {'count': 0, 'mean': None, 'median': None, 'min': None, 'max': None}
+        return {
+            'count': n,
+            'mean': sum(value * count for value, count in items) / n,
+            'median': _weighted_median(items),
+            'min': items[0][0],
+            'max': items[-1][0],
+        }
+    
+    def salary_views_pairs(self) -> List[Tuple[float, int, int]]:
+        """(salary, views, count) for postings with a salary and at least one view"""
+        pairs = []
+        for key, count in self.salary_views.items():
+            salary, views = key.split('|')
+            pairs.append((float(salary), int(views), count))
+        return sorted(pairs)
+    
+    # Persistence
+    
+    def to_dict(self) -> Dict:
+        return {
+            'version': CUBE_VERSION,
+            'total': self.total,
+            'counts': self.counts,
+            'salary_sum': self.salary_sum,
+            'salary_count': self.salary_count,
+            'values': self.values,
+            'salary_views': self.salary_views,
+            'records': self.records,
+            'duplicates': self.duplicates,
+            'source_mtime': self.source_mtime,
+        }
+    
+    def save(self, path: str, source: Optional[str] = None):
+        """Write the cube atomically; ``source`` records which file it mirrors"""
+        if source and os.path.exists(source):
+            self.source_mtime = os.path.getmtime(source)
+        part_path = path + '.part'
+        with open(part_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        os.replace(part_path, path)
+    
+    @classmethod
+    def load(cls, path: str, **kwargs) -> 'AggregateCube':
+        """Load a saved cube, or start an empty one if there is none"""
+        cube = cls(**kwargs)
+        if not os.path.exists(path):
+            return cube
+        
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('version') != CUBE_VERSION:
+            return cube
+        cube.total = state['total']
+        cube.counts.update(state['counts'])
+        cube.salary_sum.update(state['salary_sum'])
+        cube.salary_count.update(state['salary_count'])
+        cube.values.update(state['values'])
+        cube.salary_views = state['salary_views']
+        cube.records = state['records']
+        cube.duplicates = state.get('duplicates', {})
+        cube.source_mtime = state.get('source_mtime')
+        return cube
+    
+    @classmethod
+    def for_csv(cls, csv_path: str, cube_path: str,
+                prepare: Optional[Callable[[Dict], Dict]] = None) -> 'AggregateCube':
+        """Load the cube saved for ``csv_path``, syncing it first if the CSV is newer
+
+        ``prepare`` is applied to every CSV row before it is added, e.g. to
+        fill in fields that older scraper output lacks. Salaries and dates
+        are parsed a column at a time when pandas is available.
+        """
+        cube = cls.load(cube_path)
+        if cube.source_mtime is None or os.path.getmtime(csv_path) > cube.source_mtime:
+            with open(csv_path, newline='', encoding='utf-8') as f:
+                rows = list(csv.DictReader(f))
+            if prepare:
+                rows = [prepare(row) for row in rows]
+            cube.sync(rows, parse_columns(rows))
+            cube.save(cube_path, source=csv_path)
+        return cube
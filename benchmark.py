@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end crawl benchmark against a local stand-in vipkadr.az
+
+A small aiohttp server, run in its own process, serves synthetic
+``cv-bazasi/?page=N`` listing pages and detail pages in the real site
+markup, with configurable latency, error rate and 429 responses. The
+benchmark crawls it with ``VipKadrScraper`` for every
+``max_concurrent``/``delay`` combination and reports pages/sec, p50/p99
+request latency and scraper CPU time per page.
+
+Results can be saved as a baseline; later runs fail (exit status 1) when
+any scenario is slower than the baseline by more than the tolerance.
+
+Usage:
+    python benchmark.py                          # default grid, compare to baseline
+    python benchmark.py --concurrency 10 30 --delay 0 0.5
+    python benchmark.py --error-rate 0.02 --throttle-rate 0.02
+    python benchmark.py --save-baseline
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from html import escape
+from typing import Dict, List, NamedTuple, Optional
+
+from aiohttp import web
+
+from metrics import LATENCY_BUCKETS, Histogram
+from vipkadr_scraper import VipKadrScraper
+
+BASELINE_FILE = "benchmark_baseline.json"
+
+_TITLES = ['Satış meneceri', 'Mühasib', 'Ofis meneceri', 'Sürücü', 'Kassir',
+           'Proqramçı', 'Dizayner', 'Aşpaz', 'Operator', 'Anbardar']
+_COMPANIES = ['İnfo Center', 'Baku Trade', 'Xəzər MMC', 'Global Logistics', 'Araz Market']
+_CITIES = ['Bakı', 'Sumqayıt', 'Gəncə']
+_MONTHS = ['Yan', 'Fev', 'Mar', 'Apr', 'May', 'İyn', 'İyl', 'Avq', 'Sen', 'Okt', 'Noy', 'Dek']
+
+
+class ServerConfig(NamedTuple):
+    pages: int = 20
+    jobs_per_page: int = 20
+    latency: float = 0.02
+    jitter: float = 0.01
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after: int = 1
+    seed: int = 1
+
+
+# ----------------------------------------------------------------------------
+# Synthetic site
+# ----------------------------------------------------------------------------
+
+def synthetic_job(job_id: int) -> Dict:
+    """Deterministic posting for a job id"""
+    rng = random.Random(job_id)
+    title = rng.choice(_TITLES)
+    day = rng.randint(1, 28)
+    month = rng.randrange(12)
+    sentences = ' '.join(
+        f"- {rng.choice(_TITLES)} vəzifəsi üzrə tapşırıqların icrası {rng.randint(1, 99)}."
+        for _ in range(rng.randint(3, 12))
+    )
+    return {
+        'job_id': str(job_id),
+        'slug': f"vakansiya-az-{job_id}",
+        'title': title.upper(),
+        'salary': f"{rng.randrange(400, 3000, 50)} AZN",
+        'company': rng.choice(_COMPANIES),
+        'contact_person': f"Əlaqə {job_id}",
+        'phone': f"050{job_id:07d}",
+        'email': f"hr{job_id}@example.az",
+        'city': rng.choice(_CITIES),
+        'work_type': 'Tam iş günü',
+        'experience': '1 ildən 3 ilə qədər',
+        'gender': 'Fərq etmir',
+        'age': '20 - 45',
+        'description': sentences,
+        'requirements': '- Məsuliyyətli olmaq- Komanda ilə işləmək bacarığı',
+        'added_date': f"{day:02d} {_MONTHS[month]} 2024",
+        'end_date': f"{day:02d} {_MONTHS[(month + 1) % 12]} 2024",
+        'views': str(rng.randint(0, 2000)),
+    }
+
+
+def render_listing(page_num: int, config: ServerConfig) -> str:
+    """Listing page with ``ty-column5`` items and a pagination window"""
+    items = []
+    if page_num <= config.pages:
+        first = (page_num - 1) * config.jobs_per_page + 1
+        for job_id in range(first, first + config.jobs_per_page):
+            items.append(
+                f"<div class=\"ty-column5\" onclick=\"window.open('/vakansiya-az-{job_id}/')\">"
+                f"<div class=\"ty-grid-list__item\">Vakansiya {job_id}</div></div>"
+            )
+    window = range(max(1, page_num - 2), min(config.pages, page_num + 5) + 1)
+    pagination = ''.join(
+        f'<a data-ca-page="{n}" href="/cv-bazasi/?page={n}" class="ty-pagination__item">{n}</a>'
+        for n in window
+    )
+    return (
+        "<html><head><title>CV bazası</title></head><body>"
+        f"<div class=\"grid-list\">{''.join(items)}</div>"
+        f"<div class=\"ty-pagination\">{pagination}</div>"
+        "</body></html>"
+    )
+
+
+def _feature(label: str, value: str) -> str:
+    return (
+        '<div class="ty-product-feature">'
+        f'<span class="ty-product-feature__label">{label}:</span>'
+        f'<div class="ty-product-feature__value">{value}</div></div>'
+    )
+
+
+def render_detail(job: Dict) -> str:
+    """Detail page in the markup ``parsers.parse_job_details`` reads"""
+    e = {key: escape(value) for key, value in job.items()}
+    features = ''.join([
+        _feature('Maaş', e['salary']),
+        _feature('Əlaqədar şəxs', e['contact_person']),
+        _feature('Telefon', f'<a href="tel:{e["phone"]}">{e["phone"]}</a>'),
+        _feature('Email', f'<a href="mailto:{e["email"]}">{e["email"]}</a>'),
+        _feature('Əlavə olunma tarixi', e['added_date']),
+        _feature('Bitmə tarixi', e['end_date']),
+        _feature('İş vaxtı', e['work_type']),
+        _feature('Şəhər', e['city']),
+        _feature('İş təcrübəsi', e['experience']),
+        _feature('Cins', e['gender']),
+        _feature('Yaş', e['age']),
+    ])
+    # Real pages carry a lot of layout around the fields we read
+    filler = '<div class="ty-footer-menu"><ul>' + '<li><a href="#">Keçid</a></li>' * 400 + '</ul></div>'
+    return (
+        f"<html><head><title>{e['title']}</title></head><body>"
+        f"<h3 class=\"fpname\">{e['title']}</h3>"
+        f"<div class=\"view_count\">Elan #{e['job_id']} | Baxış sayı: {e['views']}</div>"
+        f"<div class=\"view_count\" style=\"margin-top: 10px\">Şirkət : {e['company']}</div>"
+        f"<div class=\"ty-product-features\">{features}</div>"
+        f"<div class=\"descriptions\"><div>{e['description']}</div>"
+        f"<h3>Tələblər</h3><div>{e['requirements']}</div></div>"
+        f"{filler}</body></html>"
+    )
+
+
+def make_app(config: ServerConfig) -> web.Application:
+    """aiohttp application imitating vipkadr.az, with injected latency and failures"""
+    rng = random.Random(config.seed)
+    total_jobs = config.pages * config.jobs_per_page
+    
+    async def misbehave() -> Optional[web.Response]:
+        await asyncio.sleep(max(0.0, config.latency + rng.uniform(-config.jitter, config.jitter)))
+        roll = rng.random()
+        if roll < config.throttle_rate:
+            return web.Response(status=429, headers={'Retry-After': str(config.retry_after)})
+        if roll < config.throttle_rate + config.error_rate:
+            return web.Response(status=503)
+        return None
+    
+    async def listing(request):
+        failure = await misbehave()
+        if failure is not None:
+            return failure
+        page_num = int(request.query.get('page', '1'))
+        return web.Response(text=render_listing(page_num, config), content_type='text/html')
+    
+    async def detail(request):
+        failure = await misbehave()
+        if failure is not None:
+            return failure
+        job_id = int(request.match_info['job_id'])
+        if not 1 <= job_id <= total_jobs:
+            raise web.HTTPNotFound()
+        return web.Response(text=render_detail(synthetic_job(job_id)), content_type='text/html')
+    
+    app = web.Application()
+    app.router.add_get('/cv-bazasi/', listing)
+    app.router.add_get('/vakansiya-az-{job_id:\\d+}/', detail)
+    return app
+
+
+def _serve(config: ServerConfig, port_queue):
+    async def run():
+        runner = web.AppRunner(make_app(config), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port_queue.put(runner.addresses[0][1])
+        await asyncio.Event().wait()
+    
+    asyncio.run(run())
+
+
+class StandInServer:
+    """The synthetic site running in a child process
+    
+    A separate process keeps the server's CPU time out of the scraper's
+    measurements.
+    """
+    
+    def __init__(self, config: ServerConfig):
+        self.config = config
+        self.process = None
+        self.url = None
+    
+    def __enter__(self):
+        port_queue = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=_serve, args=(self.config, port_queue), daemon=True)
+        self.process.start()
+        self.url = f"http://127.0.0.1:{port_queue.get(timeout=30)}"
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.process.terminate()
+        self.process.join()
+
+
+# ----------------------------------------------------------------------------
+# Benchmark
+# ----------------------------------------------------------------------------
+
+def scenario_name(max_concurrent: int, delay: float) -> str:
+    return f"c{max_concurrent}-d{delay:g}"
+
+
+def _merged_latency(histograms: Dict[str, Histogram]) -> Histogram:
+    merged = Histogram(LATENCY_BUCKETS)
+    for histogram in histograms.values():
+        merged.counts = [a + b for a, b in zip(merged.counts, histogram.counts)]
+        merged.count += histogram.count
+        merged.sum += histogram.sum
+    return merged
+
+
+async def run_scenario(base_url: str, config: ServerConfig, max_concurrent: int, delay: float,
+                       parser: str = 'bs4', stream_details: bool = False) -> Dict:
+    """Crawl the stand-in site once and summarise throughput, latency and CPU"""
+    async with VipKadrScraper(max_concurrent=max_concurrent, delay=delay, parser=parser,
+                              base_url=base_url, stream_details=stream_details) as scraper:
+        cpu_started = time.process_time()
+        started = time.perf_counter()
+        await scraper.scrape_pipelined(start_page=1)
+        elapsed = time.perf_counter() - started
+        cpu = time.process_time() - cpu_started
+    
+    metrics = scraper.metrics
+    pages = sum(count for (_, status), count in metrics.status_counts.items() if status == '200')
+    latency = _merged_latency(metrics.latency)
+    return {
+        'max_concurrent': max_concurrent,
+        'delay': delay,
+        'requests': sum(metrics.status_counts.values()),
+        'pages': pages,
+        'records': scraper.records_scraped,
+        'expected_records': config.pages * config.jobs_per_page,
+        'retries': metrics.retries,
+        'kb_per_page': round(sum(metrics.bytes_downloaded.values()) / pages / 1024, 2) if pages else 0.0,
+        'seconds': round(elapsed, 3),
+        'pages_per_sec': round(pages / elapsed, 2) if elapsed else 0.0,
+        'p50_latency': round(latency.quantile(0.5) or 0.0, 4),
+        'p99_latency': round(latency.quantile(0.99) or 0.0, 4),
+        'cpu_ms_per_page': round(cpu / pages * 1000, 3) if pages else 0.0,
+    }
+
+
+def run_benchmark(config: ServerConfig, concurrency: List[int], delays: List[float],
+                  parser: str = 'bs4', repeat: int = 1, stream_details: bool = False) -> Dict[str, Dict]:
+    """Run every scenario against a fresh stand-in server, keeping the best of ``repeat`` runs"""
+    results = {}
+    for max_concurrent in concurrency:
+        for delay in delays:
+            name = scenario_name(max_concurrent, delay)
+            runs = []
+            for _ in range(repeat):
+                # A new server per run replays the same failure sequence
+                with StandInServer(config) as server:
+                    scenario = run_scenario(server.url, config, max_concurrent, delay, parser, stream_details)
+                    runs.append(asyncio.run(scenario))
+            results[name] = max(runs, key=lambda run: run['pages_per_sec'])
+    return results
+
+
+# Metric -> whether higher is better
+CHECKED_METRICS = {
+    'pages_per_sec': True,
+    'p99_latency': False,
+    'cpu_ms_per_page': False,
+}
+
+
+def find_regressions(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    """Describe every metric that is worse than its baseline by more than ``tolerance``"""
+    regressions = []
+    for name, result in results.items():
+        if result['records'] < result['expected_records']:
+            regressions.append(f"{name}: scraped {result['records']} of {result['expected_records']} postings")
+        
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        for metric, higher_is_better in CHECKED_METRICS.items():
+            old, new = expected.get(metric), result[metric]
+            if not old:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{name}: {metric} {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def print_results(results: Dict[str, Dict]):
+    print(f"{'scenario':<12} {'pages/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'cpu ms/page':>12} "
+          f"{'KB/page':>8} {'records':>9} {'retries':>8}")
+    for name, r in results.items():
+        print(f"{name:<12} {r['pages_per_sec']:>9.1f} {r['p50_latency'] * 1000:>8.1f} "
+              f"{r['p99_latency'] * 1000:>8.1f} {r['cpu_ms_per_page']:>12.2f} {r['kb_per_page']:>8.1f} "
+              f"{r['records']:>4}/{r['expected_records']:<4} {r['retries']:>8}")
+
+
+def main():
+    defaults = ServerConfig()
+    parser = argparse.ArgumentParser(description="Benchmark VipKadrScraper against a local stand-in site")
+    parser.add_argument("--concurrency", type=int, nargs='+', default=[5, 15, 30], metavar="N",
+                        help="max_concurrent values to try (default: 5 15 30)")
+    parser.add_argument("--delay", type=float, nargs='+', default=[0.0, 0.5], metavar="SECONDS",
+                        help="delay values to try (default: 0 0.5)")
+    parser.add_argument("--parser", default='bs4', help="Parser engine (default: bs4)")
+    parser.add_argument("--stream-details", action="store_true",
+                        help="Stop reading detail pages once every field has been received")
+    parser.add_argument("--pages", type=int, default=defaults.pages, help="Listing pages on the site")
+    parser.add_argument("--jobs-per-page", type=int, default=defaults.jobs_per_page)
+    parser.add_argument("--latency", type=float, default=defaults.latency, metavar="SECONDS",
+                        help="Server response latency")
+    parser.add_argument("--jitter", type=float, default=defaults.jitter, metavar="SECONDS")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 503 responses")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of 429 responses")
+    parser.add_argument("--retry-after", type=int, default=defaults.retry_after, metavar="SECONDS",
+                        help="Retry-After sent with 429 responses")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per scenario, best one kept")
+    parser.add_argument("--baseline", default=BASELINE_FILE, metavar="PATH",
+                        help=f"Baseline results (default: {BASELINE_FILE})")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed relative regression before failing (default: 0.2)")
+    parser.add_argument("--output", metavar="PATH", help="Also write the results as JSON")
+    args = parser.parse_args()
+    
+    config = ServerConfig(pages=args.pages, jobs_per_page=args.jobs_per_page, latency=args.latency,
+                          jitter=args.jitter, error_rate=args.error_rate,
+                          throttle_rate=args.throttle_rate, retry_after=args.retry_after)
+    results = run_benchmark(config, args.concurrency, args.delay, args.parser, args.repeat,
+                            args.stream_details)
+    print_results(results)
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+    
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    regressions = find_regressions(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
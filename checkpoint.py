@@ -0,0 +1,104 @@
+"""
+Crawl checkpoints so an interrupted crawl can resume where it stopped
+"""
+
+import json
+import os
+import time
+from typing import Callable, Dict, Optional, Set
+
+
+class CrawlCheckpoint:
+    """Crawl state saved to a JSON file at regular intervals
+
+    Tracks the listing pages already read, the detail URL frontier (found
+    but not finished), completed URLs and failed URLs with their attempt
+    counts. Saves are atomic (write to a temporary file, then rename), so a
+    crash leaves either the previous or the new state on disk.
+    """
+    
+    def __init__(self, path: str, interval: float = 30.0, max_attempts: int = 3):
+        self.path = path
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.start_page: Optional[int] = None
+        self.end_page: Optional[int] = None
+        self.pages_done: Set[int] = set()
+        self.frontier: Set[str] = set()
+        self.completed: Set[str] = set()
+        self.failed: Dict[str, int] = {}
+        self.last_saved = time.monotonic()
+    
+    @classmethod
+    def load(cls, path: str, **kwargs) -> 'CrawlCheckpoint':
+        """Load a saved checkpoint, or start an empty one if there is none"""
+        checkpoint = cls(path, **kwargs)
+        if not os.path.exists(path):
+            return checkpoint
+        
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+        checkpoint.start_page = state.get('start_page')
+        checkpoint.end_page = state.get('end_page')
+        checkpoint.pages_done = set(state.get('pages_done', []))
+        checkpoint.frontier = set(state.get('frontier', []))
+        checkpoint.completed = set(state.get('completed', []))
+        checkpoint.failed = dict(state.get('failed', {}))
+        return checkpoint
+    
+    def pending_urls(self):
+        """Frontier URLs that should still be fetched"""
+        return [
+            url for url in sorted(self.frontier)
+            if url not in self.completed and self.failed.get(url, 0) < self.max_attempts
+        ]
+    
+    def add(self, url: str):
+        self.frontier.add(url)
+    
+    def complete(self, url: str):
+        self.completed.add(url)
+        self.frontier.discard(url)
+        self.failed.pop(url, None)
+    
+    def fail(self, url: str):
+        self.failed[url] = self.failed.get(url, 0) + 1
+    
+    def page_done(self, page_num: int):
+        self.pages_done.add(page_num)
+    
+    def maybe_save(self, before_save: Optional[Callable[[], None]] = None):
+        """Save if ``interval`` seconds have passed since the last save"""
+        if time.monotonic() - self.last_saved >= self.interval:
+            self.save(before_save)
+    
+    def save(self, before_save: Optional[Callable[[], None]] = None):
+        """Write the state to disk atomically
+
+        ``before_save`` runs first; the scraper uses it to flush its output
+        writers so every URL marked completed is already on disk.
+        """
+        if before_save:
+            before_save()
+        
+        state = {
+            'start_page': self.start_page,
+            'end_page': self.end_page,
+            'pages_done': sorted(self.pages_done),
+            'frontier': sorted(self.frontier),
+            'completed': sorted(self.completed),
+            'failed': self.failed,
+            'saved_at': time.time(),
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.last_saved = time.monotonic()
+    
+    def clear(self):
+        """Remove the checkpoint file once the crawl has finished"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Dead-letter queue for URLs the scraper gave up on
+
+When ``fetch_page`` runs out of retries, or gets a response that is not
+worth retrying, the URL is kept here with its last status and error
+instead of disappearing from the run. The queue can be drained on its own
+later, without repeating a full crawl; recovered postings are annotated
+and appended to the regular outputs, and the aggregates, search index and
+Parquet file are brought up to date as after a crawl.
+
+    python dead_letter.py list
+    python dead_letter.py drain [--all]
+    python dead_letter.py clear [--permanent]
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+from aggregates import AGGREGATES_FILE, AggregateCube
+from dedup import DEDUP_FILE, DuplicateIndex
+from job_store import JobStore
+from search_index import update_search_index
+from throttle import PERMANENT
+from titles import TITLES_FILE, TitleCanonicalizer
+from view_history import VIEWS_DIR, ViewHistory
+from vipkadr_scraper import VipKadrScraper
+from writers import (CSV_FILE, JSON_FILE, NDJSON_FILE, PARQUET_FILE, CSVStreamWriter,
+                     NDJSONStreamWriter, ndjson_to_json, ndjson_to_parquet, pa, read_ndjson)
+
+DEAD_LETTER_FILE = "vipkadr_dead_letters.db"
+
+
+class DeadLetterQueue:
+    """SQLite queue of failed URLs keyed by URL
+    
+    Each entry keeps the page kind, the failure class (see
+    ``throttle.RetryPolicy``), the last HTTP status (NULL for connection
+    errors) and error, the total number of attempts and how often it was
+    drained without success. Adding a URL that is already queued updates
+    the entry.
+    """
+    
+    def __init__(self, path: str = DEAD_LETTER_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS dead_letters (
+                url TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                outcome TEXT NOT NULL,
+                status INTEGER,
+                error TEXT,
+                attempts INTEGER NOT NULL,
+                drains INTEGER NOT NULL DEFAULT 0,
+                first_failed REAL NOT NULL,
+                last_failed REAL NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+    
+    def __contains__(self, url: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM dead_letters WHERE url = ?", (url,)).fetchone() is not None
+    
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM dead_letters").fetchone()[0]
+    
+    def add(self, url: str, kind: str, outcome: str, status: Optional[int], error: Optional[str],
+            attempts: int):
+        """Queue a URL after its last failed attempt"""
+        now = time.time()
+        self.conn.execute(
+            "INSERT INTO dead_letters "
+            "(url, kind, outcome, status, error, attempts, first_failed, last_failed) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (url) DO UPDATE SET outcome = excluded.outcome, status = excluded.status, "
+            "error = excluded.error, attempts = attempts + excluded.attempts, "
+            "last_failed = excluded.last_failed",
+            (url, kind, outcome, status, error, attempts, now, now)
+        )
+        self.conn.commit()
+    
+    def remove(self, url: str):
+        self.conn.execute("DELETE FROM dead_letters WHERE url = ?", (url,))
+        self.conn.commit()
+    
+    def drained(self, url: str):
+        """Count a drain that did not recover the URL"""
+        self.conn.execute("UPDATE dead_letters SET drains = drains + 1 WHERE url = ?", (url,))
+        self.conn.commit()
+    
+    def entries(self, include_permanent: bool = False, max_drains: Optional[int] = None) -> List[Dict]:
+        """Queued entries, listing pages first, oldest failure first"""
+        query = "SELECT url, kind, outcome, status, error, attempts, drains, first_failed, last_failed " \
+                "FROM dead_letters WHERE 1 = 1"
+        params = []
+        if not include_permanent:
+            query += " AND outcome != ?"
+            params.append(PERMANENT)
+        if max_drains is not None:
+            query += " AND drains < ?"
+            params.append(max_drains)
+        query += " ORDER BY kind = 'listing' DESC, first_failed"
+        columns = ('url', 'kind', 'outcome', 'status', 'error', 'attempts', 'drains',
+                   'first_failed', 'last_failed')
+        return [dict(zip(columns, row)) for row in self.conn.execute(query, params)]
+    
+    def clear(self, outcome: Optional[str] = None) -> int:
+        """Remove all entries, or those of one failure class; returns how many"""
+        if outcome is None:
+            cursor = self.conn.execute("DELETE FROM dead_letters")
+        else:
+            cursor = self.conn.execute("DELETE FROM dead_letters WHERE outcome = ?", (outcome,))
+        self.conn.commit()
+        return cursor.rowcount
+    
+    def close(self):
+        self.conn.close()
+
+
+async def drain(path: str = DEAD_LETTER_FILE, include_permanent: bool = False,
+                max_drains: Optional[int] = None, store_path: Optional[str] = None) -> int:
+    """Retry the queued URLs and append recovered postings to the outputs"""
+    dead_letters = DeadLetterQueue(path)
+    job_store = JobStore(store_path) if store_path else None
+    saved_urls = set()
+    if os.path.exists(NDJSON_FILE):
+        saved_urls = {record['url'] for record in read_ndjson(NDJSON_FILE)}
+    # Recovered records get the same annotations as crawled ones
+    dedup = DuplicateIndex(DEDUP_FILE)
+    titles = TitleCanonicalizer(TITLES_FILE)
+    view_history = ViewHistory(VIEWS_DIR)
+    csv_writer = CSVStreamWriter(CSV_FILE, append=True)
+    ndjson_writer = NDJSONStreamWriter(NDJSON_FILE, append=True)
+    try:
+        async with VipKadrScraper(max_concurrent=5, requests_per_second=2, job_store=job_store,
+                                  writers=[csv_writer, ndjson_writer, view_history],
+                                  keep_in_memory=False, dedup=dedup, titles=titles,
+                                  dead_letters=dead_letters) as scraper:
+            recovered = await scraper.drain_dead_letters(
+                include_permanent=include_permanent, max_drains=max_drains, skip_urls=saved_urls
+            )
+        csv_writer.close()
+        ndjson_writer.close()
+        if scraper.records_scraped:
+            ndjson_to_json(NDJSON_FILE, JSON_FILE)
+            # The CSV is now newer than the saved cube, so this syncs it
+            AggregateCube.for_csv(CSV_FILE, AGGREGATES_FILE)
+            update_search_index(NDJSON_FILE)
+            if pa is not None:
+                ndjson_to_parquet(NDJSON_FILE, PARQUET_FILE)
+        return recovered
+    finally:
+        csv_writer.close()
+        ndjson_writer.close()
+        dedup.close()
+        titles.save()
+        view_history.close()
+        dead_letters.close()
+        if job_store:
+            job_store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and drain the dead-letter queue of failed URLs")
+    parser.add_argument("--db", default=DEAD_LETTER_FILE, help=f"Queue file (default: {DEAD_LETTER_FILE})")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="Show queued URLs")
+    drain_parser = commands.add_parser('drain', help="Retry queued URLs and append recovered postings")
+    drain_parser.add_argument("--all", action="store_true", help="Also retry permanent failures (404, ...)")
+    drain_parser.add_argument("--max-drains", type=int, metavar="N",
+                              help="Skip URLs that already failed N drains")
+    drain_parser.add_argument("--store", metavar="PATH", help="SQLite job store to update")
+    clear_parser = commands.add_parser('clear', help="Remove queued URLs")
+    clear_parser.add_argument("--permanent", action="store_true", help="Only remove permanent failures")
+    args = parser.parse_args()
+    
+    if args.command == 'drain':
+        recovered = asyncio.run(drain(args.db, args.all, args.max_drains, args.store))
+        print(f"Recovered {recovered} URLs")
+        return
+    
+    dead_letters = DeadLetterQueue(args.db)
+    try:
+        if args.command == 'clear':
+            removed = dead_letters.clear(PERMANENT if args.permanent else None)
+            print(f"Removed {removed} URLs")
+            return
+        entries = dead_letters.entries(include_permanent=True)
+        for entry in entries:
+            status = entry['status'] if entry['status'] is not None else '-'
+            print(f"{entry['outcome']:<10} {status:>4} {entry['attempts']:>3} tries "
+                  f"{entry['drains']:>2} drains  {entry['url']}  {entry['error'] or ''}")
+        print(f"{len(entries)} URLs queued")
+    finally:
+        dead_letters.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Near-duplicate detection for reposted job postings (MinHash + LSH)
+
+Postings are reduced to word shingles of their description and
+requirements, summarised as MinHash signatures and indexed by LSH bands.
+A new posting is only compared with postings that share at least one band
+bucket, so adding a posting costs a few index lookups however large the
+corpus grows. Matching postings are merged into clusters whose root is the
+first posting seen.
+"""
+
+import argparse
+import csv
+import hashlib
+import random
+import re
+import sqlite3
+from array import array
+from typing import Dict, Iterable, List, Optional, Set
+
+from normalize import fold_az
+
+DEDUP_FILE = "vipkadr_dedup.db"
+
+_WORD_RE = re.compile(r'\w+')
+_MASK64 = (1 << 64) - 1
+
+
+def posting_text(record: Dict) -> str:
+    """Folded description plus requirements, the latter only if it adds anything"""
+    description = fold_az(record.get('description'), ascii=True)
+    requirements = fold_az(record.get('requirements'), ascii=True)
+    if not requirements or requirements in description:
+        return description
+    if description in requirements:
+        return requirements
+    return description + ' ' + requirements
+
+
+def shingles(text: str, size: int = 3) -> Set[bytes]:
+    """Overlapping word n-grams; short texts fall back to a single shingle"""
+    words = _WORD_RE.findall(text)
+    if len(words) <= size:
+        return {' '.join(words).encode('utf-8')} if words else set()
+    return {' '.join(words[i:i + size]).encode('utf-8') for i in range(len(words) - size + 1)}
+
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+class MinHasher:
+    """MinHash signatures from multiply-shift hash functions with a fixed seed"""
+    
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.params = [(rng.getrandbits(64) | 1, rng.getrandbits(64)) for _ in range(num_perm)]
+    
+    def signature(self, shingle_set: Set[bytes]) -> array:
+        hashes = [_hash64(shingle) for shingle in shingle_set]
+        return array('I', [
+            min(((a * h + b) & _MASK64) >> 32 for h in hashes)
+            for a, b in self.params
+        ])
+
+
+def similarity(sig_a: array, sig_b: array) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(a == b for a, b in zip(sig_a, sig_b)) / len(sig_a)
+
+
+class DuplicateIndex:
+    """Persistent MinHash/LSH index that groups postings into near-duplicate clusters
+
+    ``threshold`` is the estimated Jaccard similarity above which two
+    postings are duplicates. With ``bands`` bands of ``num_perm / bands``
+    rows, pairs well above the threshold almost always share a bucket and
+    pairs well below it rarely do; candidates are then checked against the
+    threshold on the full signature.
+
+    Postings are keyed by URL. Re-adding a posting whose text is unchanged
+    is a single lookup.
+    """
+    
+    def __init__(self, path: str = "vipkadr_dedup.db", threshold: float = 0.8,
+                 num_perm: int = 128, bands: int = 16, shingle_size: int = 3,
+                 commit_every: int = 200):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.path = path
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.hasher = MinHasher(num_perm)
+        self.commit_every = commit_every
+        self._pending = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS postings (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT UNIQUE NOT NULL,
+                job_id TEXT,
+                digest TEXT NOT NULL,
+                signature BLOB,
+                cluster TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS postings_cluster ON postings (cluster);
+            CREATE TABLE IF NOT EXISTS buckets (
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                url TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS buckets_lookup ON buckets (band, bucket);
+            CREATE INDEX IF NOT EXISTS buckets_url ON buckets (url);
+            """
+        )
+        self.conn.commit()
+    
+    def _band_keys(self, signature: array) -> List[int]:
+        keys = []
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            # SQLite integers are signed 64-bit
+            keys.append(_hash64(bytes([band]) + chunk) - (1 << 63))
+        return keys
+    
+    def _candidates(self, url: str, band_keys: List[int]) -> Set[str]:
+        found = set()
+        for band, bucket in enumerate(band_keys):
+            for (other,) in self.conn.execute(
+                "SELECT url FROM buckets WHERE band = ? AND bucket = ?", (band, bucket)
+            ):
+                if other != url:
+                    found.add(other)
+        return found
+    
+    def _forget(self, url: str):
+        """Drop a posting; if it was a cluster root, its oldest member becomes the root"""
+        self.conn.execute("DELETE FROM buckets WHERE url = ?", (url,))
+        self.conn.execute("DELETE FROM postings WHERE url = ?", (url,))
+        heir = self.conn.execute(
+            "SELECT url FROM postings WHERE cluster = ? ORDER BY seq LIMIT 1", (url,)
+        ).fetchone()
+        if heir is not None:
+            self.conn.execute("UPDATE postings SET cluster = ? WHERE cluster = ?", (heir[0], url))
+    
+    def add(self, record: Dict) -> str:
+        """Index a posting and return the URL of its cluster root
+
+        The root is the posting's own URL unless it duplicates an earlier
+        posting. Postings with no description text are never clustered.
+        """
+        url = record['url']
+        text = posting_text(record)
+        digest = hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+        row = self.conn.execute(
+            "SELECT digest, cluster FROM postings WHERE url = ?", (url,)
+        ).fetchone()
+        if row is not None and row[0] == digest:
+            return row[1]
+        if row is not None:
+            self._forget(url)
+        
+        shingle_set = shingles(text, self.shingle_size)
+        if not shingle_set:
+            self.conn.execute(
+                "INSERT INTO postings (url, job_id, digest, signature, cluster) VALUES (?, ?, ?, NULL, ?)",
+                (url, record.get('job_id'), digest, url)
+            )
+            self._committed()
+            return url
+        
+        signature = self.hasher.signature(shingle_set)
+        band_keys = self._band_keys(signature)
+        matches = []
+        for other in self._candidates(url, band_keys):
+            other_row = self.conn.execute(
+                "SELECT signature, cluster, seq FROM postings WHERE url = ?", (other,)
+            ).fetchone()
+            if other_row is None or other_row[0] is None:
+                continue
+            other_signature = array('I')
+            other_signature.frombytes(other_row[0])
+            if similarity(signature, other_signature) >= self.threshold:
+                matches.append(other_row[1])
+        
+        cluster = self._merge(set(matches)) if matches else url
+        self.conn.execute(
+            "INSERT INTO postings (url, job_id, digest, signature, cluster) VALUES (?, ?, ?, ?, ?)",
+            (url, record.get('job_id'), digest, signature.tobytes(), cluster)
+        )
+        self.conn.executemany(
+            "INSERT INTO buckets (band, bucket, url) VALUES (?, ?, ?)",
+            [(band, bucket, url) for band, bucket in enumerate(band_keys)]
+        )
+        self._committed()
+        return cluster
+    
+    def _merge(self, clusters: Set[str]) -> str:
+        """Join clusters under the root that was seen first"""
+        if len(clusters) == 1:
+            return next(iter(clusters))
+        placeholders = ','.join('?' * len(clusters))
+        root = self.conn.execute(
+            f"SELECT cluster FROM postings WHERE cluster IN ({placeholders}) ORDER BY seq LIMIT 1",
+            tuple(clusters)
+        ).fetchone()[0]
+        self.conn.execute(
+            f"UPDATE postings SET cluster = ? WHERE cluster IN ({placeholders})",
+            (root, *clusters)
+        )
+        return root
+    
+    def _committed(self):
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.flush()
+    
+    def annotate(self, record: Dict) -> Dict:
+        """Index a record and set its ``duplicate_of`` field
+
+        ``duplicate_of`` is the URL of the cluster root, or empty if the
+        record is the first of its cluster.
+        """
+        cluster = self.add(record)
+        record['duplicate_of'] = cluster if cluster != record['url'] else ''
+        return record
+    
+    def duplicate_of(self, url: str) -> Optional[str]:
+        """Current cluster root of a posting, or None if it is a root or unknown"""
+        row = self.conn.execute("SELECT cluster FROM postings WHERE url = ?", (url,)).fetchone()
+        return row[0] if row and row[0] != url else None
+    
+    def clusters(self, min_size: int = 2) -> List[List[str]]:
+        """Clusters of at least ``min_size`` postings, largest first, root first"""
+        groups: Dict[str, List[str]] = {}
+        for url, cluster in self.conn.execute("SELECT url, cluster FROM postings ORDER BY seq"):
+            groups.setdefault(cluster, []).append(url)
+        found = [members for members in groups.values() if len(members) >= min_size]
+        return sorted(found, key=len, reverse=True)
+    
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM postings").fetchone()[0]
+    
+    def flush(self):
+        self.conn.commit()
+        self._pending = 0
+    
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+def _read_records(path: str) -> Iterable[Dict]:
+    if path.endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            yield from csv.DictReader(f)
+    else:
+        from writers import read_ndjson
+        yield from read_ndjson(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find near-duplicate job postings")
+    parser.add_argument("records", help="Scraped postings (.csv or .ndjson)")
+    parser.add_argument("--db", default="vipkadr_dedup.db", help="Index file (default: vipkadr_dedup.db)")
+    parser.add_argument("--threshold", type=float, default=0.8,
+                        help="Estimated Jaccard similarity that counts as a duplicate (default: 0.8)")
+    parser.add_argument("--show", type=int, default=10, metavar="N", help="Print the N largest clusters")
+    args = parser.parse_args()
+    
+    index = DuplicateIndex(args.db, threshold=args.threshold)
+    titles = {}
+    for record in _read_records(args.records):
+        index.add(record)
+        titles[record['url']] = f"{record.get('title', '')} / {record.get('company', '')}"
+    index.flush()
+    
+    clusters = index.clusters()
+    duplicates = sum(len(members) - 1 for members in clusters)
+    print(f"{len(index)} postings, {len(clusters)} near-duplicate clusters, "
+          f"{duplicates} postings are reposts")
+    for members in clusters[:args.show]:
+        print(f"\n{len(members)} postings like {members[0]}")
+        for url in members[:5]:
+            print(f"   {titles.get(url, url)}")
+    index.close()
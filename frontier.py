@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Shared crawl frontier for running several scraper workers at once
+
+The frontier is a SQLite file holding every listing and detail URL of a
+crawl as a task. Workers claim batches of tasks under a lease; a task
+whose lease runs out without being completed (a worker died or stalled)
+becomes visible again and is claimed by someone else. Completing a task is
+idempotent, and results are stored keyed by ``job_id``, so a task done
+twice leaves one record. Each worker is an ordinary ``VipKadrScraper``
+with its own rate budget, in its own process or on its own host (sharing
+the file over a network filesystem that supports SQLite locking).
+
+Usage:
+    python frontier.py run --workers 4             # seed, work and merge locally
+    python frontier.py seed [--end-page N]          # coordinator
+    python frontier.py work [--worker-id ID] [--requests-per-second R]
+    python frontier.py status
+    python frontier.py merge                        # write CSV/NDJSON/JSON
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from dedup import DEDUP_FILE, DuplicateIndex
+from titles import TITLES_FILE, TitleCanonicalizer
+from vipkadr_scraper import VipKadrScraper
+from writers import CSV_FILE, JSON_FILE, NDJSON_FILE, CSVStreamWriter, NDJSONStreamWriter, ndjson_to_json
+
+FRONTIER_FILE = "vipkadr_frontier.db"
+
+LISTING = 'listing'
+DETAIL = 'detail'
+
+
+class SharedFrontier:
+    """Lease-based task queue of crawl URLs in SQLite
+    
+    A task is ``pending``, ``leased`` (until ``lease_until``), ``done`` or
+    ``failed``. ``claim()`` hands out pending tasks and leased ones whose
+    lease expired, listing pages first so the frontier keeps growing, and
+    gives up on a task after ``max_attempts`` claims. Claims run in an
+    immediate transaction, so two workers never get the same task while
+    its lease is valid.
+    """
+    
+    def __init__(self, path: str = FRONTIER_FILE, lease_seconds: float = 120.0, max_attempts: int = 3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS tasks (
+                url TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                worker TEXT,
+                lease_until REAL NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                added_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS tasks_claim ON tasks (state, kind, lease_until);
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                worker TEXT,
+                saved_at REAL NOT NULL,
+                record TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                name TEXT PRIMARY KEY,
+                value TEXT
+            );
+            """
+        )
+    
+    @contextmanager
+    def _transaction(self):
+        """Run statements in one write transaction, taking the lock up front"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+    
+    def add(self, urls: Iterable[str], kind: str = DETAIL) -> int:
+        """Add tasks for URLs not in the frontier yet; returns how many were new"""
+        now = time.time()
+        before = self.conn.total_changes
+        with self._transaction():
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO tasks (url, kind, added_at) VALUES (?, ?, ?)",
+                [(url, kind, now) for url in urls]
+            )
+        return self.conn.total_changes - before
+    
+    def seed(self, base_url: str, start_page: int, end_page: int) -> int:
+        """Add the listing pages of a crawl and mark the frontier as seeded"""
+        added = self.add(
+            (f"{base_url}/cv-bazasi/?page={page_num}" for page_num in range(start_page, end_page + 1)),
+            LISTING
+        )
+        with self._transaction():
+            self.conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('seeded', ?)",
+                              (str(time.time()),))
+        return added
+    
+    @property
+    def seeded(self) -> bool:
+        return self.conn.execute("SELECT 1 FROM meta WHERE name = 'seeded'").fetchone() is not None
+    
+    def claim(self, worker: str, limit: int = 20, now: Optional[float] = None) -> List[Tuple[str, str]]:
+        """Lease up to ``limit`` tasks to ``worker``, returning (url, kind) pairs"""
+        now = time.time() if now is None else now
+        with self._transaction():
+            # Tasks that used up their attempts on an expired lease are given up
+            self.conn.execute(
+                "UPDATE tasks SET state = 'failed' "
+                "WHERE state = 'leased' AND lease_until < ? AND attempts >= ?",
+                (now, self.max_attempts)
+            )
+            rows = self.conn.execute(
+                "SELECT url, kind FROM tasks "
+                "WHERE state = 'pending' OR (state = 'leased' AND lease_until < ?) "
+                "ORDER BY kind = 'listing' DESC, added_at LIMIT ?",
+                (now, limit)
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE tasks SET state = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 "
+                "WHERE url = ?",
+                [(worker, now + self.lease_seconds, url) for url, _ in rows]
+            )
+        return rows
+    
+    def extend(self, urls: Iterable[str], worker: str):
+        """Renew the leases ``worker`` still holds on ``urls``"""
+        lease_until = time.time() + self.lease_seconds
+        with self._transaction():
+            self.conn.executemany(
+                "UPDATE tasks SET lease_until = ? WHERE url = ? AND worker = ? AND state = 'leased'",
+                [(lease_until, url, worker) for url in urls]
+            )
+    
+    def complete(self, url: str, worker: str, record: Optional[Dict] = None):
+        """Mark a task done and store its record; repeating this is harmless
+        
+        Records are keyed by ``job_id`` (the URL when there is none), so the
+        same posting reached through two URLs is kept once, latest wins.
+        """
+        with self._transaction():
+            self.conn.execute(
+                "UPDATE tasks SET state = 'done', worker = ?, lease_until = 0 WHERE url = ?",
+                (worker, url)
+            )
+            if record is not None:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO results (key, url, worker, saved_at, record) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (record.get('job_id') or record['url'], record['url'], worker, time.time(),
+                     json.dumps(record, ensure_ascii=False))
+                )
+    
+    def fail(self, url: str, worker: str):
+        """Give a task back after a failed attempt, or give up on it"""
+        with self._transaction():
+            self.conn.execute(
+                "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "lease_until = 0 WHERE url = ? AND worker = ? AND state = 'leased'",
+                (self.max_attempts, url, worker)
+            )
+    
+    def counts(self) -> Dict[str, int]:
+        """Number of tasks per state"""
+        return dict(self.conn.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state").fetchall())
+    
+    def finished(self) -> bool:
+        """Whether the frontier was seeded and no task is pending or leased"""
+        if not self.seeded:
+            return False
+        row = self.conn.execute(
+            "SELECT 1 FROM tasks WHERE state IN ('pending', 'leased') LIMIT 1"
+        ).fetchone()
+        return row is None
+    
+    def records(self) -> Iterator[Dict]:
+        """Yield the merged records, one per job_id"""
+        for (record,) in self.conn.execute("SELECT record FROM results ORDER BY saved_at"):
+            yield json.loads(record)
+    
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+    
+    def close(self):
+        self.conn.close()
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+async def seed_frontier(path: str, end_page: Optional[int] = None, start_page: int = 1,
+                        base_url: str = "https://vipkadr.az") -> int:
+    """Coordinator step: find the last listing page and add all listing pages"""
+    frontier = SharedFrontier(path)
+    try:
+        async with VipKadrScraper(max_concurrent=5, requests_per_second=5, base_url=base_url) as scraper:
+            if end_page is None:
+                end_page = await scraper.find_last_page()
+            added = frontier.seed(scraper.base_url, start_page, end_page)
+        print(f"Seeded {added} listing pages ({start_page}-{end_page}) into {path}")
+        return added
+    finally:
+        frontier.close()
+
+
+async def work(path: str, worker_id: Optional[str] = None, max_concurrent: int = 10,
+               requests_per_second: float = 5, batch_size: int = 20, parser: str = 'bs4',
+               lease_seconds: float = 120.0, base_url: str = "https://vipkadr.az"):
+    """Worker step: claim and crawl batches until the frontier is finished"""
+    worker_id = worker_id or default_worker_id()
+    frontier = SharedFrontier(path, lease_seconds=lease_seconds)
+    try:
+        async with VipKadrScraper(max_concurrent=max_concurrent, requests_per_second=requests_per_second,
+                                  parser=parser, keep_in_memory=False, base_url=base_url) as scraper:
+            done = await scraper.scrape_frontier(frontier, worker_id, batch_size=batch_size)
+        print(f"Worker {worker_id}: {done} tasks done")
+        return done
+    finally:
+        frontier.close()
+
+
+def merge(path: str, csv_file: str, ndjson_file: str, json_file: str) -> int:
+    """Write the merged records with canonical titles and duplicate links"""
+    frontier = SharedFrontier(path)
+    dedup = DuplicateIndex(DEDUP_FILE)
+    titles = TitleCanonicalizer(TITLES_FILE)
+    count = 0
+    try:
+        with CSVStreamWriter(csv_file) as csv_writer, NDJSONStreamWriter(ndjson_file) as ndjson_writer:
+            for record in frontier.records():
+                dedup.annotate(record)
+                titles.annotate(record)
+                csv_writer.write(record)
+                ndjson_writer.write(record)
+                count += 1
+        ndjson_to_json(ndjson_file, json_file)
+    finally:
+        dedup.close()
+        titles.save()
+        frontier.close()
+    return count
+
+
+def _work_process(path: str, worker_id: str, options: Dict):
+    asyncio.run(work(path, worker_id, **options))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl vipkadr.az with several workers sharing a frontier")
+    parser.add_argument("--db", default=FRONTIER_FILE, help=f"Frontier file (default: {FRONTIER_FILE})")
+    parser.add_argument("--base-url", default="https://vipkadr.az", help=argparse.SUPPRESS)
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    seed_parser = commands.add_parser('seed', help="Discover listing pages and add them to the frontier")
+    seed_parser.add_argument("--end-page", type=int, metavar="N",
+                             help="Last listing page (default: detect from pagination)")
+    
+    worker_options = argparse.ArgumentParser(add_help=False)
+    worker_options.add_argument("--max-concurrent", type=int, default=10)
+    worker_options.add_argument("--requests-per-second", type=float, default=5,
+                                help="Rate budget of each worker (default: 5)")
+    worker_options.add_argument("--batch-size", type=int, default=20, help="Tasks claimed at a time")
+    worker_options.add_argument("--lease", type=float, default=120.0, metavar="SECONDS",
+                                help="Lease before an unfinished task is handed to another worker")
+    worker_options.add_argument("--parser", default='bs4', help="HTML parser engine (default: bs4)")
+    
+    work_parser = commands.add_parser('work', parents=[worker_options], help="Run one worker")
+    work_parser.add_argument("--worker-id", help="Worker name (default: host-pid)")
+    
+    run_parser = commands.add_parser('run', parents=[worker_options],
+                                     help="Seed, run local worker processes and merge")
+    run_parser.add_argument("--workers", type=int, default=4)
+    run_parser.add_argument("--end-page", type=int, metavar="N")
+    
+    commands.add_parser('status', help="Show task counts")
+    commands.add_parser('merge', help="Write merged results to CSV/NDJSON/JSON")
+    args = parser.parse_args()
+    
+    if args.command == 'seed':
+        asyncio.run(seed_frontier(args.db, args.end_page, base_url=args.base_url))
+        return
+    if args.command == 'status':
+        frontier = SharedFrontier(args.db)
+        print(f"Tasks: {frontier.counts()}, records: {len(frontier)}, finished: {frontier.finished()}")
+        frontier.close()
+        return
+    if args.command == 'merge':
+        count = merge(args.db, CSV_FILE, NDJSON_FILE, JSON_FILE)
+        print(f"Merged {count} records into {CSV_FILE}, {NDJSON_FILE} and {JSON_FILE}")
+        return
+    
+    options = {
+        'max_concurrent': args.max_concurrent,
+        'requests_per_second': args.requests_per_second,
+        'batch_size': args.batch_size,
+        'parser': args.parser,
+        'lease_seconds': args.lease,
+        'base_url': args.base_url,
+    }
+    if args.command == 'work':
+        asyncio.run(work(args.db, args.worker_id, **options))
+        return
+    
+    # run: the whole crawl on this machine
+    frontier = SharedFrontier(args.db)
+    seeded = frontier.seeded
+    frontier.close()
+    if not seeded:
+        asyncio.run(seed_frontier(args.db, args.end_page, base_url=args.base_url))
+    workers = [
+        multiprocessing.Process(target=_work_process,
+                                args=(args.db, f"{default_worker_id()}-{i}", options))
+        for i in range(args.workers)
+    ]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+    count = merge(args.db, CSV_FILE, NDJSON_FILE, JSON_FILE)
+    print(f"Merged {count} records into {CSV_FILE}, {NDJSON_FILE} and {JSON_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,410 +2,696 @@
 """
 Business Analytics Dashboard Generator
 Generates comprehensive visualizations for VIPKadr job market data
+
+All charts and the summary read from a precomputed ``AggregateCube`` (see
+aggregates.py) instead of raw rows. Every chart is split into an aggregate
+step, which reads exactly the numbers it plots from the cube, and a render
+step, which draws them. Rendering is the slow part and runs across a
+process pool, one chart per task. A chart is only redrawn when the
+fingerprint of its aggregate and drawing code differs from the one
+recorded in the cache manifest next to the PNGs.
+
+matplotlib, seaborn and numpy are only imported once a chart actually has
+to be drawn, so ``summary`` (and a ``charts`` run where nothing changed)
+starts in a fraction of a second.
+
+Usage:
+    python generate_charts.py                 # charts, then the summary
+    python generate_charts.py summary
+    python generate_charts.py charts [--only CHART ...] [--force]
+    python generate_charts.py chart CHART
 """
 
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import numpy as np
+import argparse
+import bisect
+import hashlib
+import inspect
+import json
+import os
+import time
+from typing import Callable, Dict, List, NamedTuple
+
 from datetime import datetime
 import warnings
+from aggregates import AggregateCube
+from titles import TITLES_FILE, TitleCanonicalizer
 warnings.filterwarnings('ignore')
 
-# Set style for professional business charts
-plt.style.use('seaborn-v0_8-darkgrid')
-sns.set_palette("husl")
+# Plotting stack, imported on first use by load_plotting()
+matplotlib = plt = sns = np = None
+
+CSV_FILE = 'vipkadr_candidates.csv'
+CUBE_FILE = 'vipkadr_aggregates.json'
+CHARTS_DIR = 'charts'
+MANIFEST_FILE = '.chart_cache.json'
+
+STYLE = 'seaborn-v0_8-darkgrid'
+PALETTE = 'husl'
+DPI = 300
 colors = ['#2E86AB', '#A23B72', '#F18F01', '#C73E1D', '#6A994E', '#BC4B51']
 
-# Load data
-df = pd.read_csv('vipkadr_candidates.csv')
 
-print(f"Analyzing {len(df)} job postings...")
-print("Generating business intelligence charts...\n")
+def load_plotting():
+    """Import matplotlib, seaborn and numpy into the module namespace"""
+    global matplotlib, plt, sns, np
+    if plt is not None:
+        return
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    import numpy as np
+
+
+def setup_style():
+    """Set style for professional business charts"""
+    load_plotting()
+    warnings.filterwarnings('ignore')
+    plt.style.use(STYLE)
+    sns.set_palette(PALETTE)
+
 
 # ============================================================================
-# DATA PREPROCESSING
+# DRAWING HELPERS
 # ============================================================================
 
-def extract_salary_value(salary_str):
-    """Extract numeric salary values from string format"""
-    if pd.isna(salary_str):
-        return None
+def _split(pairs):
+    """[(label, value), ...] -> ([labels], [values])"""
+    return [label for label, _ in pairs], [value for _, value in pairs]
+
+
+def _draw_histogram(ax, hist, color):
+    """Draw precomputed histogram counts exactly as ``ax.hist`` would"""
+    counts, edges = hist
+    edges = np.asarray(edges, dtype=float)
+    counts, edges, patches = ax.hist(edges[:-1], bins=edges, weights=counts,
+                                     edgecolor='black', color=color, alpha=0.8)
+
+    # Add value labels on bars
+    for count, edge, patch in zip(counts, edges, patches):
+        if count > 0:
+            height = patch.get_height()
+            ax.text(patch.get_x() + patch.get_width()/2., height,
+                    f'{int(count)}',
+                    ha='center', va='bottom', fontweight='bold')
+
+
+def _draw_labelled_bars(ax, pairs, color, **label_kwargs):
+    labels, values = _split(pairs)
+    bars = ax.bar(range(len(values)), values, color=color, edgecolor='black', alpha=0.8)
+    ax.set_xticks(range(len(values)))
+    ax.set_xticklabels(labels, **label_kwargs)
+
+    for bar, val in zip(bars, values):
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width()/2., height,
+                f'{int(val)}',
+                ha='center', va='bottom', fontweight='bold')
 
-    salary_str = str(salary_str).replace('AZN', '').strip()
 
-    if '-' in salary_str:
-        # Range like "700-1000"
-        parts = salary_str.split('-')
-        try:
-            return (float(parts[0]) + float(parts[1])) / 2
-        except:
-            return None
-    else:
-        # Single value like "600"
-        try:
-            return float(salary_str)
-        except:
-            return None
+def _save(path: str):
+    plt.tight_layout()
+    plt.savefig(path, dpi=DPI, bbox_inches='tight')
+    plt.close()
 
-df['salary_numeric'] = df['salary'].apply(extract_salary_value)
-df['added_date'] = pd.to_datetime(df['added_date'], format='%d %b %Y', errors='coerce')
-df['end_date'] = pd.to_datetime(df['end_date'], format='%d %b %Y', errors='coerce')
-df['posting_duration'] = (df['end_date'] - df['added_date']).dt.days
 
 # ============================================================================
 # CHART 1: TOP HIRING COMPANIES
 # ============================================================================
 
-print("1. Analyzing top hiring companies...")
-fig, ax = plt.subplots(figsize=(12, 8))
+def aggregate_top_companies(cube: AggregateCube):
+    return cube.top('company', 15)
+
+
+def render_top_companies(top_companies, path: str):
+    fig, ax = plt.subplots(figsize=(12, 8))
+
+    labels, values = _split(top_companies)
+    bars = ax.barh(range(len(values)), values, color=colors[0])
+    ax.set_yticks(range(len(values)))
+    ax.set_yticklabels(labels, fontsize=10)
+    ax.set_xlabel('Number of Job Postings', fontsize=12, fontweight='bold')
+    ax.set_title('Top 15 Most Active Hiring Companies', fontsize=14, fontweight='bold', pad=20)
+    ax.invert_yaxis()
 
-top_companies = df['company'].value_counts().head(15)
-bars = ax.barh(range(len(top_companies)), top_companies.values, color=colors[0])
-ax.set_yticks(range(len(top_companies)))
-ax.set_yticklabels(top_companies.index, fontsize=10)
-ax.set_xlabel('Number of Job Postings', fontsize=12, fontweight='bold')
-ax.set_title('Top 15 Most Active Hiring Companies', fontsize=14, fontweight='bold', pad=20)
-ax.invert_yaxis()
+    # Add value labels
+    for i, (bar, val) in enumerate(zip(bars, values)):
+        ax.text(val + 0.5, i, str(val), va='center', fontweight='bold')
 
-# Add value labels
-for i, (bar, val) in enumerate(zip(bars, top_companies.values)):
-    ax.text(val + 0.5, i, str(val), va='center', fontweight='bold')
+    _save(path)
 
-plt.tight_layout()
-plt.savefig('charts/01_top_hiring_companies.png', dpi=300, bbox_inches='tight')
-plt.close()
 
 # ============================================================================
 # CHART 2: SALARY DISTRIBUTION
 # ============================================================================
 
-print("2. Analyzing salary distribution...")
-fig, ax = plt.subplots(figsize=(12, 7))
+def aggregate_salary_distribution(cube: AggregateCube):
+    bins = [0, 500, 600, 700, 800, 900, 1000, 1200, 1500, 2000]
+    return cube.histogram('salary', bins), bins
 
-salary_data = df[df['salary_numeric'].notna()]['salary_numeric']
-bins = [0, 500, 600, 700, 800, 900, 1000, 1200, 1500, 2000]
-counts, edges, patches = ax.hist(salary_data, bins=bins, edgecolor='black', color=colors[1], alpha=0.8)
 
-ax.set_xlabel('Salary Range (AZN)', fontsize=12, fontweight='bold')
-ax.set_ylabel('Number of Job Postings', fontsize=12, fontweight='bold')
-ax.set_title('Salary Distribution Across Job Market', fontsize=14, fontweight='bold', pad=20)
+def render_salary_distribution(hist, path: str):
+    fig, ax = plt.subplots(figsize=(12, 7))
 
-# Add value labels on bars
-for count, edge, patch in zip(counts, edges, patches):
-    if count > 0:
-        height = patch.get_height()
-        ax.text(patch.get_x() + patch.get_width()/2., height,
-                f'{int(count)}',
-                ha='center', va='bottom', fontweight='bold')
+    _draw_histogram(ax, hist, colors[1])
+    ax.set_xlabel('Salary Range (AZN)', fontsize=12, fontweight='bold')
+    ax.set_ylabel('Number of Job Postings', fontsize=12, fontweight='bold')
+    ax.set_title('Salary Distribution Across Job Market', fontsize=14, fontweight='bold', pad=20)
+
+    ax.grid(axis='y', alpha=0.3)
+    _save(path)
 
-ax.grid(axis='y', alpha=0.3)
-plt.tight_layout()
-plt.savefig('charts/02_salary_distribution.png', dpi=300, bbox_inches='tight')
-plt.close()
 
 # ============================================================================
 # CHART 3: TOP JOB ROLES IN DEMAND
 # ============================================================================
 
-print("3. Identifying most demanded job roles...")
-fig, ax = plt.subplots(figsize=(12, 8))
+def aggregate_top_job_roles(cube: AggregateCube):
+    return cube.top('title', 15)
+
 
-top_titles = df['title'].value_counts().head(15)
-bars = ax.barh(range(len(top_titles)), top_titles.values, color=colors[2])
-ax.set_yticks(range(len(top_titles)))
-ax.set_yticklabels(top_titles.index, fontsize=10)
-ax.set_xlabel('Number of Openings', fontsize=12, fontweight='bold')
-ax.set_title('Top 15 Most In-Demand Job Roles', fontsize=14, fontweight='bold', pad=20)
-ax.invert_yaxis()
+def render_top_job_roles(top_titles, path: str):
+    fig, ax = plt.subplots(figsize=(12, 8))
 
-for i, (bar, val) in enumerate(zip(bars, top_titles.values)):
-    ax.text(val + 0.3, i, str(val), va='center', fontweight='bold')
+    labels, values = _split(top_titles)
+    bars = ax.barh(range(len(values)), values, color=colors[2])
+    ax.set_yticks(range(len(values)))
+    ax.set_yticklabels(labels, fontsize=10)
+    ax.set_xlabel('Number of Openings', fontsize=12, fontweight='bold')
+    ax.set_title('Top 15 Most In-Demand Job Roles', fontsize=14, fontweight='bold', pad=20)
+    ax.invert_yaxis()
+
+    for i, (bar, val) in enumerate(zip(bars, values)):
+        ax.text(val + 0.3, i, str(val), va='center', fontweight='bold')
+
+    _save(path)
 
-plt.tight_layout()
-plt.savefig('charts/03_top_job_roles.png', dpi=300, bbox_inches='tight')
-plt.close()
 
 # ============================================================================
 # CHART 4: EXPERIENCE REQUIREMENTS
 # ============================================================================
 
-print("4. Analyzing experience requirements...")
-fig, ax = plt.subplots(figsize=(12, 7))
+def aggregate_experience_requirements(cube: AggregateCube):
+    return cube.top('experience', 10)
+
 
-exp_counts = df['experience'].value_counts().head(10)
-bars = ax.bar(range(len(exp_counts)), exp_counts.values, color=colors[3], edgecolor='black', alpha=0.8)
-ax.set_xticks(range(len(exp_counts)))
-ax.set_xticklabels(exp_counts.index, rotation=45, ha='right', fontsize=10)
-ax.set_ylabel('Number of Job Postings', fontsize=12, fontweight='bold')
-ax.set_title('Experience Level Requirements', fontsize=14, fontweight='bold', pad=20)
+def render_experience_requirements(exp_counts, path: str):
+    fig, ax = plt.subplots(figsize=(12, 7))
 
-for bar, val in zip(bars, exp_counts.values):
-    height = bar.get_height()
-    ax.text(bar.get_x() + bar.get_width()/2., height,
-            f'{int(val)}',
-            ha='center', va='bottom', fontweight='bold')
+    _draw_labelled_bars(ax, exp_counts, colors[3], rotation=45, ha='right', fontsize=10)
+    ax.set_ylabel('Number of Job Postings', fontsize=12, fontweight='bold')
+    ax.set_title('Experience Level Requirements', fontsize=14, fontweight='bold', pad=20)
+
+    ax.grid(axis='y', alpha=0.3)
+    _save(path)
 
-ax.grid(axis='y', alpha=0.3)
-plt.tight_layout()
-plt.savefig('charts/04_experience_requirements.png', dpi=300, bbox_inches='tight')
-plt.close()
 
 # ============================================================================
 # CHART 5: AVERAGE SALARY BY EXPERIENCE LEVEL
 # ============================================================================
 
-print("5. Calculating salary by experience level...")
-fig, ax = plt.subplots(figsize=(12, 7))
+def aggregate_salary_by_experience(cube: AggregateCube):
+    return cube.salary_means('experience')[:10]
+
+
+def render_salary_by_experience(salary_by_exp, path: str):
+    fig, ax = plt.subplots(figsize=(12, 7))
 
-salary_by_exp = df.groupby('experience')['salary_numeric'].mean().sort_values(ascending=False).head(10)
-bars = ax.bar(range(len(salary_by_exp)), salary_by_exp.values, color=colors[4], edgecolor='black', alpha=0.8)
-ax.set_xticks(range(len(salary_by_exp)))
-ax.set_xticklabels(salary_by_exp.index, rotation=45, ha='right', fontsize=10)
-ax.set_ylabel('Average Salary (AZN)', fontsize=12, fontweight='bold')
-ax.set_title('Average Salary by Experience Level', fontsize=14, fontweight='bold', pad=20)
+    _draw_labelled_bars(ax, salary_by_exp, colors[4], rotation=45, ha='right', fontsize=10)
+    ax.set_ylabel('Average Salary (AZN)', fontsize=12, fontweight='bold')
+    ax.set_title('Average Salary by Experience Level', fontsize=14, fontweight='bold', pad=20)
 
-for bar, val in zip(bars, salary_by_exp.values):
-    height = bar.get_height()
-    ax.text(bar.get_x() + bar.get_width()/2., height,
-            f'{int(val)}',
-            ha='center', va='bottom', fontweight='bold')
+    ax.grid(axis='y', alpha=0.3)
+    _save(path)
 
-ax.grid(axis='y', alpha=0.3)
-plt.tight_layout()
-plt.savefig('charts/05_salary_by_experience.png', dpi=300, bbox_inches='tight')
-plt.close()
 
 # ============================================================================
 # CHART 6: WORK TYPE DISTRIBUTION
 # ============================================================================
 
-print("6. Analyzing work type preferences...")
-fig, ax = plt.subplots(figsize=(10, 7))
+def aggregate_work_type_distribution(cube: AggregateCube):
+    return cube.top('work_type')
+
+
+def render_work_type_distribution(work_type_counts, path: str):
+    fig, ax = plt.subplots(figsize=(10, 7))
 
-work_type_counts = df['work_type'].value_counts()
-bars = ax.bar(range(len(work_type_counts)), work_type_counts.values,
-              color=colors[:len(work_type_counts)], edgecolor='black', alpha=0.8)
-ax.set_xticks(range(len(work_type_counts)))
-ax.set_xticklabels(work_type_counts.index, fontsize=11, fontweight='bold')
-ax.set_ylabel('Number of Job Postings', fontsize=12, fontweight='bold')
-ax.set_title('Work Type Distribution in Job Market', fontsize=14, fontweight='bold', pad=20)
+    labels, values = _split(work_type_counts)
+    bars = ax.bar(range(len(values)), values,
+                  color=colors[:len(values)], edgecolor='black', alpha=0.8)
+    ax.set_xticks(range(len(values)))
+    ax.set_xticklabels(labels, fontsize=11, fontweight='bold')
+    ax.set_ylabel('Number of Job Postings', fontsize=12, fontweight='bold')
+    ax.set_title('Work Type Distribution in Job Market', fontsize=14, fontweight='bold', pad=20)
 
-for bar, val in zip(bars, work_type_counts.values):
-    height = bar.get_height()
-    ax.text(bar.get_x() + bar.get_width()/2., height,
-            f'{int(val)}',
-            ha='center', va='bottom', fontweight='bold', fontsize=11)
+    for bar, val in zip(bars, values):
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width()/2., height,
+                f'{int(val)}',
+                ha='center', va='bottom', fontweight='bold', fontsize=11)
+
+    ax.grid(axis='y', alpha=0.3)
+    _save(path)
 
-ax.grid(axis='y', alpha=0.3)
-plt.tight_layout()
-plt.savefig('charts/06_work_type_distribution.png', dpi=300, bbox_inches='tight')
-plt.close()
 
 # ============================================================================
 # CHART 7: JOB POSTING VIEWS ANALYSIS
 # ============================================================================
 
-print("7. Analyzing job posting performance...")
-fig, ax = plt.subplots(figsize=(12, 7))
+def aggregate_job_posting_views(cube: AggregateCube):
+    # Group views into right-closed ranges: (0, 100], (100, 200], ...
+    bins = [0, 100, 200, 300, 400, 500, 1000]
+    labels = ['0-100', '101-200', '201-300', '301-400', '401-500', '500+']
+    counts = [0] * len(labels)
+    for views, count in cube.value_counts('views'):
+        if bins[0] < views <= bins[-1]:
+            counts[bisect.bisect_left(bins, views) - 1] += count
+    return list(zip(labels, counts))
+
 
-# Group views into ranges
-view_ranges = pd.cut(df['views'], bins=[0, 100, 200, 300, 400, 500, 1000],
-                     labels=['0-100', '101-200', '201-300', '301-400', '401-500', '500+'])
-view_counts = view_ranges.value_counts().sort_index()
+def render_job_posting_views(view_counts, path: str):
+    fig, ax = plt.subplots(figsize=(12, 7))
 
-bars = ax.bar(range(len(view_counts)), view_counts.values, color=colors[0], edgecolor='black', alpha=0.8)
-ax.set_xticks(range(len(view_counts)))
-ax.set_xticklabels(view_counts.index, fontsize=11)
-ax.set_ylabel('Number of Job Postings', fontsize=12, fontweight='bold')
-ax.set_xlabel('View Count Range', fontsize=12, fontweight='bold')
-ax.set_title('Job Posting Visibility Performance', fontsize=14, fontweight='bold', pad=20)
+    _draw_labelled_bars(ax, view_counts, colors[0], fontsize=11)
+    ax.set_ylabel('Number of Job Postings', fontsize=12, fontweight='bold')
+    ax.set_xlabel('View Count Range', fontsize=12, fontweight='bold')
+    ax.set_title('Job Posting Visibility Performance', fontsize=14, fontweight='bold', pad=20)
 
-for bar, val in zip(bars, view_counts.values):
-    height = bar.get_height()
-    ax.text(bar.get_x() + bar.get_width()/2., height,
-            f'{int(val)}',
-            ha='center', va='bottom', fontweight='bold')
+    ax.grid(axis='y', alpha=0.3)
+    _save(path)
 
-ax.grid(axis='y', alpha=0.3)
-plt.tight_layout()
-plt.savefig('charts/07_job_posting_views.png', dpi=300, bbox_inches='tight')
-plt.close()
 
 # ============================================================================
 # CHART 8: GENDER REQUIREMENTS ANALYSIS
 # ============================================================================
 
-print("8. Analyzing gender requirements...")
-fig, ax = plt.subplots(figsize=(10, 7))
+def aggregate_gender_requirements(cube: AggregateCube):
+    return cube.top('gender'), cube.total
+
 
-gender_counts = df['gender'].value_counts()
-bars = ax.bar(range(len(gender_counts)), gender_counts.values,
-              color=colors[:len(gender_counts)], edgecolor='black', alpha=0.8)
-ax.set_xticks(range(len(gender_counts)))
-ax.set_xticklabels(gender_counts.index, fontsize=11, fontweight='bold')
-ax.set_ylabel('Number of Job Postings', fontsize=12, fontweight='bold')
-ax.set_title('Gender Requirements in Job Postings', fontsize=14, fontweight='bold', pad=20)
+def render_gender_requirements(agg, path: str):
+    gender_counts, total = agg
+    fig, ax = plt.subplots(figsize=(10, 7))
 
-for bar, val in zip(bars, gender_counts.values):
-    height = bar.get_height()
-    ax.text(bar.get_x() + bar.get_width()/2., height,
-            f'{int(val)}\n({val/len(df)*100:.1f}%)',
-            ha='center', va='bottom', fontweight='bold', fontsize=10)
+    labels, values = _split(gender_counts)
+    bars = ax.bar(range(len(values)), values,
+                  color=colors[:len(values)], edgecolor='black', alpha=0.8)
+    ax.set_xticks(range(len(values)))
+    ax.set_xticklabels(labels, fontsize=11, fontweight='bold')
+    ax.set_ylabel('Number of Job Postings', fontsize=12, fontweight='bold')
+    ax.set_title('Gender Requirements in Job Postings', fontsize=14, fontweight='bold', pad=20)
+
+    for bar, val in zip(bars, values):
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width()/2., height,
+                f'{int(val)}\n({val/total*100:.1f}%)',
+                ha='center', va='bottom', fontweight='bold', fontsize=10)
+
+    ax.grid(axis='y', alpha=0.3)
+    _save(path)
 
-ax.grid(axis='y', alpha=0.3)
-plt.tight_layout()
-plt.savefig('charts/08_gender_requirements.png', dpi=300, bbox_inches='tight')
-plt.close()
 
 # ============================================================================
 # CHART 9: MONTHLY JOB POSTING TRENDS
 # ============================================================================
 
-print("9. Analyzing temporal posting trends...")
-fig, ax = plt.subplots(figsize=(14, 7))
+def aggregate_monthly_posting_trends(cube: AggregateCube):
+    return sorted(cube.counts['month'].items())
+
 
-df_valid_dates = df[df['added_date'].notna()].copy()
-df_valid_dates['month_year'] = df_valid_dates['added_date'].dt.to_period('M')
-monthly_posts = df_valid_dates['month_year'].value_counts().sort_index()
+def render_monthly_posting_trends(monthly_posts, path: str):
+    fig, ax = plt.subplots(figsize=(14, 7))
 
-# Convert to datetime for plotting
-months = [pd.Timestamp(str(m)) for m in monthly_posts.index]
-ax.plot(months, monthly_posts.values, marker='o', linewidth=2.5, markersize=8, color=colors[1])
-ax.fill_between(months, monthly_posts.values, alpha=0.3, color=colors[1])
+    # Convert to datetime for plotting
+    labels, values = _split(monthly_posts)
+    months = [datetime.strptime(month, '%Y-%m') for month in labels]
+    ax.plot(months, values, marker='o', linewidth=2.5, markersize=8, color=colors[1])
+    ax.fill_between(months, values, alpha=0.3, color=colors[1])
 
-ax.set_xlabel('Month', fontsize=12, fontweight='bold')
-ax.set_ylabel('Number of Job Postings', fontsize=12, fontweight='bold')
-ax.set_title('Job Posting Activity Over Time', fontsize=14, fontweight='bold', pad=20)
-ax.grid(True, alpha=0.3)
+    ax.set_xlabel('Month', fontsize=12, fontweight='bold')
+    ax.set_ylabel('Number of Job Postings', fontsize=12, fontweight='bold')
+    ax.set_title('Job Posting Activity Over Time', fontsize=14, fontweight='bold', pad=20)
+    ax.grid(True, alpha=0.3)
 
-# Rotate x-axis labels
-plt.xticks(rotation=45, ha='right')
+    # Rotate x-axis labels
+    plt.xticks(rotation=45, ha='right')
 
-# Add value labels on points
-for month, val in zip(months, monthly_posts.values):
-    ax.text(month, val + 1, str(val), ha='center', va='bottom', fontsize=9, fontweight='bold')
+    # Add value labels on points
+    for month, val in zip(months, values):
+        ax.text(month, val + 1, str(val), ha='center', va='bottom', fontsize=9, fontweight='bold')
+
+    _save(path)
 
-plt.tight_layout()
-plt.savefig('charts/09_monthly_posting_trends.png', dpi=300, bbox_inches='tight')
-plt.close()
 
 # ============================================================================
 # CHART 10: TOP ROLES BY AVERAGE SALARY
 # ============================================================================
 
-print("10. Identifying highest paying roles...")
-fig, ax = plt.subplots(figsize=(12, 8))
+def aggregate_highest_paying_roles(cube: AggregateCube):
+    # At least 3 postings with a salary
+    return cube.salary_means('title', min_count=3)[:15]
+
+
+def render_highest_paying_roles(top_paying_roles, path: str):
+    fig, ax = plt.subplots(figsize=(12, 8))
 
-role_salary = df.groupby('title')['salary_numeric'].agg(['mean', 'count'])
-role_salary = role_salary[role_salary['count'] >= 3]  # At least 3 postings
-top_paying_roles = role_salary.nlargest(15, 'mean')
+    labels, values = _split(top_paying_roles)
+    bars = ax.barh(range(len(values)), values, color=colors[5])
+    ax.set_yticks(range(len(values)))
+    ax.set_yticklabels(labels, fontsize=10)
+    ax.set_xlabel('Average Salary (AZN)', fontsize=12, fontweight='bold')
+    ax.set_title('Top 15 Highest Paying Job Roles', fontsize=14, fontweight='bold', pad=20)
+    ax.invert_yaxis()
 
-bars = ax.barh(range(len(top_paying_roles)), top_paying_roles['mean'].values, color=colors[5])
-ax.set_yticks(range(len(top_paying_roles)))
-ax.set_yticklabels(top_paying_roles.index, fontsize=10)
-ax.set_xlabel('Average Salary (AZN)', fontsize=12, fontweight='bold')
-ax.set_title('Top 15 Highest Paying Job Roles', fontsize=14, fontweight='bold', pad=20)
-ax.invert_yaxis()
+    for i, (bar, val) in enumerate(zip(bars, values)):
+        ax.text(val + 10, i, f'{int(val)} AZN', va='center', fontweight='bold')
 
-for i, (bar, val) in enumerate(zip(bars, top_paying_roles['mean'].values)):
-    ax.text(val + 10, i, f'{int(val)} AZN', va='center', fontweight='bold')
+    _save(path)
 
-plt.tight_layout()
-plt.savefig('charts/10_highest_paying_roles.png', dpi=300, bbox_inches='tight')
-plt.close()
 
 # ============================================================================
 # CHART 11: SALARY VS VIEWS CORRELATION
 # ============================================================================
 
-print("11. Analyzing relationship between salary and visibility...")
-fig, ax = plt.subplots(figsize=(12, 7))
+def aggregate_salary_vs_views(cube: AggregateCube):
+    return cube.salary_views_pairs()
+
+
+def render_salary_vs_views(pairs, path: str):
+    fig, ax = plt.subplots(figsize=(12, 7))
 
-df_clean = df[(df['salary_numeric'].notna()) & (df['views'] > 0)].copy()
-ax.scatter(df_clean['salary_numeric'], df_clean['views'], alpha=0.5, s=50, color=colors[3])
+    # Identical (salary, views) postings are stored once with a count
+    salary = np.repeat([s for s, _, _ in pairs], [n for _, _, n in pairs])
+    views = np.repeat([v for _, v, _ in pairs], [n for _, _, n in pairs])
+    ax.scatter(salary, views, alpha=0.5, s=50, color=colors[3])
 
-# Add trend line
-z = np.polyfit(df_clean['salary_numeric'], df_clean['views'], 1)
-p = np.poly1d(z)
-ax.plot(df_clean['salary_numeric'].sort_values(),
-        p(df_clean['salary_numeric'].sort_values()),
-        "r--", linewidth=2, label='Trend Line')
+    # Add trend line
+    z = np.polyfit(salary, views, 1)
+    p = np.poly1d(z)
+    ax.plot(np.sort(salary), p(np.sort(salary)), "r--", linewidth=2, label='Trend Line')
 
-ax.set_xlabel('Salary (AZN)', fontsize=12, fontweight='bold')
-ax.set_ylabel('Number of Views', fontsize=12, fontweight='bold')
-ax.set_title('Salary vs Job Posting Visibility', fontsize=14, fontweight='bold', pad=20)
-ax.legend()
-ax.grid(True, alpha=0.3)
+    ax.set_xlabel('Salary (AZN)', fontsize=12, fontweight='bold')
+    ax.set_ylabel('Number of Views', fontsize=12, fontweight='bold')
+    ax.set_title('Salary vs Job Posting Visibility', fontsize=14, fontweight='bold', pad=20)
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+
+    _save(path)
 
-plt.tight_layout()
-plt.savefig('charts/11_salary_vs_views.png', dpi=300, bbox_inches='tight')
-plt.close()
 
 # ============================================================================
 # CHART 12: POSTING DURATION ANALYSIS
 # ============================================================================
 
-print("12. Analyzing job posting duration...")
-fig, ax = plt.subplots(figsize=(12, 7))
+def aggregate_posting_duration(cube: AggregateCube):
+    bins = [0, 15, 30, 45, 60, 90, 120, 365]
+    return cube.histogram('duration', bins, above=0), bins
 
-duration_data = df[df['posting_duration'].notna() & (df['posting_duration'] > 0)]['posting_duration']
-bins = [0, 15, 30, 45, 60, 90, 120, 365]
-counts, edges, patches = ax.hist(duration_data, bins=bins, edgecolor='black', color=colors[4], alpha=0.8)
 
-ax.set_xlabel('Posting Duration (Days)', fontsize=12, fontweight='bold')
-ax.set_ylabel('Number of Job Postings', fontsize=12, fontweight='bold')
-ax.set_title('How Long Jobs Stay Active on Platform', fontsize=14, fontweight='bold', pad=20)
+def render_posting_duration(hist, path: str):
+    fig, ax = plt.subplots(figsize=(12, 7))
 
-for count, edge, patch in zip(counts, edges, patches):
-    if count > 0:
-        height = patch.get_height()
-        ax.text(patch.get_x() + patch.get_width()/2., height,
-                f'{int(count)}',
-                ha='center', va='bottom', fontweight='bold')
+    _draw_histogram(ax, hist, colors[4])
+    ax.set_xlabel('Posting Duration (Days)', fontsize=12, fontweight='bold')
+    ax.set_ylabel('Number of Job Postings', fontsize=12, fontweight='bold')
+    ax.set_title('How Long Jobs Stay Active on Platform', fontsize=14, fontweight='bold', pad=20)
+
+    ax.grid(axis='y', alpha=0.3)
+    _save(path)
 
-ax.grid(axis='y', alpha=0.3)
-plt.tight_layout()
-plt.savefig('charts/12_posting_duration.png', dpi=300, bbox_inches='tight')
-plt.close()
 
 # ============================================================================
-# GENERATE SUMMARY STATISTICS
+# CHART REGISTRY
 # ============================================================================
 
-print("\n" + "="*70)
-print("BUSINESS INTELLIGENCE SUMMARY")
-print("="*70)
-
-print(f"\nDataset Overview:")
-print(f"  Total Job Postings: {len(df)}")
-print(f"  Unique Companies: {df['company'].nunique()}")
-print(f"  Unique Job Titles: {df['title'].nunique()}")
-print(f"  Date Range: {df['added_date'].min()} to {df['added_date'].max()}")
+class Chart(NamedTuple):
+    filename: str
+    description: str
+    aggregate: Callable[[AggregateCube], object]
+    render: Callable[[object, str], None]
+
+
+CHARTS: Dict[str, Chart] = {
+    'top_hiring_companies': Chart(
+        '01_top_hiring_companies.png', "Analyzing top hiring companies",
+        aggregate_top_companies, render_top_companies),
+    'salary_distribution': Chart(
+        '02_salary_distribution.png', "Analyzing salary distribution",
+        aggregate_salary_distribution, render_salary_distribution),
+    'top_job_roles': Chart(
+        '03_top_job_roles.png', "Identifying most demanded job roles",
+        aggregate_top_job_roles, render_top_job_roles),
+    'experience_requirements': Chart(
+        '04_experience_requirements.png', "Analyzing experience requirements",
+        aggregate_experience_requirements, render_experience_requirements),
+    'salary_by_experience': Chart(
+        '05_salary_by_experience.png', "Calculating salary by experience level",
+        aggregate_salary_by_experience, render_salary_by_experience),
+    'work_type_distribution': Chart(
+        '06_work_type_distribution.png', "Analyzing work type preferences",
+        aggregate_work_type_distribution, render_work_type_distribution),
+    'job_posting_views': Chart(
+        '07_job_posting_views.png', "Analyzing job posting performance",
+        aggregate_job_posting_views, render_job_posting_views),
+    'gender_requirements': Chart(
+        '08_gender_requirements.png', "Analyzing gender requirements",
+        aggregate_gender_requirements, render_gender_requirements),
+    'monthly_posting_trends': Chart(
+        '09_monthly_posting_trends.png', "Analyzing temporal posting trends",
+        aggregate_monthly_posting_trends, render_monthly_posting_trends),
+    'highest_paying_roles': Chart(
+        '10_highest_paying_roles.png', "Identifying highest paying roles",
+        aggregate_highest_paying_roles, render_highest_paying_roles),
+    'salary_vs_views': Chart(
+        '11_salary_vs_views.png', "Analyzing relationship between salary and visibility",
+        aggregate_salary_vs_views, render_salary_vs_views),
+    'posting_duration': Chart(
+        '12_posting_duration.png', "Analyzing job posting duration",
+        aggregate_posting_duration, render_posting_duration),
+}
 
-print(f"\nSalary Insights:")
-print(f"  Average Salary: {df['salary_numeric'].mean():.0f} AZN")
-print(f"  Median Salary: {df['salary_numeric'].median():.0f} AZN")
-print(f"  Min Salary: {df['salary_numeric'].min():.0f} AZN")
-print(f"  Max Salary: {df['salary_numeric'].max():.0f} AZN")
 
-print(f"\nEngagement Metrics:")
-print(f"  Average Views per Posting: {df['views'].mean():.0f}")
-print(f"  Median Views per Posting: {df['views'].median():.0f}")
-print(f"  Most Viewed Posting: {df['views'].max()} views")
+# ============================================================================
+# RENDER CACHE
+# ============================================================================
 
-print(f"\nTop 3 Hiring Companies:")
-for i, (company, count) in enumerate(df['company'].value_counts().head(3).items(), 1):
-    print(f"  {i}. {company}: {count} postings")
+def _canonical(value):
+    """Reduce an aggregate to plain JSON-able values for hashing"""
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, float):
+        return repr(value)
+    return value if isinstance(value, (int, str, bool, type(None))) else str(value)
+
+
+def _package_version(name: str) -> str:
+    from importlib import metadata
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return ''
+
+
+def chart_fingerprint(name: str, agg) -> str:
+    """Hash of everything that decides a chart's pixels
+
+    Covers the aggregate it plots, the shared style parameters and the
+    source of its render function, so editing a chart also redraws it.
+    """
+    chart = CHARTS[name]
+    try:
+        source = inspect.getsource(chart.render)
+    except (OSError, TypeError):
+        source = chart.render.__qualname__
+    payload = json.dumps({
+        'chart': name,
+        'data': _canonical(agg),
+        'style': [STYLE, PALETTE, DPI, colors, _package_version('matplotlib')],
+        'render': source,
+    }, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def load_manifest(output_dir: str) -> Dict[str, str]:
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(output_dir: str, manifest: Dict[str, str]):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    with open(path + '.part', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.part', path)
+
+
+def _render(name: str, agg, path: str) -> str:
+    """Render one chart; runs in a worker process"""
+    CHARTS[name].render(agg, path)
+    return name
+
+
+def render_charts(cube: AggregateCube, names: List[str] = None, output_dir: str = CHARTS_DIR,
+                  workers: int = None, force: bool = False) -> List[str]:
+    """Aggregate the selected charts (all by default) and render the stale ones in parallel
+
+    A chart is skipped when its PNG exists and its fingerprint matches the
+    manifest, unless ``force`` is set. ``workers`` defaults to one process
+    per chart, capped at the CPU count; with ``workers=1`` everything is
+    rendered in this process. Returns the names of the charts rendered.
+    """
+    names = list(names or CHARTS)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    jobs = []
+    fingerprints = {}
+    for name in names:
+        chart = CHARTS[name]
+        agg = chart.aggregate(cube)
+        path = os.path.join(output_dir, chart.filename)
+        fingerprints[name] = chart_fingerprint(name, agg)
+        if not force and manifest.get(chart.filename) == fingerprints[name] and os.path.exists(path):
+            print(f"{list(CHARTS).index(name) + 1}. {chart.description}... unchanged")
+            continue
+        print(f"{list(CHARTS).index(name) + 1}. {chart.description}...")
+        jobs.append((name, agg, path))
+
+    rendered = []
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    try:
+        if jobs and workers <= 1:
+            setup_style()
+            for job in jobs:
+                rendered.append(_render(*job))
+        elif jobs:
+            from concurrent.futures import ProcessPoolExecutor, as_completed
+            with ProcessPoolExecutor(max_workers=workers, initializer=setup_style) as pool:
+                futures = [pool.submit(_render, *job) for job in jobs]
+                for future in as_completed(futures):
+                    rendered.append(future.result())
+    finally:
+        # Record only what was actually drawn, so a failed chart is retried next run
+        for name in rendered:
+            manifest[CHARTS[name].filename] = fingerprints[name]
+        if rendered:
+            save_manifest(output_dir, manifest)
+    return rendered
 
-print(f"\nTop 3 In-Demand Roles:")
-for i, (title, count) in enumerate(df['title'].value_counts().head(3).items(), 1):
-    print(f"  {i}. {title}: {count} openings")
 
-print(f"\nMarket Composition:")
-print(f"  Full-time positions: {(df['work_type']=='Tam İş saatı').sum()} ({(df['work_type']=='Tam İş saatı').sum()/len(df)*100:.1f}%)")
-print(f"  Gender-neutral postings: {(df['gender']=='Fərq etmir').sum()} ({(df['gender']=='Fərq etmir').sum()/len(df)*100:.1f}%)")
+# ============================================================================
+# GENERATE SUMMARY STATISTICS
+# ============================================================================
 
-print("\n" + "="*70)
-print("All charts successfully generated in 'charts/' directory!")
-print("="*70)
+def print_summary(cube: AggregateCube):
+    total = cube.total
+    added = cube.value_counts('added')
+    salary = cube.stats('salary')
+    views = cube.stats('views')
+
+    print("\n" + "="*70)
+    print("BUSINESS INTELLIGENCE SUMMARY")
+    print("="*70)
+
+    print(f"\nDataset Overview:")
+    print(f"  Total Job Postings: {total}")
+    if cube.duplicates:
+        print(f"  Near-Duplicate Reposts (not counted): {len(cube.duplicates)}")
+    print(f"  Unique Companies: {len(cube.counts['company'])}")
+    print(f"  Unique Job Titles: {len(cube.counts['title'])}")
+    if added:
+        print(f"  Date Range: {added[0][0]} to {added[-1][0]}")
+
+    if salary['count']:
+        print(f"\nSalary Insights:")
+        print(f"  Average Salary: {salary['mean']:.0f} AZN")
+        print(f"  Median Salary: {salary['median']:.0f} AZN")
+        print(f"  Min Salary: {salary['min']:.0f} AZN")
+        print(f"  Max Salary: {salary['max']:.0f} AZN")
+
+    if views['count']:
+        print(f"\nEngagement Metrics:")
+        print(f"  Average Views per Posting: {views['mean']:.0f}")
+        print(f"  Median Views per Posting: {views['median']:.0f}")
+        print(f"  Most Viewed Posting: {views['max']:.0f} views")
+
+    print(f"\nTop 3 Hiring Companies:")
+    for i, (company, count) in enumerate(cube.top('company', 3), 1):
+        print(f"  {i}. {company}: {count} postings")
+
+    print(f"\nTop 3 In-Demand Roles:")
+    for i, (title, count) in enumerate(cube.top('title', 3), 1):
+        print(f"  {i}. {title}: {count} openings")
+
+    if total:
+        full_time = cube.counts['work_type'].get('Tam İş saatı', 0)
+        neutral = cube.counts['gender'].get('Fərq etmir', 0)
+        print(f"\nMarket Composition:")
+        print(f"  Full-time positions: {full_time} ({full_time/total*100:.1f}%)")
+        print(f"  Gender-neutral postings: {neutral} ({neutral/total*100:.1f}%)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate the VIPKadr job market dashboard")
+    parser.add_argument("--csv", default=CSV_FILE, help=f"Scraped postings (default: {CSV_FILE})")
+    parser.add_argument("--cube", default=CUBE_FILE,
+                        help=f"Aggregate cube, synced from the CSV when stale (default: {CUBE_FILE})")
+    parser.add_argument("--titles", default=TITLES_FILE,
+                        help=f"Title canonicalization memo (default: {TITLES_FILE})")
+    parser.add_argument("--output-dir", default=CHARTS_DIR, help=f"Chart directory (default: {CHARTS_DIR})")
+
+    render_options = argparse.ArgumentParser(add_help=False)
+    render_options.add_argument("--workers", type=int, metavar="N",
+                                help="Render in N processes (default: one per CPU)")
+    render_options.add_argument("--force", action="store_true",
+                                help="Redraw charts even if their data has not changed")
+
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("summary", help="Print the business intelligence summary only")
+    charts = commands.add_parser("charts", parents=[render_options], help="Render the dashboard charts")
+    charts.add_argument("--only", nargs='+', choices=list(CHARTS), metavar="CHART",
+                        help=f"Render only these charts: {', '.join(CHARTS)}")
+    chart = commands.add_parser("chart", parents=[render_options], help="Render a single chart")
+    chart.add_argument("name", choices=list(CHARTS), metavar="CHART",
+                       help=f"One of: {', '.join(CHARTS)}")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    start_time = time.time()
+
+    # Output from before title canonicalization gets its canonical titles here
+    titles = TitleCanonicalizer(args.titles)
+
+    def prepare(record):
+        if not record.get('title_canonical'):
+            titles.annotate(record)
+        return record
+
+    cube = AggregateCube.for_csv(args.csv, args.cube, prepare=prepare)
+    titles.save()
+    if args.command == "summary":
+        print_summary(cube)
+        return
+
+    print(f"Analyzing {cube.total} job postings...")
+    print("Generating business intelligence charts...\n")
+
+    names = [args.name] if args.command == "chart" else getattr(args, 'only', None)
+    rendered = render_charts(cube, names=names, output_dir=args.output_dir,
+                             workers=getattr(args, 'workers', None), force=getattr(args, 'force', False))
+
+    # Without a subcommand the summary follows the charts, as it always has
+    if args.command is None:
+        print_summary(cube)
+
+    print("\n" + "="*70)
+    print(f"All charts up to date in '{args.output_dir}/' directory! "
+          f"({len(rendered)} redrawn in {time.time() - start_time:.1f}s)")
+    print("="*70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Content-addressed archive of raw HTML responses for record and replay
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, gzip is always available
+    zstandard = None
+
+
+class HtmlArchive:
+    """Append-only archive of response bodies with a URL index
+
+    Bodies are compressed one by one (zstd when the ``zstandard`` package is
+    installed, gzip otherwise) and appended to ``blobs.dat``. Identical
+    bodies are stored once, keyed by their SHA-256. ``index.jsonl`` maps
+    each fetched URL to a blob; when a URL is recorded more than once, the
+    latest entry wins.
+
+    In record mode the scraper writes every successful response here; in
+    replay mode ``fetch_page`` is served from the archive without touching
+    the network.
+    """
+    
+    def __init__(self, directory: str, replay: bool = False, codec: Optional[str] = None):
+        self.directory = directory
+        self.replay = replay
+        self.codec = codec or ('zstd' if zstandard else 'gzip')
+        if self.codec == 'zstd' and zstandard is None:
+            raise RuntimeError("zstd archives need the 'zstandard' package")
+        
+        os.makedirs(directory, exist_ok=True)
+        self.blobs_path = os.path.join(directory, 'blobs.dat')
+        self.index_path = os.path.join(directory, 'index.jsonl')
+        self.urls = {}
+        self.blobs = {}
+        self._load_index()
+        
+        self._blobs_file = None
+        self._index_file = None
+        if not replay:
+            self._blobs_file = open(self.blobs_path, 'ab')
+            self._index_file = open(self.index_path, 'a', encoding='utf-8')
+    
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        
+        with open(self.index_path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash can leave a truncated last line
+                    continue
+                self.urls[entry['url']] = entry
+                self.blobs[entry['sha256']] = (entry['offset'], entry['length'], entry['codec'])
+    
+    def __contains__(self, url: str) -> bool:
+        return url in self.urls
+    
+    def __len__(self) -> int:
+        return len(self.urls)
+    
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == 'zstd':
+            return zstandard.ZstdCompressor(level=10).compress(data)
+        return gzip.compress(data, compresslevel=6)
+    
+    @staticmethod
+    def _decompress(data: bytes, codec: str) -> bytes:
+        if codec == 'zstd':
+            if zstandard is None:
+                raise RuntimeError("zstd archives need the 'zstandard' package")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+    
+    def put(self, url: str, content: str, status: int = 200):
+        """Record the body fetched for a URL"""
+        if self.replay:
+            raise RuntimeError("Archive is open for replay")
+        
+        data = content.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        if digest not in self.blobs:
+            compressed = self._compress(data)
+            self._blobs_file.seek(0, os.SEEK_END)
+            offset = self._blobs_file.tell()
+            self._blobs_file.write(compressed)
+            self._blobs_file.flush()
+            self.blobs[digest] = (offset, len(compressed), self.codec)
+        
+        offset, length, codec = self.blobs[digest]
+        entry = {
+            'url': url,
+            'sha256': digest,
+            'offset': offset,
+            'length': length,
+            'codec': codec,
+            'status': status,
+            'fetched_at': time.time(),
+        }
+        self._index_file.write(json.dumps(entry) + '\n')
+        self._index_file.flush()
+        self.urls[url] = entry
+    
+    def _read_blob(self, f, entry: Dict) -> str:
+        f.seek(entry['offset'])
+        return self._decompress(f.read(entry['length']), entry['codec']).decode('utf-8')
+    
+    def get(self, url: str) -> Optional[str]:
+        """Return the latest recorded body for a URL, or None"""
+        entry = self.urls.get(url)
+        if entry is None:
+            return None
+        
+        with open(self.blobs_path, 'rb') as f:
+            return self._read_blob(f, entry)
+    
+    def iter_pages(self) -> Iterator[Tuple[str, str]]:
+        """Yield (url, html) for every archived URL, in blob order"""
+        entries = sorted(self.urls.values(), key=lambda entry: entry['offset'])
+        with open(self.blobs_path, 'rb') as f:
+            for entry in entries:
+                yield entry['url'], self._read_blob(f, entry)
+    
+    def close(self):
+        for f in (self._blobs_file, self._index_file):
+            if f:
+                f.close()
+        self._blobs_file = None
+        self._index_file = None
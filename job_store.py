@@ -0,0 +1,111 @@
+"""
+Persistent job store backing incremental crawls of vipkadr.az
+"""
+
+import json
+import sqlite3
+import time
+from datetime import date
+from typing import Dict, Iterator, Optional
+
+from normalize import parse_az_date
+
+
+class JobStore:
+    """SQLite store of scraped postings keyed by URL
+
+    Each row keeps the last extracted record together with the time it was
+    fetched and the validators (ETag/Last-Modified) the server sent, so the
+    scraper can skip postings that cannot have changed and revalidate the
+    rest with conditional GETs.
+    """
+    
+    def __init__(self, path: str = "vipkadr_jobs.db", max_age: float = 24 * 3600):
+        self.path = path
+        self.max_age = max_age
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                url TEXT PRIMARY KEY,
+                job_id TEXT,
+                end_date TEXT,
+                fetched_at REAL NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                record TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_job_id ON jobs (job_id)")
+        self.conn.commit()
+    
+    def __contains__(self, url: str) -> bool:
+        row = self.conn.execute("SELECT 1 FROM jobs WHERE url = ?", (url,)).fetchone()
+        return row is not None
+    
+    def get(self, url: str) -> Optional[Dict]:
+        """Return the stored row for a URL, with the record decoded"""
+        row = self.conn.execute(
+            "SELECT url, job_id, end_date, fetched_at, etag, last_modified, record "
+            "FROM jobs WHERE url = ?",
+            (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        
+        return {
+            'url': row[0],
+            'job_id': row[1],
+            'end_date': row[2],
+            'fetched_at': row[3],
+            'etag': row[4],
+            'last_modified': row[5],
+            'record': json.loads(row[6]),
+        }
+    
+    def is_fresh(self, entry: Dict, now: Optional[float] = None) -> bool:
+        """Whether a stored entry can be reused without fetching the page again"""
+        now = time.time() if now is None else now
+        
+        end_date = parse_az_date(entry['end_date'])
+        if end_date is not None:
+            fetched_on = date.fromtimestamp(entry['fetched_at'])
+            # A posting fetched after it expired will not change any more
+            if fetched_on > end_date:
+                return True
+            if date.fromtimestamp(now) > end_date:
+                return False
+        
+        return now - entry['fetched_at'] < self.max_age
+    
+    def records(self) -> Iterator[Dict]:
+        """Yield every stored record
+
+        Expired postings stay listed on the site, so a crawl that stops
+        early refills its output from all of them, not only active ones.
+        """
+        for (record,) in self.conn.execute("SELECT record FROM jobs").fetchall():
+            yield json.loads(record)
+    
+    def save(self, record: Dict, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """Insert or replace the record for its URL"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO jobs "
+            "(url, job_id, end_date, fetched_at, etag, last_modified, record) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                record['url'], record.get('job_id', ''), record.get('end_date', ''),
+                time.time(), etag, last_modified,
+                json.dumps(record, ensure_ascii=False)
+            )
+        )
+        self.conn.commit()
+    
+    def touch(self, url: str):
+        """Mark a stored record as revalidated (e.g. after HTTP 304)"""
+        self.conn.execute("UPDATE jobs SET fetched_at = ? WHERE url = ?", (time.time(), url))
+        self.conn.commit()
+    
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,208 @@
+"""
+Crawl instrumentation: latency histograms, counters and gauges
+
+Exposed as a JSON summary (``CrawlMetrics.to_dict``) and in the Prometheus
+text exposition format (``CrawlMetrics.to_prometheus``), which can be
+written to a file periodically during a run for node_exporter's textfile
+collector or any scraper of static files.
+"""
+
+import asyncio
+import json
+import os
+import time
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, Optional, Sequence
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+PARSE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+WAIT_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram with Prometheus-style cumulative output"""
+    
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+    
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile by interpolating inside its bucket"""
+        if not self.count:
+            return None
+        
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    # Overflow bucket has no upper bound
+                    return lower
+                upper = self.buckets[i]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+    
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else None,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'buckets': {
+                **{str(bound): count for bound, count in zip(self.buckets, self.counts)},
+                '+Inf': self.counts[-1],
+            },
+        }
+    
+    def prometheus_lines(self, name: str, labels: Dict[str, str]) -> list:
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{_labels(labels, le=bound)} {cumulative}')
+        lines.append(f'{name}_bucket{_labels(labels, le="+Inf")} {self.count}')
+        lines.append(f'{name}_sum{_labels(labels)} {self.sum}')
+        lines.append(f'{name}_count{_labels(labels)} {self.count}')
+        return lines
+
+
+def _labels(labels: Dict[str, str], **extra) -> str:
+    items = {**labels, **{key: str(value) for key, value in extra.items()}}
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in items.items()) + '}'
+
+
+class CrawlMetrics:
+    """Counters, gauges and histograms describing one crawl
+
+    Request latency and downloaded bytes are split by page kind (listing or
+    detail); waits are split by what was waited for (rate_limit,
+    concurrency, semaphore, parse_queue). Together they show whether a
+    crawl is bound by the network, the parser or the rate limiter.
+    """
+    
+    def __init__(self):
+        self.started = time.time()
+        self.latency: Dict[str, Histogram] = {}
+        self.parse_time: Dict[str, Histogram] = {}
+        self.wait_time: Dict[str, Histogram] = {}
+        self.status_counts: Counter = Counter()
+        self.bytes_downloaded: Counter = Counter()
+        self.retries = 0
+        self.early_aborts = 0
+        self.dead_letters = 0
+        self.errors = 0
+        self.records = 0
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.concurrency_limit = 0.0
+    
+    @staticmethod
+    def _observe(histograms: Dict[str, Histogram], key: str, value: float, buckets: Sequence[float]):
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(buckets)
+        histogram.observe(value)
+    
+    def observe_request(self, kind: str, status: Optional[int], seconds: float, size: int = 0):
+        self._observe(self.latency, kind, seconds, LATENCY_BUCKETS)
+        self.status_counts[(kind, str(status) if status is not None else 'error')] += 1
+        self.bytes_downloaded[kind] += size
+        if status is None:
+            self.errors += 1
+    
+    def observe_parse(self, kind: str, seconds: float):
+        self._observe(self.parse_time, kind, seconds, PARSE_BUCKETS)
+    
+    def observe_wait(self, stage: str, seconds: float):
+        self._observe(self.wait_time, stage, seconds, WAIT_BUCKETS)
+    
+    def to_dict(self) -> Dict:
+        """JSON-serialisable summary of the crawl so far"""
+        elapsed = time.time() - self.started
+        requests = sum(self.status_counts.values())
+        return {
+            'elapsed_seconds': round(elapsed, 3),
+            'requests': requests,
+            'requests_per_second': round(requests / elapsed, 3) if elapsed else None,
+            'records': self.records,
+            'retries': self.retries,
+            'early_aborts': self.early_aborts,
+            'dead_letters': self.dead_letters,
+            'errors': self.errors,
+            'bytes_downloaded': dict(self.bytes_downloaded),
+            'status_counts': {f'{kind}:{status}': count for (kind, status), count in sorted(self.status_counts.items())},
+            'in_flight': self.in_flight,
+            'queue_depth': self.queue_depth,
+            'concurrency_limit': self.concurrency_limit,
+            'latency_seconds': {kind: h.to_dict() for kind, h in self.latency.items()},
+            'parse_seconds': {kind: h.to_dict() for kind, h in self.parse_time.items()},
+            'wait_seconds': {stage: h.to_dict() for stage, h in self.wait_time.items()},
+        }
+    
+    def to_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = [
+            '# TYPE vipkadr_requests_total counter',
+            *[f'vipkadr_requests_total{_labels({"kind": kind, "status": status})} {count}'
+              for (kind, status), count in sorted(self.status_counts.items())],
+            '# TYPE vipkadr_bytes_downloaded_total counter',
+            *[f'vipkadr_bytes_downloaded_total{_labels({"kind": kind})} {size}'
+              for kind, size in sorted(self.bytes_downloaded.items())],
+            '# TYPE vipkadr_retries_total counter',
+            f'vipkadr_retries_total {self.retries}',
+            '# TYPE vipkadr_early_aborts_total counter',
+            f'vipkadr_early_aborts_total {self.early_aborts}',
+            '# TYPE vipkadr_dead_letters_total counter',
+            f'vipkadr_dead_letters_total {self.dead_letters}',
+            '# TYPE vipkadr_records_total counter',
+            f'vipkadr_records_total {self.records}',
+            '# TYPE vipkadr_in_flight_requests gauge',
+            f'vipkadr_in_flight_requests {self.in_flight}',
+            '# TYPE vipkadr_queue_depth gauge',
+            f'vipkadr_queue_depth {self.queue_depth}',
+            '# TYPE vipkadr_concurrency_limit gauge',
+            f'vipkadr_concurrency_limit {self.concurrency_limit}',
+        ]
+        for name, label, histograms in (
+            ('vipkadr_request_latency_seconds', 'kind', self.latency),
+            ('vipkadr_parse_seconds', 'kind', self.parse_time),
+            ('vipkadr_wait_seconds', 'stage', self.wait_time),
+        ):
+            lines.append(f'# TYPE {name} histogram')
+            for key, histogram in sorted(histograms.items()):
+                lines.extend(histogram.prometheus_lines(name, {label: key}))
+        return '\n'.join(lines) + '\n'
+    
+    def write_prometheus(self, path: str):
+        """Atomically replace ``path`` with the current metrics"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+    
+    def write_json(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+    
+    async def export_periodically(self, path: str, interval: float = 10.0):
+        """Rewrite the Prometheus file every ``interval`` seconds until cancelled"""
+        try:
+            while True:
+                self.write_prometheus(path)
+                await asyncio.sleep(interval)
+        finally:
+            self.write_prometheus(path)
@@ -0,0 +1,166 @@
+"""
+Normalization helpers for values scraped from vipkadr.az
+"""
+
+import re
+from datetime import date
+from typing import Optional
+
+# Month abbreviations used on vipkadr.az, e.g. "02 İyl 2024"
+AZ_MONTHS = {
+    'Yan': 1, 'Fev': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'İyn': 6,
+    'İyl': 7, 'Avq': 8, 'Sen': 9, 'Okt': 10, 'Noy': 11, 'Dek': 12,
+}
+
+_AZ_DATE_RE = re.compile(r'^\s*(\d{1,2})\s+(\S+)\s+(\d{4})\s*$')
+
+
+def parse_az_date(value: Optional[str]) -> Optional[date]:
+    """Parse a date like "02 İyl 2024" into a date, or None if it is not one"""
+    if not value:
+        return None
+    
+    match = _AZ_DATE_RE.match(value)
+    if not match:
+        return None
+    
+    day, month_name, year = match.groups()
+    month = AZ_MONTHS.get(month_name)
+    if month is None:
+        return None
+    
+    try:
+        return date(int(year), month, int(day))
+    except ValueError:
+        return None
+
+
+# Salary strings look like "700-1000 AZN", "600 AZN" or "Müsahibə əsasında"
+SALARY_RANGE_PATTERN = r'(\d+(?:[.,]\d+)?)(?:\s*[-–]\s*(\d+(?:[.,]\d+)?))?'
+CURRENCY_PATTERN = r'(AZN|MANAT|USD|EUR|₼|\$|€)'
+NEGOTIABLE_PATTERN = r'müsahibə|razılaşma'
+# Thousands are sometimes written with a space ("1 200")
+_THOUSANDS_RE = re.compile(r'(?<=\d)\s+(?=\d{3}\b)')
+_SALARY_RANGE_RE = re.compile(SALARY_RANGE_PATTERN)
+_CURRENCY_RE = re.compile(CURRENCY_PATTERN, re.IGNORECASE)
+_NEGOTIABLE_RE = re.compile(NEGOTIABLE_PATTERN, re.IGNORECASE)
+CURRENCIES = {
+    'AZN': 'AZN', 'MANAT': 'AZN', '₼': 'AZN',
+    'USD': 'USD', '$': 'USD',
+    'EUR': 'EUR', '€': 'EUR',
+}
+
+
+def parse_salary(value: Optional[str]) -> dict:
+    """Split a salary string into min/max/midpoint, currency and a negotiable flag"""
+    result = {
+        'salary_min': None,
+        'salary_max': None,
+        'salary_mid': None,
+        'salary_currency': None,
+        'salary_negotiable': False,
+    }
+    if not value:
+        return result
+    
+    result['salary_negotiable'] = bool(_NEGOTIABLE_RE.search(value))
+    
+    match = _SALARY_RANGE_RE.search(_THOUSANDS_RE.sub('', value))
+    if match:
+        low = float(match.group(1).replace(',', '.'))
+        high = float(match.group(2).replace(',', '.')) if match.group(2) else low
+        result['salary_min'] = min(low, high)
+        result['salary_max'] = max(low, high)
+        result['salary_mid'] = (low + high) / 2
+    
+    currency = _CURRENCY_RE.search(value)
+    if currency:
+        result['salary_currency'] = CURRENCIES[currency.group(1).upper()]
+    
+    return result
+
+
+def parse_int(value: Optional[str]) -> Optional[int]:
+    """Parse an integer field such as views or job_id, or None if empty"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    return int(value) if value.isdigit() else None
+
+
+def parse_age_range(value: Optional[str]) -> tuple:
+    """Parse an age range like "20 - 45" into (20, 45)"""
+    numbers = [int(number) for number in re.findall(r'\d+', value or '')]
+    if not numbers:
+        return None, None
+    return min(numbers[:2]), max(numbers[:2])
+
+
+def typed_record(record: dict) -> dict:
+    """Return a copy of a scraped record with typed values added
+
+    Adds ``salary_min``/``salary_max``/``salary_mid``/``salary_currency``/
+    ``salary_negotiable`` and ``age_min``/``age_max``, and converts
+    ``job_id`` and ``views`` to int and the dates to ``datetime.date``.
+    """
+    typed = dict(record)
+    typed.update(parse_salary(record.get('salary')))
+    typed['age_min'], typed['age_max'] = parse_age_range(record.get('age'))
+    typed['job_id'] = parse_int(record.get('job_id'))
+    typed['views'] = parse_int(record.get('views'))
+    typed['added_date'] = parse_az_date(record.get('added_date'))
+    typed['end_date'] = parse_az_date(record.get('end_date'))
+    return typed
+
+
+# Whole-column versions of the parsers above, for pandas Series. They use the
+# same patterns, so scrape-time and analysis-time values always agree.
+
+def parse_salary_column(series):
+    """Vectorized ``parse_salary``: return a DataFrame with one column per salary field"""
+    import pandas as pd
+    
+    text = series.fillna('').astype(str)
+    numbers = text.str.replace(_THOUSANDS_RE.pattern, '', regex=True).str.extract(SALARY_RANGE_PATTERN)
+    low = pd.to_numeric(numbers[0].str.replace(',', '.'), errors='coerce')
+    high = pd.to_numeric(numbers[1].str.replace(',', '.'), errors='coerce').fillna(low)
+    currency = text.str.extract(CURRENCY_PATTERN, flags=re.IGNORECASE)[0].str.upper().map(CURRENCIES)
+    
+    return pd.DataFrame({
+        'salary_min': low.where(low <= high, high),
+        'salary_max': high.where(high >= low, low),
+        'salary_mid': (low + high) / 2,
+        'salary_currency': currency,
+        'salary_negotiable': text.str.contains(NEGOTIABLE_PATTERN, case=False, regex=True),
+    }, index=series.index)
+
+
+def parse_az_date_column(series):
+    """Vectorized ``parse_az_date``: return a datetime64 Series, NaT where unparseable"""
+    import pandas as pd
+    
+    parts = series.fillna('').astype(str).str.extract(_AZ_DATE_RE.pattern)
+    return pd.to_datetime(pd.DataFrame({
+        'year': pd.to_numeric(parts[2], errors='coerce'),
+        'month': parts[1].map(AZ_MONTHS),
+        'day': pd.to_numeric(parts[0], errors='coerce'),
+    }), errors='coerce')
+
+
+# Azerbaijani case folding: dotted İ lowercases to i and dotless I to ı,
+# which str.lower() gets wrong ("İ".lower() is "i̇", "I".lower() is "i")
+_AZ_LOWER = str.maketrans({'İ': 'i', 'I': 'ı'})
+_AZ_ASCII = str.maketrans({'ə': 'e', 'ı': 'i', 'ö': 'o', 'ü': 'u', 'ç': 'c', 'ş': 's', 'ğ': 'g'})
+
+
+def fold_az(text: Optional[str], ascii: bool = False) -> str:
+    """Lowercase text with Azerbaijani rules
+
+    With ``ascii=True`` the Azerbaijani letters are also reduced to their
+    plain Latin base (ə→e, ı→i, ş→s, ...), so "Menecer", "MENECER" and
+    "meneçer" all fold to the same string.
+    """
+    if not text:
+        return ''
+    folded = text.translate(_AZ_LOWER).lower()
+    return folded.translate(_AZ_ASCII) if ascii else folded
@@ -0,0 +1,502 @@
+"""
+HTML parser engines for vipkadr.az listing and detail pages
+
+The BeautifulSoup engine is the reference implementation; the lxml engine
+uses precompiled XPath expressions and must produce identical output. Run
+``python parsers.py PAGES_DIR`` to compare both engines on a directory of
+saved pages or an ``HtmlArchive`` directory; tests/test_parsers.py does the
+same for the saved pages in tests/fixtures/pages.
+
+Known difference: html.parser reads the content of a ``<textarea>`` as
+markup, while lxml keeps it as raw text, as browsers do. A ``<b>`` inside
+a textarea therefore contributes "bold" with bs4 and "<b>bold</b>" with
+lxml. Job pages have no textareas in the blocks a record is built from.
+"""
+
+import argparse
+import logging
+import os
+import re
+import sys
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+JOB_URL_RE = re.compile(r"window\.open\('([^']+)'\)")
+JOB_ID_RE = re.compile(r'#(\d+)')
+VIEWS_RE = re.compile(r'Baxış.*?(\d+)')
+
+
+def empty_job(job_url: str) -> Dict:
+    """Return a job record with every field present and empty"""
+    return {
+        'url': job_url,
+        'title': '',
+        'salary': '',
+        'company': '',
+        'contact_person': '',
+        'phone': '',
+        'email': '',
+        'city': '',
+        'work_type': '',
+        'experience': '',
+        'education': '',
+        'gender': '',
+        'age': '',
+        'description': '',
+        'requirements': '',
+        'added_date': '',
+        'end_date': '',
+        'job_id': '',
+        'views': ''
+    }
+
+
+# Label text of each ty-product-feature row and the field it fills, in match order
+FEATURE_FIELDS = (
+    ('Maaş', 'salary'),
+    ('Əlaqədar şəxs', 'contact_person'),
+    ('Telefon', 'phone'),
+    ('Email', 'email'),
+    ('Əlavə olunma tarixi', 'added_date'),
+    ('Bitmə tarixi', 'end_date'),
+    ('İş vaxtı', 'work_type'),
+    ('Şəhər', 'city'),
+    ('İş təcrübəsi', 'experience'),
+    ('Cins', 'gender'),
+    ('Yaş', 'age'),
+)
+
+
+def feature_field(label: str) -> Optional[str]:
+    """The record field a ty-product-feature label fills, or None if it is not one"""
+    for marker, field in FEATURE_FIELDS:
+        if marker in label:
+            return field
+    return None
+
+
+def _assign_feature(job_data: Dict, label: str, value: str,
+                    link_text: Optional[str] = None, link_href: Optional[str] = None):
+    """Store one ty-product-feature label/value pair in the job record"""
+    field = feature_field(label)
+    if field == 'phone':
+        # Extract phone from link
+        if link_text is not None:
+            job_data['phone'] = link_text
+        else:
+            job_data['phone'] = value
+    elif field == 'email':
+        # Extract email from link
+        if link_href is not None:
+            if link_href.startswith('mailto:'):
+                job_data['email'] = link_href.replace('mailto:', '').split('?')[0]
+        else:
+            job_data['email'] = value
+    elif field is not None:
+        job_data[field] = value
+
+
+# ----------------------------------------------------------------------------
+# BeautifulSoup engine (reference)
+# ----------------------------------------------------------------------------
+
+def parse_job_urls(html_content: str, base_url: str) -> List[str]:
+    """Extract job URLs from a listing page"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    job_urls = []
+    
+    # Find all job listing items
+    job_items = soup.find_all('div', class_='ty-column5')
+    
+    for item in job_items:
+        onclick_attr = item.get('onclick', '')
+        if 'window.open(' in onclick_attr:
+            # Extract URL from onclick="window.open('URL')"
+            url_match = JOB_URL_RE.search(onclick_attr)
+            if url_match:
+                relative_url = url_match.group(1)
+                full_url = urljoin(base_url, relative_url)
+                job_urls.append(full_url)
+    
+    return job_urls
+
+
+def parse_job_details(html_content: str, job_url: str) -> Dict:
+    """Extract detailed job information from individual job page"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    
+    job_data = empty_job(job_url)
+    
+    try:
+        # Extract title
+        title_elem = soup.find('h3', class_='fpname')
+        if title_elem:
+            job_data['title'] = title_elem.get_text(strip=True)
+        
+        # Extract job ID and views
+        view_count_elem = soup.find('div', class_='view_count')
+        if view_count_elem:
+            view_text = view_count_elem.get_text()
+            job_id_match = JOB_ID_RE.search(view_text)
+            if job_id_match:
+                job_data['job_id'] = job_id_match.group(1)
+        
+            views_match = VIEWS_RE.search(view_text)
+            if views_match:
+                job_data['views'] = views_match.group(1)
+        
+        # Extract company
+        company_elem = soup.find('div', class_='view_count', style='margin-top: 10px')
+        if company_elem:
+            company_text = company_elem.get_text()
+            if 'Şirkət' in company_text:
+                job_data['company'] = company_text.replace('Şirkət :', '').strip()
+        
+        # Extract product features (salary, contact info, etc.)
+        feature_divs = soup.find_all('div', class_='ty-product-feature')
+        for feature in feature_divs:
+            label_elem = feature.find('span', class_='ty-product-feature__label')
+            value_elem = feature.find('div', class_='ty-product-feature__value')
+        
+            if label_elem and value_elem:
+                label = label_elem.get_text(strip=True)
+                value = value_elem.get_text(strip=True)
+        
+                link = value_elem.find('a')
+                if link:
+                    _assign_feature(job_data, label, value, link.get_text(strip=True), link.get('href', ''))
+                else:
+                    _assign_feature(job_data, label, value)
+        
+        # Extract description
+        desc_elem = soup.find('div', class_='descriptions')
+        if desc_elem:
+            # Get first div content (job description)
+            first_div = desc_elem.find('div')
+            if first_div:
+                job_data['description'] = first_div.get_text(strip=True).replace('<br>', '\n')
+        
+        # Extract requirements (from "Tələblər" section)
+        req_section = None
+        h3_elements = soup.find_all('h3')
+        for h3 in h3_elements:
+            if 'Tələblər' in h3.get_text():
+                req_section = h3.find_next_sibling('div')
+                break
+        
+        if req_section:
+            job_data['requirements'] = req_section.get_text(strip=True).replace('<br>', '\n')
+        
+    except Exception as e:
+        logger.error(f"Error parsing job details for {job_url}: {e}")
+    
+    return job_data
+
+
+# ----------------------------------------------------------------------------
+# lxml engine (fast)
+# ----------------------------------------------------------------------------
+
+def _class_test(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+_XP_JOB_ITEMS = etree.XPath(f"//div[{_class_test('ty-column5')}]")
+_XP_TITLE = etree.XPath(f"(//h3[{_class_test('fpname')}])[1]")
+_XP_VIEW_COUNT = etree.XPath(f"(//div[{_class_test('view_count')}])[1]")
+_XP_COMPANY = etree.XPath(f"(//div[{_class_test('view_count')} and @style='margin-top: 10px'])[1]")
+_XP_FEATURES = etree.XPath(f"//div[{_class_test('ty-product-feature')}]")
+_XP_FEATURE_LABEL = etree.XPath(f"(.//span[{_class_test('ty-product-feature__label')}])[1]")
+_XP_FEATURE_VALUE = etree.XPath(f"(.//div[{_class_test('ty-product-feature__value')}])[1]")
+_XP_FIRST_LINK = etree.XPath("(.//a)[1]")
+_XP_DESCRIPTIONS = etree.XPath(f"(//div[{_class_test('descriptions')}])[1]")
+_XP_FIRST_DIV = etree.XPath("(.//div)[1]")
+_XP_H3 = etree.XPath("//h3")
+_XP_NEXT_DIV = etree.XPath("following-sibling::div[1]")
+
+# Strings BeautifulSoup's get_text() leaves out
+_SKIP_TEXT_TAGS = {'script', 'style', 'template'}
+
+_HTML_PARSER = etree.HTMLParser(encoding='utf-8')
+
+
+def _parse_tree(html_content: str):
+    try:
+        return etree.fromstring(html_content.encode('utf-8'), _HTML_PARSER)
+    except etree.XMLSyntaxError:
+        # Raised for documents with no content at all
+        return None
+
+
+def _strings(elem):
+    """Yield the text nodes under elem in document order, like BeautifulSoup"""
+    if isinstance(elem.tag, str) and elem.tag not in _SKIP_TEXT_TAGS and elem.text:
+        yield elem.text
+    elif elem.tag is etree.Comment and elem.text and elem.text.startswith('[CDATA[') \
+            and elem.text.endswith(']]'):
+        # libxml2 turns <![CDATA[...]]> into a comment, BeautifulSoup keeps it as text
+        yield elem.text[7:-2]
+    for child in elem:
+        yield from _strings(child)
+        if child.tail:
+            yield child.tail
+
+
+def _text(elem, strip: bool = False) -> str:
+    """Equivalent of BeautifulSoup's Tag.get_text() / get_text(strip=True)"""
+    if strip:
+        return ''.join(part for part in (s.strip() for s in _strings(elem)) if part)
+    return ''.join(_strings(elem))
+
+
+def _first(xpath, elem):
+    found = xpath(elem)
+    return found[0] if found else None
+
+
+def lxml_parse_job_urls(html_content: str, base_url: str) -> List[str]:
+    """Extract job URLs from a listing page using lxml"""
+    job_urls = []
+    root = _parse_tree(html_content)
+    if root is None:
+        return job_urls
+    
+    for item in _XP_JOB_ITEMS(root):
+        onclick_attr = item.get('onclick', '')
+        if 'window.open(' in onclick_attr:
+            url_match = JOB_URL_RE.search(onclick_attr)
+            if url_match:
+                job_urls.append(urljoin(base_url, url_match.group(1)))
+    
+    return job_urls
+
+
+def lxml_parse_job_details(html_content: str, job_url: str) -> Dict:
+    """Extract detailed job information from a job page using lxml"""
+    job_data = empty_job(job_url)
+    
+    try:
+        root = _parse_tree(html_content)
+        if root is None:
+            return job_data
+        
+        title_elem = _first(_XP_TITLE, root)
+        if title_elem is not None:
+            job_data['title'] = _text(title_elem, strip=True)
+        
+        view_count_elem = _first(_XP_VIEW_COUNT, root)
+        if view_count_elem is not None:
+            view_text = _text(view_count_elem)
+            job_id_match = JOB_ID_RE.search(view_text)
+            if job_id_match:
+                job_data['job_id'] = job_id_match.group(1)
+            
+            views_match = VIEWS_RE.search(view_text)
+            if views_match:
+                job_data['views'] = views_match.group(1)
+        
+        company_elem = _first(_XP_COMPANY, root)
+        if company_elem is not None:
+            company_text = _text(company_elem)
+            if 'Şirkət' in company_text:
+                job_data['company'] = company_text.replace('Şirkət :', '').strip()
+        
+        for feature in _XP_FEATURES(root):
+            label_elem = _first(_XP_FEATURE_LABEL, feature)
+            value_elem = _first(_XP_FEATURE_VALUE, feature)
+            
+            if label_elem is not None and value_elem is not None:
+                label = _text(label_elem, strip=True)
+                value = _text(value_elem, strip=True)
+                
+                link = _first(_XP_FIRST_LINK, value_elem)
+                if link is not None:
+                    _assign_feature(job_data, label, value, _text(link, strip=True), link.get('href', ''))
+                else:
+                    _assign_feature(job_data, label, value)
+        
+        desc_elem = _first(_XP_DESCRIPTIONS, root)
+        if desc_elem is not None:
+            first_div = _first(_XP_FIRST_DIV, desc_elem)
+            if first_div is not None:
+                job_data['description'] = _text(first_div, strip=True).replace('<br>', '\n')
+        
+        for h3 in _XP_H3(root):
+            if 'Tələblər' in _text(h3):
+                req_section = _first(_XP_NEXT_DIV, h3)
+                if req_section is not None:
+                    job_data['requirements'] = _text(req_section, strip=True).replace('<br>', '\n')
+                break
+    
+    except Exception as e:
+        logger.error(f"Error parsing job details for {job_url}: {e}")
+    
+    return job_data
+
+
+# ----------------------------------------------------------------------------
+# Incremental section watcher (streamed detail pages)
+# ----------------------------------------------------------------------------
+
+def _has_class(elem, name: str) -> bool:
+    return name in (elem.get('class') or '').split()
+
+
+class DetailSectionWatcher:
+    """Incrementally parse a detail page and report when every field has been seen
+
+    Every field of a job record comes from a few blocks: the first
+    ``h3.fpname``, the first ``div.view_count``, the company
+    ``view_count``, one ``ty-product-feature`` row per field in
+    ``FEATURE_FIELDS``, the first ``div.descriptions`` and the div after
+    the "Tələblər" heading. Once all of them are closed, the rest of the
+    page cannot change the record, so the caller can stop reading and parse
+    the text received so far. The feature rows are counted one by one
+    rather than by their container, since a page may split them across
+    several. A page missing any block or feature row is read to the end.
+    """
+    
+    SECTIONS = ('title', 'views', 'company', 'features', 'description', 'requirements')
+    
+    def __init__(self):
+        self._parser = etree.HTMLPullParser(events=('end',))
+        self.seen = set()
+        self.features = set()
+        self._requirements_parent = None
+    
+    @property
+    def complete(self) -> bool:
+        return len(self.seen) == len(self.SECTIONS)
+    
+    def feed(self, text: str) -> bool:
+        """Feed the next piece of the page; returns True once all sections are closed"""
+        if self.complete:
+            return True
+        self._parser.feed(text)
+        for _, elem in self._parser.read_events():
+            self._end(elem)
+        return self.complete
+    
+    def _end(self, elem):
+        tag = elem.tag
+        if self._requirements_parent is not None and 'requirements' not in self.seen:
+            # The first div after the heading, or its parent closing without one
+            if elem is self._requirements_parent or (
+                    tag == 'div' and elem.getparent() is self._requirements_parent):
+                self.seen.add('requirements')
+        
+        if tag == 'h3':
+            if 'title' not in self.seen and _has_class(elem, 'fpname'):
+                self.seen.add('title')
+            if self._requirements_parent is None and 'Tələblər' in _text(elem):
+                self._requirements_parent = elem.getparent()
+        elif tag == 'div':
+            if _has_class(elem, 'view_count'):
+                self.seen.add('views')
+                if elem.get('style') == 'margin-top: 10px':
+                    self.seen.add('company')
+            elif _has_class(elem, 'ty-product-feature') and 'features' not in self.seen:
+                label_elem = _first(_XP_FEATURE_LABEL, elem)
+                field = feature_field(_text(label_elem)) if label_elem is not None else None
+                if field is not None:
+                    self.features.add(field)
+                    if len(self.features) == len(FEATURE_FIELDS):
+                        self.seen.add('features')
+            elif _has_class(elem, 'descriptions'):
+                self.seen.add('description')
+
+
+# ----------------------------------------------------------------------------
+# Engine registry
+# ----------------------------------------------------------------------------
+
+class ParserEngine(NamedTuple):
+    name: str
+    job_urls: Callable[[str, str], List[str]]
+    job_details: Callable[[str, str], Dict]
+
+
+ENGINES = {
+    'bs4': ParserEngine('bs4', parse_job_urls, parse_job_details),
+    'lxml': ParserEngine('lxml', lxml_parse_job_urls, lxml_parse_job_details),
+}
+
+
+def get_engine(name: str) -> ParserEngine:
+    """Look up a parser engine by name"""
+    try:
+        return ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Unknown parser engine {name!r}, expected one of: {', '.join(ENGINES)}")
+
+
+def compare_engines(pages, base_url: str = "https://vipkadr.az", reference: str = 'bs4', candidate: str = 'lxml'):
+    """Run two engines over (url, html) pairs and collect timings and mismatches"""
+    engines = (get_engine(reference), get_engine(candidate))
+    timings = {engine.name: 0.0 for engine in engines}
+    mismatches = []
+    count = 0
+    
+    for url, html_content in pages:
+        count += 1
+        outputs = []
+        for engine in engines:
+            started = time.perf_counter()
+            output = (engine.job_urls(html_content, base_url), engine.job_details(html_content, url))
+            timings[engine.name] += time.perf_counter() - started
+            outputs.append(output)
+        
+        if outputs[0] != outputs[1]:
+            mismatches.append((url, outputs[0], outputs[1]))
+    
+    return count, timings, mismatches
+
+
+def _iter_saved_pages(directory: str):
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(('.html', '.htm')):
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                yield name, f.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that parser engines agree on saved pages")
+    parser.add_argument("pages_dir", help="Directory of saved .html pages, or an HtmlArchive directory")
+    parser.add_argument("--reference", default='bs4', choices=ENGINES)
+    parser.add_argument("--candidate", default='lxml', choices=ENGINES)
+    args = parser.parse_args()
+    
+    if os.path.exists(os.path.join(args.pages_dir, 'index.jsonl')):
+        from html_archive import HtmlArchive
+        pages = HtmlArchive(args.pages_dir, replay=True).iter_pages()
+    else:
+        pages = _iter_saved_pages(args.pages_dir)
+    
+    count, timings, mismatches = compare_engines(
+        pages, reference=args.reference, candidate=args.candidate
+    )
+    
+    for url, expected, actual in mismatches:
+        print(f"MISMATCH {url}")
+        for key in expected[1]:
+            if expected[1][key] != actual[1].get(key):
+                print(f"  {key}: {expected[1][key]!r} != {actual[1].get(key)!r}")
+        if expected[0] != actual[0]:
+            print(f"  job_urls: {len(expected[0])} != {len(actual[0])}")
+    
+    print(f"{count} pages, {len(mismatches)} mismatches")
+    for name, seconds in timings.items():
+        per_page = seconds / count * 1000 if count else 0.0
+        print(f"  {name}: {seconds:.3f}s total, {per_page:.2f} ms/page")
+    
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
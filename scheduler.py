@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Priority recrawl scheduling for a fixed request budget
+
+Postings do not change at the same pace: one added recently, gaining
+views quickly or close to its ``end_date`` is worth refetching far more
+often than one that has sat unchanged for weeks. ``RecrawlScheduler`` keeps, for every known
+posting, how often its content and view count changed between fetches
+and ranks postings by the expected value of fetching them now; a run then
+spends its budget on the top of that ranking.
+
+    python scheduler.py plan --budget 200       # show what the next run would fetch
+"""
+
+import argparse
+import hashlib
+import heapq
+import json
+import math
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from normalize import parse_az_date
+
+SCHEDULE_FILE = "vipkadr_schedule.db"
+
+# Fields whose change counts as a content change (views are tracked apart)
+CONTENT_FIELDS = (
+    'title', 'salary', 'company', 'contact_person', 'phone', 'email', 'city',
+    'work_type', 'experience', 'education', 'gender', 'age', 'description',
+    'requirements', 'added_date', 'end_date'
+)
+
+
+def content_digest(record: Dict) -> str:
+    text = '\x1f'.join(record.get(field) or '' for field in CONTENT_FIELDS)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _views(record: Dict) -> Optional[int]:
+    views = str(record.get('views') or '')
+    return int(views) if views.isdigit() else None
+
+
+class RecrawlScheduler:
+    """SQLite-backed next-due times and priorities for known postings
+    
+    The content of a posting is assumed to change as a Poisson process
+    whose rate is estimated from the changes seen so far, starting from a
+    prior of one change per ``prior_change_days``. The value of a fetch
+    after ``age`` seconds is
+    
+        P(content changed)          1 - exp(-rate * age)
+      + views_weight * staleness    1 - exp(-expected views gained / views_scale)
+      + newness_weight * newness    exp(-days since added_date / newness_days)
+      + expiry_weight               if the posting ends within ``expiry_window`` days
+    
+    divided by one plus the number of consecutive failed fetches. Postings
+    never fetched come first; postings already fetched after their end
+    date will not change again and are never scheduled. A posting is due
+    once its change probability reaches one half.
+    """
+    
+    def __init__(self, path: str = SCHEDULE_FILE, prior_change_days: float = 14.0,
+                 views_weight: float = 0.5, views_scale: float = 50.0,
+                 newness_weight: float = 0.5, newness_days: float = 3.0,
+                 expiry_weight: float = 0.5, expiry_window: float = 1.0):
+        self.path = path
+        self.prior_change_days = prior_change_days
+        self.views_weight = views_weight
+        self.views_scale = views_scale
+        self.newness_weight = newness_weight
+        self.newness_days = newness_days
+        self.expiry_weight = expiry_weight
+        self.expiry_window = expiry_window
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schedule (
+                url TEXT PRIMARY KEY,
+                discovered_at REAL NOT NULL,
+                added_date TEXT,
+                end_date TEXT,
+                first_fetched REAL,
+                last_fetched REAL,
+                fetches INTEGER NOT NULL DEFAULT 0,
+                changes INTEGER NOT NULL DEFAULT 0,
+                failures INTEGER NOT NULL DEFAULT 0,
+                digest TEXT,
+                views INTEGER,
+                views_rate REAL NOT NULL DEFAULT 0,
+                next_due REAL NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self.conn.commit()
+    
+    def __contains__(self, url: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM schedule WHERE url = ?", (url,)).fetchone() is not None
+    
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM schedule").fetchone()[0]
+    
+    def add(self, urls: Iterable[str], now: Optional[float] = None) -> int:
+        """Register newly discovered URLs; returns how many were new"""
+        now = time.time() if now is None else now
+        before = self.conn.total_changes
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO schedule (url, discovered_at) VALUES (?, ?)",
+            [(url, now) for url in urls]
+        )
+        self.conn.commit()
+        return self.conn.total_changes - before
+    
+    def _get(self, url: str) -> Optional[sqlite3.Row]:
+        self.conn.row_factory = sqlite3.Row
+        try:
+            return self.conn.execute("SELECT * FROM schedule WHERE url = ?", (url,)).fetchone()
+        finally:
+            self.conn.row_factory = None
+    
+    def change_rate(self, row) -> float:
+        """Estimated content changes per second"""
+        observed = (row['last_fetched'] - row['first_fetched']) if row['first_fetched'] else 0.0
+        prior = self.prior_change_days * 86400
+        return (row['changes'] + 1) / (observed + prior)
+    
+    def observe(self, record: Dict, now: Optional[float] = None):
+        """Update a posting's statistics after fetching it"""
+        now = time.time() if now is None else now
+        url = record['url']
+        row = self._get(url)
+        digest = content_digest(record)
+        views = _views(record)
+        
+        if row is None or row['last_fetched'] is None:
+            fetches, changes, views_rate = 1, 0, 0.0
+            first_fetched = now
+        else:
+            fetches = row['fetches'] + 1
+            changes = row['changes'] + (digest != row['digest'])
+            first_fetched = row['first_fetched']
+            views_rate = row['views_rate']
+            elapsed = now - row['last_fetched']
+            if views is not None and row['views'] is not None and elapsed > 0:
+                observed_rate = max(0, views - row['views']) * 86400 / elapsed
+                # First measurement replaces the zero start, later ones are smoothed
+                views_rate = observed_rate if fetches == 2 else 0.5 * views_rate + 0.5 * observed_rate
+        
+        entry = {'first_fetched': first_fetched, 'last_fetched': now, 'changes': changes}
+        next_due = now + math.log(2) / self.change_rate(entry)
+        end_date = parse_az_date(record.get('end_date'))
+        if end_date is not None:
+            # Catch the final state of a posting right after it ends
+            end_ts = (datetime(end_date.year, end_date.month, end_date.day) + timedelta(days=1)).timestamp()
+            if end_ts > now:
+                next_due = min(next_due, end_ts)
+        
+        self.conn.execute(
+            "INSERT OR REPLACE INTO schedule "
+            "(url, discovered_at, added_date, end_date, first_fetched, last_fetched, fetches, changes, "
+            "failures, digest, views, views_rate, next_due) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0, ?, ?, ?, ?)",
+            (url, row['discovered_at'] if row is not None else now, record.get('added_date', ''),
+             record.get('end_date', ''), first_fetched, now, fetches, changes, digest,
+             views, views_rate, next_due)
+        )
+        self.conn.commit()
+    
+    def observe_failure(self, url: str):
+        """Record a failed fetch, which lowers the posting's priority"""
+        self.conn.execute("UPDATE schedule SET failures = failures + 1 WHERE url = ?", (url,))
+        self.conn.commit()
+    
+    def priority(self, row, now: float, today: Optional[date] = None) -> float:
+        """Expected value of fetching a posting now (see the class docstring)"""
+        if row['last_fetched'] is None:
+            # Postings never fetched come before everything else
+            return 1e6 / (1 + row['failures'])
+        
+        today = today or date.fromtimestamp(now)
+        end_date = parse_az_date(row['end_date'])
+        if end_date is not None and date.fromtimestamp(row['last_fetched']) > end_date:
+            return 0.0
+        
+        age = max(0.0, now - row['last_fetched'])
+        value = 1 - math.exp(-self.change_rate(row) * age)
+        expected_views = row['views_rate'] * age / 86400
+        value += self.views_weight * (1 - math.exp(-expected_views / self.views_scale))
+        added_date = parse_az_date(row['added_date'])
+        if added_date is not None:
+            # Young postings still gather most of their views and edits
+            posting_age = max(0, (today - added_date).days)
+            value += self.newness_weight * math.exp(-posting_age / self.newness_days)
+        if end_date is not None and (end_date - today).days <= self.expiry_window:
+            value += self.expiry_weight
+        return value / (1 + row['failures'])
+    
+    def plan(self, budget: int, now: Optional[float] = None) -> List[Dict]:
+        """The ``budget`` most valuable postings to fetch now, due ones first"""
+        now = time.time() if now is None else now
+        today = date.fromtimestamp(now)
+        self.conn.row_factory = sqlite3.Row
+        try:
+            rows = self.conn.execute("SELECT * FROM schedule").fetchall()
+        finally:
+            self.conn.row_factory = None
+        
+        ranked = []
+        for row in rows:
+            value = self.priority(row, now, today)
+            if value > 0:
+                due = row['last_fetched'] is None or row['next_due'] <= now
+                ranked.append((due, value, row['url'], row['next_due']))
+        return [
+            {'url': url, 'priority': value, 'due': due, 'next_due': next_due}
+            for due, value, url, next_due in heapq.nlargest(budget, ranked)
+        ]
+    
+    def select(self, budget: int, now: Optional[float] = None) -> List[str]:
+        return [entry['url'] for entry in self.plan(budget, now)]
+    
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the recrawl plan for a request budget")
+    parser.add_argument("--db", default=SCHEDULE_FILE, help=f"Schedule file (default: {SCHEDULE_FILE})")
+    commands = parser.add_subparsers(dest='command', required=True)
+    plan_parser = commands.add_parser('plan', help="Postings the next run would fetch")
+    plan_parser.add_argument("--budget", type=int, default=100)
+    plan_parser.add_argument("--json", action="store_true", help="Print the plan as JSON")
+    args = parser.parse_args()
+    
+    scheduler = RecrawlScheduler(args.db)
+    try:
+        plan = scheduler.plan(args.budget)
+        if args.json:
+            print(json.dumps(plan, indent=2))
+            return
+        print(f"{len(plan)} of {len(scheduler)} postings within a budget of {args.budget}")
+        for entry in plan:
+            due = 'due' if entry['due'] else time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['next_due']))
+            print(f"{entry['priority']:10.3f}  {due:<16}  {entry['url']}")
+    finally:
+        scheduler.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,52 @@
 VipKadr.az Candidate Scraper - Scrapes all candidate data from job listings
 """
 
+import argparse
 import asyncio
+import os
 import time
 from datetime import datetime
+from aggregates import AGGREGATES_FILE, AggregateCube
+from checkpoint import CrawlCheckpoint
+from dead_letter import DEAD_LETTER_FILE, DeadLetterQueue
+from dedup import DEDUP_FILE, DuplicateIndex
+from html_archive import HtmlArchive
+from job_store import JobStore
+from metrics import CrawlMetrics
+from parsers import ENGINES
+from scheduler import SCHEDULE_FILE, RecrawlScheduler
+from search_index import INDEX_DIR, update_search_index
+from titles import TITLES_FILE, TitleCanonicalizer
+from view_history import VIEWS_DIR, ViewHistory
 from vipkadr_scraper import VipKadrScraper
+from writers import (CSV_FILE, JSON_FILE, NDJSON_FILE, PARQUET_FILE, CSVStreamWriter,
+                     NDJSONStreamWriter, ndjson_to_json, ndjson_to_parquet, pa, read_ndjson)
 
-async def scrape_all_candidates():
+CHECKPOINT_FILE = "vipkadr_crawl.checkpoint.json"
+METRICS_JSON_FILE = "vipkadr_crawl_metrics.json"
+
+
+class ContactStats:
+    """Writer that only counts contact details for the run summary"""
+    
+    def __init__(self):
+        self.with_phone = 0
+        self.with_email = 0
+    
+    def write(self, record):
+        self.with_phone += bool(record.get('phone'))
+        self.with_email += bool(record.get('email'))
+
+
+async def scrape_all_candidates(store_path=None, max_age_hours=24, end_page=None, parse_workers=0,
+                                parser='bs4', record_dir=None, replay_dir=None, resume=False,
+                                checkpoint_path=CHECKPOINT_FILE, metrics_file=None,
+                                dedup_path=DEDUP_FILE, stream_details=False, budget=None,
+                                schedule_path=SCHEDULE_FILE):
     """Scrape all candidates from all pages by default"""
+    if budget and not store_path:
+        # The outputs are rewritten, and a budgeted run only fetches part of them
+        raise ValueError("A request budget needs a job store to fill in the postings it does not fetch")
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     
     print("🚀 VipKadr.az Candidate Scraper")
@@ -19,64 +58,223 @@ async def scrape_all_candidates():
     
     start_time = time.time()
     
-    # Auto-detect last page or use high default
-    async with VipKadrScraper(max_concurrent=15, delay=0.2) as scraper:
+    # Incremental mode: postings fetched recently are served from the store
+    job_store = JobStore(store_path, max_age=max_age_hours * 3600) if store_path else None
+    
+    # Record raw responses, or re-extract everything from a recorded crawl offline
+    archive = None
+    if replay_dir:
+        archive = HtmlArchive(replay_dir, replay=True)
+        print(f"📼 Replaying {len(archive)} archived pages from {replay_dir}")
+    elif record_dir:
+        archive = HtmlArchive(record_dir)
+    
+    # Reposts of the same description are flagged with duplicate_of
+    dedup = DuplicateIndex(dedup_path)
+    # Title variants get a shared title_canonical
+    titles = TitleCanonicalizer(TITLES_FILE)
+    
+    # Records are streamed to disk as they complete instead of held in memory
+    csv_writer = CSVStreamWriter(CSV_FILE)
+    contact_stats = ContactStats()
+    # Chart and summary aggregates are built in the same pass
+    cube = AggregateCube()
+    # View counts of this crawl are added to the history of earlier ones
+    view_history = ViewHistory(VIEWS_DIR)
+    resumed_records = 0
+    
+    if resume:
+        # The NDJSON output is the source of truth for what an earlier run finished
+        checkpoint = CrawlCheckpoint.load(checkpoint_path)
+        previous_output = NDJSON_FILE + '.part' if os.path.exists(NDJSON_FILE + '.part') else NDJSON_FILE
+        if os.path.exists(previous_output):
+            for record in read_ndjson(previous_output):
+                checkpoint.complete(record['url'])
+                csv_writer.write(record)
+                contact_stats.write(record)
+                cube.write(record)
+                resumed_records += 1
+        print(f"⏯️  Resuming crawl: {resumed_records} candidates already saved, "
+              f"{len(checkpoint.pending_urls())} pending")
+    else:
+        checkpoint = CrawlCheckpoint(checkpoint_path)
+    ndjson_writer = NDJSONStreamWriter(NDJSON_FILE, append=resume)
+    
+    # URLs that fail for good are kept for a later 'python dead_letter.py drain'
+    dead_letters = DeadLetterQueue(DEAD_LETTER_FILE)
+    
+    # Budgeted runs rank postings by expected change instead of crawling everything
+    scheduler = RecrawlScheduler(schedule_path) if budget else None
+    
+    # Live Prometheus metrics in metrics_file, JSON summary at the end
+    metrics = CrawlMetrics()
+    exporter = asyncio.create_task(metrics.export_periodically(metrics_file)) if metrics_file else None
+    
+    async with VipKadrScraper(max_concurrent=30, requests_per_second=20, job_store=job_store,
+                              parse_workers=parse_workers, parser=parser, archive=archive,
+                              writers=[csv_writer, ndjson_writer, contact_stats, cube, view_history],
+                              keep_in_memory=False, checkpoint=checkpoint,
+                              metrics=metrics, dedup=dedup,
+                              titles=titles, stream_details=stream_details,
+                              dead_letters=dead_letters) as scraper:
         try:
-            # Get all candidate URLs from all pages (1 to 100 to ensure we get everything)
-            print("\n📋 Collecting candidate URLs from all pages...")
-            job_urls = await scraper.scrape_all_pages(start_page=1, end_page=100)
+            if scheduler is not None:
+                # Only the most valuable pages are fetched within the request budget
+                print(f"\n📋 Refreshing the most valuable candidates within {budget} requests...")
+                await scraper.scrape_scheduled(scheduler, budget, start_page=1, end_page=end_page)
+            else:
+                # Listing pages feed detail fetches as they are parsed; the last page is discovered
+                print("\n📋 Collecting and extracting candidates from all pages...")
+                await scraper.scrape_pipelined(start_page=1, end_page=end_page)
             
-            if not job_urls:
+            if not scraper.job_urls_found:
                 print("❌ No candidate URLs found")
+                checkpoint.clear()
                 return
                 
-            print(f"✅ Found {len(job_urls)} unique candidate listings")
-            
-            # Scrape all candidate details
-            print(f"\n🔍 Extracting detailed information for {len(job_urls)} candidates...")
-            await scraper.scrape_all_jobs(job_urls)
+            print(f"✅ Found {scraper.job_urls_found} unique candidate listings")
+            if job_store:
+                print(f"♻️  Reused {scraper.skipped_known} unchanged candidates from {store_path}")
             
-            if not scraper.scraped_data:
+            if not scraper.records_scraped + resumed_records:
                 print("❌ No candidate details were scraped")
                 return
             
-            # Save only latest results (most detailed version)
-            print(f"\n💾 Saving candidate data...")
-            scraper.save_to_csv("vipkadr_candidates.csv")
-            scraper.save_to_json("vipkadr_candidates.json")
+            # The crawl finished, so there is nothing left to resume
+            checkpoint.clear()
             
             end_time = time.time()
             duration = end_time - start_time
+            total = scraper.records_scraped + resumed_records
             
             # Results summary
             print(f"\n🎉 SCRAPING COMPLETED!")
             print("=" * 50)
             print(f"⏱️  Total time: {duration:.2f} seconds ({duration/60:.1f} minutes)")
-            print(f"📊 Candidates scraped: {len(scraper.scraped_data)}")
-            print(f"⚡ Average time per candidate: {duration/len(scraper.scraped_data):.2f}s")
+            print(f"📊 Candidates scraped: {total}")
+            print(f"⚡ Average time per candidate: {duration/total:.2f}s")
+            
+            # Where the time went
+            summary = metrics.to_dict()
+            detail_latency = summary['latency_seconds'].get('detail', {})
+            print(f"\n📈 Crawl Metrics:")
+            print(f"   • Requests: {summary['requests']} ({summary['requests_per_second']}/s), "
+                  f"retries: {summary['retries']}, errors: {summary['errors']}")
+            if summary['dead_letters']:
+                print(f"   • Failed URLs queued for retry: {summary['dead_letters']} "
+                      f"(python dead_letter.py drain)")
+            if summary['early_aborts']:
+                print(f"   • Detail pages cut short after the last field: {summary['early_aborts']}")
+            print(f"   • Downloaded: {sum(summary['bytes_downloaded'].values()) / 1e6:.1f} MB")
+            if detail_latency:
+                print(f"   • Detail latency p50/p99: {detail_latency['p50']:.2f}s / {detail_latency['p99']:.2f}s")
+            
+            reposts = sum(len(members) - 1 for members in dedup.clusters())
+            print(f"   • Near-duplicate reposts: {reposts} ({dedup_path})")
             
             # Contact info statistics
-            with_phone = sum(1 for job in scraper.scraped_data if job.get('phone'))
-            with_email = sum(1 for job in scraper.scraped_data if job.get('email'))
+            with_phone = contact_stats.with_phone
+            with_email = contact_stats.with_email
             
             print(f"\n📞 Contact Information:")
-            print(f"   • Candidates with phone numbers: {with_phone} ({with_phone/len(scraper.scraped_data)*100:.1f}%)")
-            print(f"   • Candidates with email addresses: {with_email} ({with_email/len(scraper.scraped_data)*100:.1f}%)")
+            print(f"   • Candidates with phone numbers: {with_phone} ({with_phone/total*100:.1f}%)")
+            print(f"   • Candidates with email addresses: {with_email} ({with_email/total*100:.1f}%)")
             
             print(f"\n📁 Output Files:")
-            print(f"   • vipkadr_candidates.csv")
-            print(f"   • vipkadr_candidates.json")
+            print(f"   • {CSV_FILE}")
+            print(f"   • {NDJSON_FILE}")
+            print(f"   • {JSON_FILE}")
+            if pa is not None:
+                print(f"   • {PARQUET_FILE}")
+            print(f"   • {AGGREGATES_FILE}")
+            print(f"   • {INDEX_DIR}/ (search with: python search_index.py query ...)")
+            print(f"   • {VIEWS_DIR}/ (view velocity: python view_history.py velocity)")
+            print(f"   • {TITLES_FILE}")
+            print(f"   • {METRICS_JSON_FILE}")
             
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, asyncio.CancelledError):
             print("\n⚠️  Scraping interrupted by user")
-            if scraper.scraped_data:
-                print(f"💾 Saving {len(scraper.scraped_data)} candidates scraped so far...")
-                scraper.save_to_csv("vipkadr_candidates.csv")
-                scraper.save_to_json("vipkadr_candidates.json")
+            if scraper.records_scraped:
+                print(f"💾 Keeping {scraper.records_scraped} candidates scraped so far...")
+            print("   Run again with --resume to continue")
         except Exception as e:
             print(f"❌ Error during scraping: {e}")
             import traceback
             traceback.print_exc()
+        finally:
+            if exporter:
+                exporter.cancel()
+                await asyncio.gather(exporter, return_exceptions=True)
+            metrics.write_json(METRICS_JSON_FILE)
+            
+            # Completed records are kept even when the crawl fails part way
+            if scraper.records_scraped + resumed_records:
+                csv_writer.close()
+                ndjson_writer.close()
+                ndjson_to_json(NDJSON_FILE, JSON_FILE)
+                cube.save(AGGREGATES_FILE, source=CSV_FILE)
+                update_search_index(NDJSON_FILE)
+                if pa is not None:
+                    ndjson_to_parquet(NDJSON_FILE, PARQUET_FILE)
+            else:
+                csv_writer.discard()
+                ndjson_writer.discard()
+            dedup.close()
+            titles.save()
+            view_history.close()
+            dead_letters.close()
+            if scheduler is not None:
+                scheduler.close()
+            if job_store:
+                job_store.close()
+            if archive is not None:
+                archive.close()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape candidate data from vipkadr.az")
+    parser.add_argument("--store", metavar="PATH",
+                        help="SQLite job store for incremental crawls (e.g. vipkadr_jobs.db)")
+    parser.add_argument("--max-age", type=float, default=24, metavar="HOURS",
+                        help="Re-fetch stored postings older than this (default: 24)")
+    parser.add_argument("--end-page", type=int, metavar="N",
+                        help="Last listing page to crawl (default: detect from pagination)")
+    parser.add_argument("--parse-workers", type=int, default=0, metavar="N",
+                        help="Parse HTML in N worker processes (default: parse on the event loop)")
+    parser.add_argument("--parser", default='bs4', choices=sorted(ENGINES),
+                        help="HTML parser engine (default: bs4)")
+    parser.add_argument("--stream-details", action="store_true",
+                        help="Stop reading detail pages once every field has been received")
+    parser.add_argument("--metrics-file", metavar="PATH",
+                        help="Keep Prometheus-format crawl metrics in PATH, refreshed every 10s")
+    archive_group = parser.add_mutually_exclusive_group()
+    archive_group.add_argument("--record", metavar="DIR",
+                               help="Archive every raw response in DIR")
+    archive_group.add_argument("--replay", metavar="DIR",
+                               help="Serve all pages from the archive in DIR instead of the network")
+    parser.add_argument("--budget", type=int, metavar="N",
+                        help="Fetch only the N most valuable pages, ranked by the recrawl scheduler; "
+                             "the rest come from --store")
+    parser.add_argument("--schedule", default=SCHEDULE_FILE, metavar="PATH",
+                        help=f"Recrawl scheduler state (default: {SCHEDULE_FILE})")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted crawl from its checkpoint")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE, metavar="PATH",
+                        help=f"Crawl checkpoint file (default: {CHECKPOINT_FILE})")
+    parser.add_argument("--dedup-db", default=DEDUP_FILE, metavar="PATH",
+                        help=f"Near-duplicate index kept across crawls (default: {DEDUP_FILE})")
+    args = parser.parse_args()
+    if args.budget and not args.store:
+        parser.error("--budget requires --store, which fills in the postings the budget leaves out")
+    return args
 
 if __name__ == "__main__":
-    asyncio.run(scrape_all_candidates())
\ No newline at end of file
+    args = parse_args()
+    asyncio.run(scrape_all_candidates(store_path=args.store, max_age_hours=args.max_age,
+                                      end_page=args.end_page, parse_workers=args.parse_workers,
+                                      parser=args.parser, record_dir=args.record,
+                                      replay_dir=args.replay, resume=args.resume,
+                                      checkpoint_path=args.checkpoint,
+                                      metrics_file=args.metrics_file,
+                                      dedup_path=args.dedup_db,
+                                      stream_details=args.stream_details,
+                                      budget=args.budget, schedule_path=args.schedule))
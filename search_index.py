@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+"""
+Full-text search over scraped postings
+
+The index covers ``title``, ``description`` and ``requirements``. Text is
+folded with Azerbaijani rules (İ→i, I→ı) and reduced to plain Latin letters,
+so "İŞÇİ", "işçi" and "isci" all match. The index is a directory of
+immutable segments plus a small SQLite catalogue:
+
+    docs.db        document ids, URLs and display fields, segment list
+    seg_N.lex      sorted terms, concatenated
+    seg_N.tix      fixed-width term table: term offset/length, postings offset/length, df
+    seg_N.post     postings: varint delta-encoded doc ids, term counts and positions
+
+Segment files are memory-mapped and terms are found by binary search over
+``.tix``, so a lookup reads a few pages whatever the corpus size. Updating
+the index writes the new or changed postings into a new segment and marks
+replaced documents deleted; segments are merged once there are too many.
+
+Queries support implicit AND, ``OR``, ``NOT`` (or ``-term``), parentheses
+and "quoted phrases":
+
+    python search_index.py build vipkadr_candidates.ndjson
+    python search_index.py query 'excel "satış meneceri" -təcrübəsiz'
+"""
+
+import argparse
+import csv
+import hashlib
+import mmap
+import os
+import re
+import sqlite3
+import struct
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from normalize import fold_az
+
+INDEX_DIR = "vipkadr_search"
+FIELDS = ('title', 'description', 'requirements')
+# Position gap between fields so phrases never match across them
+FIELD_GAP = 1000
+
+_WORD_RE = re.compile(r'\w+')
+_TIX = struct.Struct('<IHQII')  # term offset, term length, postings offset, postings length, df
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _WORD_RE.findall(fold_az(text, ascii=True))
+
+
+def document_terms(record: Dict) -> Dict[str, List[int]]:
+    """Term -> positions over the indexed fields of a record"""
+    terms: Dict[str, List[int]] = {}
+    start = 0
+    for field in FIELDS:
+        tokens = tokenize(record.get(field))
+        for offset, token in enumerate(tokens):
+            terms.setdefault(token, []).append(start + offset)
+        start += len(tokens) + FIELD_GAP
+    return terms
+
+
+def _digest(record: Dict) -> str:
+    text = '\x1f'.join(record.get(field) or '' for field in FIELDS)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+# Varint coding
+
+def _put_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _get_varint(buf, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def encode_postings(postings: List[Tuple[int, List[int]]]) -> bytes:
+    """Encode (doc_id, positions) pairs sorted by doc_id"""
+    out = bytearray()
+    previous_doc = 0
+    for doc_id, positions in postings:
+        _put_varint(out, doc_id - previous_doc)
+        _put_varint(out, len(positions))
+        previous_pos = 0
+        for position in positions:
+            _put_varint(out, position - previous_pos)
+            previous_pos = position
+        previous_doc = doc_id
+    return bytes(out)
+
+
+def decode_postings(buf, start: int, length: int) -> Iterator[Tuple[int, List[int]]]:
+    pos, end = start, start + length
+    doc_id = 0
+    while pos < end:
+        delta, pos = _get_varint(buf, pos)
+        doc_id += delta
+        count, pos = _get_varint(buf, pos)
+        positions = []
+        position = 0
+        for _ in range(count):
+            delta, pos = _get_varint(buf, pos)
+            position += delta
+            positions.append(position)
+        yield doc_id, positions
+
+
+# Segments
+
+def write_segment(base: str, terms: Dict[str, List[Tuple[int, List[int]]]]):
+    """Write a segment's .lex/.tix/.post files for term -> sorted postings"""
+    lex = bytearray()
+    tix = bytearray()
+    with open(base + '.post.part', 'wb') as post:
+        offset = 0
+        for term in sorted(terms):
+            encoded_term = term.encode('utf-8')
+            data = encode_postings(terms[term])
+            tix += _TIX.pack(len(lex), len(encoded_term), offset, len(data), len(terms[term]))
+            lex += encoded_term
+            post.write(data)
+            offset += len(data)
+    for suffix, data in (('.lex', lex), ('.tix', tix)):
+        with open(base + suffix + '.part', 'wb') as f:
+            f.write(data)
+    for suffix in ('.lex', '.tix', '.post'):
+        os.replace(base + suffix + '.part', base + suffix)
+
+
+def _map(path: str):
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class Segment:
+    """Read-only view of one memory-mapped segment"""
+    
+    def __init__(self, base: str):
+        self.base = base
+        self.lex = _map(base + '.lex')
+        self.tix = _map(base + '.tix')
+        self.post = _map(base + '.post')
+        self.size = len(self.tix) // _TIX.size
+    
+    def _entry(self, i: int):
+        return _TIX.unpack_from(self.tix, i * _TIX.size)
+    
+    def _term(self, entry) -> bytes:
+        return self.lex[entry[0]:entry[0] + entry[1]]
+    
+    def find(self, term: str):
+        """Binary search for a term's table entry"""
+        key = term.encode('utf-8')
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(self._entry(mid)) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.size:
+            entry = self._entry(lo)
+            if self._term(entry) == key:
+                return entry
+        return None
+    
+    def postings(self, term: str) -> Iterator[Tuple[int, List[int]]]:
+        entry = self.find(term)
+        if entry is None:
+            return iter(())
+        return decode_postings(self.post, entry[2], entry[3])
+    
+    def items(self) -> Iterator[Tuple[str, List[Tuple[int, List[int]]]]]:
+        for i in range(self.size):
+            entry = self._entry(i)
+            yield self._term(entry).decode('utf-8'), list(decode_postings(self.post, entry[2], entry[3]))
+    
+    def close(self):
+        for buf in (self.lex, self.tix, self.post):
+            if isinstance(buf, mmap.mmap):
+                buf.close()
+
+
+# Index
+
+class SearchIndex:
+    """Segmented on-disk inverted index over scraped postings"""
+    
+    def __init__(self, directory: str = INDEX_DIR, max_segments: int = 8):
+        self.directory = directory
+        self.max_segments = max_segments
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(directory, 'docs.db'))
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS docs (
+                doc_id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL,
+                job_id TEXT,
+                title TEXT,
+                company TEXT,
+                digest TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS docs_url ON docs (url, deleted);
+            CREATE TABLE IF NOT EXISTS segments (
+                name TEXT PRIMARY KEY
+            );
+            """
+        )
+        self.conn.commit()
+        self._segments: Optional[List[Segment]] = None
+    
+    @property
+    def segments(self) -> List[Segment]:
+        if self._segments is None:
+            names = [name for (name,) in self.conn.execute("SELECT name FROM segments ORDER BY name")]
+            self._segments = [Segment(os.path.join(self.directory, name)) for name in names]
+        return self._segments
+    
+    def _reset_segments(self):
+        for segment in self._segments or []:
+            segment.close()
+        self._segments = None
+    
+    def _next_segment_name(self) -> str:
+        row = self.conn.execute("SELECT MAX(name) FROM segments").fetchone()
+        number = int(row[0][4:]) + 1 if row[0] else 1
+        return f"seg_{number:06d}"
+    
+    def update(self, records: Iterable[Dict]) -> int:
+        """Index new and changed records; returns how many were (re)indexed
+
+        Unchanged records cost one lookup. A changed record gets a new
+        document id and its old one is marked deleted.
+        """
+        terms: Dict[str, List[Tuple[int, List[int]]]] = {}
+        next_id = (self.conn.execute("SELECT MAX(doc_id) FROM docs").fetchone()[0] or 0) + 1
+        indexed = 0
+        for record in records:
+            digest = _digest(record)
+            row = self.conn.execute(
+                "SELECT doc_id, digest FROM docs WHERE url = ? AND deleted = 0", (record['url'],)
+            ).fetchone()
+            if row is not None and row[1] == digest:
+                continue
+            if row is not None:
+                self.conn.execute("UPDATE docs SET deleted = 1 WHERE doc_id = ?", (row[0],))
+            
+            doc_id = next_id
+            next_id += 1
+            self.conn.execute(
+                "INSERT INTO docs (doc_id, url, job_id, title, company, digest) VALUES (?, ?, ?, ?, ?, ?)",
+                (doc_id, record['url'], record.get('job_id'), record.get('title'),
+                 record.get('company'), digest)
+            )
+            for term, positions in document_terms(record).items():
+                terms.setdefault(term, []).append((doc_id, positions))
+            indexed += 1
+        
+        if terms:
+            name = self._next_segment_name()
+            write_segment(os.path.join(self.directory, name), terms)
+            self.conn.execute("INSERT INTO segments (name) VALUES (?)", (name,))
+        self.conn.commit()
+        self._reset_segments()
+        
+        if len(self.segments) > self.max_segments:
+            self.compact()
+        return indexed
+    
+    def compact(self):
+        """Merge all segments into one, dropping deleted documents"""
+        deleted = {doc_id for (doc_id,) in self.conn.execute("SELECT doc_id FROM docs WHERE deleted = 1")}
+        merged: Dict[str, List[Tuple[int, List[int]]]] = {}
+        for segment in self.segments:
+            for term, postings in segment.items():
+                live = [posting for posting in postings if posting[0] not in deleted]
+                if live:
+                    merged.setdefault(term, []).extend(live)
+        for postings in merged.values():
+            postings.sort()
+        
+        old = [segment.base for segment in self.segments]
+        name = self._next_segment_name()
+        write_segment(os.path.join(self.directory, name), merged)
+        self.conn.execute("DELETE FROM segments")
+        self.conn.execute("INSERT INTO segments (name) VALUES (?)", (name,))
+        self.conn.execute("DELETE FROM docs WHERE deleted = 1")
+        self.conn.commit()
+        self._reset_segments()
+        for base in old:
+            for suffix in ('.lex', '.tix', '.post'):
+                os.remove(base + suffix)
+    
+    # Queries
+    
+    def postings(self, term: str) -> Dict[int, List[int]]:
+        found: Dict[int, List[int]] = {}
+        for segment in self.segments:
+            for doc_id, positions in segment.postings(term):
+                found[doc_id] = positions
+        return found
+    
+    def live_docs(self) -> Set[int]:
+        return {doc_id for (doc_id,) in self.conn.execute("SELECT doc_id FROM docs WHERE deleted = 0")}
+    
+    def phrase(self, terms: List[str]) -> Dict[int, int]:
+        """Documents containing the terms consecutively, with match counts"""
+        if not terms:
+            return {}
+        lists = [self.postings(term) for term in terms]
+        docs = set(lists[0]).intersection(*lists[1:])
+        matches = {}
+        for doc_id in docs:
+            following = [set(postings[doc_id]) for postings in lists[1:]]
+            count = sum(
+                all(start + i + 1 in positions for i, positions in enumerate(following))
+                for start in lists[0][doc_id]
+            )
+            if count:
+                matches[doc_id] = count
+        return matches
+    
+    def search(self, query: str, limit: Optional[int] = 20) -> List[Dict]:
+        """Run a query and return matching live documents, best first"""
+        scores = QueryParser(query).parse().evaluate(self)
+        # Deleted documents are few (merges purge them), unlike matches, which can
+        # be the whole corpus and must not be bound as SQL parameters
+        deleted = {doc_id for (doc_id,) in self.conn.execute(
+            "SELECT doc_id FROM docs WHERE deleted = 1"
+        )} if scores else set()
+        ranked = sorted((doc_id for doc_id in scores if doc_id not in deleted),
+                        key=lambda doc_id: (-scores[doc_id], doc_id))
+        results = []
+        for doc_id in ranked[:limit] if limit else ranked:
+            url, job_id, title, company = self.conn.execute(
+                "SELECT url, job_id, title, company FROM docs WHERE doc_id = ?", (doc_id,)
+            ).fetchone()
+            results.append({'doc_id': doc_id, 'score': scores[doc_id], 'url': url,
+                            'job_id': job_id, 'title': title, 'company': company})
+        return results
+    
+    def count(self, query: str) -> int:
+        return len(self.search(query, limit=None))
+    
+    def close(self):
+        self._reset_segments()
+        self.conn.close()
+
+
+# Query language
+
+class Term:
+    def __init__(self, words: List[str]):
+        self.words = words
+    
+    def evaluate(self, index: SearchIndex) -> Dict[int, int]:
+        if len(self.words) == 1:
+            return {doc_id: len(positions) for doc_id, positions in index.postings(self.words[0]).items()}
+        return index.phrase(self.words)
+
+
+class Not:
+    def __init__(self, operand):
+        self.operand = operand
+    
+    def evaluate(self, index: SearchIndex) -> Dict[int, int]:
+        excluded = self.operand.evaluate(index)
+        return {doc_id: 0 for doc_id in index.live_docs() if doc_id not in excluded}
+
+
+class And:
+    def __init__(self, operands):
+        self.operands = operands
+    
+    def evaluate(self, index: SearchIndex) -> Dict[int, int]:
+        # Exclusions are applied last so they only filter what the other terms matched
+        positive = [op for op in self.operands if not isinstance(op, Not)]
+        negative = [op.operand for op in self.operands if isinstance(op, Not)]
+        if not positive:
+            return Not(Or(negative)).evaluate(index)
+        results = [op.evaluate(index) for op in positive]
+        docs = set(results[0]).intersection(*results[1:])
+        for op in negative:
+            docs -= set(op.evaluate(index))
+        return {doc_id: sum(result[doc_id] for result in results) for doc_id in docs}
+
+
+class Or:
+    def __init__(self, operands):
+        self.operands = operands
+    
+    def evaluate(self, index: SearchIndex) -> Dict[int, int]:
+        combined: Dict[int, int] = {}
+        for op in self.operands:
+            for doc_id, score in op.evaluate(index).items():
+                combined[doc_id] = combined.get(doc_id, 0) + score
+        return combined
+
+
+_QUERY_TOKEN_RE = re.compile(r'"[^"]*"?|\(|\)|-|[^\s()"]+')
+
+
+class QueryParser:
+    """Recursive descent parser: or := and ("OR" and)*, and := not+, not := ("NOT" | "-") not | atom"""
+    
+    def __init__(self, query: str):
+        self.tokens = _QUERY_TOKEN_RE.findall(query)
+        self.pos = 0
+    
+    def _peek(self) -> Optional[str]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+    
+    def parse(self):
+        node = self._or()
+        if self._peek() is not None:
+            raise ValueError(f"Unexpected {self._peek()!r} in query")
+        return node
+    
+    def _or(self):
+        operands = [self._and()]
+        while self._peek() == 'OR':
+            self.pos += 1
+            operands.append(self._and())
+        return operands[0] if len(operands) == 1 else Or(operands)
+    
+    def _and(self):
+        operands = []
+        while self._peek() not in (None, ')', 'OR'):
+            if self._peek() == 'AND':
+                self.pos += 1
+                continue
+            operands.append(self._not())
+        if not operands:
+            raise ValueError("Empty query")
+        return operands[0] if len(operands) == 1 else And(operands)
+    
+    def _not(self):
+        if self._peek() in ('NOT', '-'):
+            self.pos += 1
+            return Not(self._not())
+        return self._atom()
+    
+    def _atom(self):
+        token = self._peek()
+        self.pos += 1
+        if token == '(':
+            node = self._or()
+            if self._peek() != ')':
+                raise ValueError("Missing ')' in query")
+            self.pos += 1
+            return node
+        words = tokenize(token.strip('"'))
+        if not words:
+            raise ValueError(f"Nothing to search for in {token!r}")
+        # Unquoted text that folds into several words ("c++", "1c-muhasibat") is a phrase too
+        return Term(words)
+
+
+def read_records(path: str) -> Iterator[Dict]:
+    if path.endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            yield from csv.DictReader(f)
+    else:
+        from writers import read_ndjson
+        yield from read_ndjson(path)
+
+
+def update_search_index(ndjson_filename: str, index_dir: str = INDEX_DIR) -> int:
+    """Add new and changed postings from a finished NDJSON file to the search index"""
+    index = SearchIndex(index_dir)
+    try:
+        return index.update(read_records(ndjson_filename))
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search scraped vipkadr.az postings")
+    parser.add_argument("--index", default=INDEX_DIR, help=f"Index directory (default: {INDEX_DIR})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Add new and changed postings to the index")
+    build.add_argument("records", help="Scraper output (.ndjson or .csv)")
+    query = commands.add_parser("query", help="Search the index")
+    query.add_argument("query", nargs='+', help='e.g. excel "satış meneceri" -təcrübəsiz')
+    query.add_argument("--limit", type=int, default=20, help="Results to show (default: 20)")
+    query.add_argument("--count", action="store_true", help="Only print the number of matches")
+    args = parser.parse_args()
+    
+    index = SearchIndex(args.index)
+    try:
+        if args.command == "build":
+            indexed = index.update(read_records(args.records))
+            print(f"Indexed {indexed} new or changed postings, {len(index.live_docs())} in total")
+        elif args.count:
+            print(index.count(' '.join(args.query)))
+        else:
+            for result in index.search(' '.join(args.query), limit=args.limit):
+                print(f"{result['score']:>4}  {result['title']} / {result['company']}  {result['url']}")
+    except ValueError as e:
+        parser.error(str(e))
+    finally:
+        index.close()
@@ -0,0 +1,31 @@
+"""
+Near-duplicate clusters stay consistent as postings change
+"""
+
+from dedup import DuplicateIndex
+
+TEXT = ("Şirkətimizə satış meneceri tələb olunur. Namizəd müştərilərlə işləməyi, "
+        "hesabat hazırlamağı və komanda ilə əməkdaşlıq etməyi bacarmalıdır.")
+
+
+def posting(n, text=TEXT):
+    return {'url': f"https://vipkadr.az/vakansiya-az-{n}/", 'job_id': str(n), 'description': text}
+
+
+def test_reposts_join_the_first_posting():
+    index = DuplicateIndex(':memory:')
+    roots = [index.add(posting(n)) for n in (1, 2, 3)]
+    assert roots == [posting(1)['url']] * 3
+    assert index.clusters() == [[posting(n)['url'] for n in (1, 2, 3)]]
+
+
+def test_changed_root_hands_its_cluster_to_the_oldest_member():
+    index = DuplicateIndex(':memory:')
+    for n in (1, 2, 3):
+        index.add(posting(n))
+    
+    assert index.add(posting(1, "Tamamilə fərqli bir elan: anbar işçisi axtarılır.")) == posting(1)['url']
+    assert index.duplicate_of(posting(1)['url']) is None
+    assert index.duplicate_of(posting(3)['url']) == posting(2)['url']
+    assert index.clusters() == [[posting(2)['url'], posting(3)['url']]]
+    assert index.add(posting(4)) == posting(2)['url']
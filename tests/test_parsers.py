@@ -0,0 +1,106 @@
+"""
+The bs4 and lxml parser engines must extract the same records
+"""
+
+import os
+
+import pytest
+from lxml import etree
+
+from parsers import ENGINES, DetailSectionWatcher, _iter_saved_pages, compare_engines
+
+PAGES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'pages')
+BASE_URL = "https://vipkadr.az"
+
+
+def saved_pages():
+    return list(_iter_saved_pages(PAGES_DIR))
+
+
+def test_fixture_pages_exist():
+    names = [name for name, _ in saved_pages()]
+    assert any(name.startswith('listing') for name in names)
+    assert any(name.startswith('detail') for name in names)
+
+
+def test_engines_agree_on_saved_pages():
+    count, _, mismatches = compare_engines(saved_pages(), base_url=BASE_URL)
+    assert count == len(saved_pages())
+    assert [url for url, _, _ in mismatches] == []
+
+
+@pytest.mark.parametrize('engine', sorted(ENGINES))
+def test_listing_page(engine):
+    pages = dict(saved_pages())
+    job_urls = ENGINES[engine].job_urls(pages['listing_page_1.html'], BASE_URL)
+    assert job_urls == [
+        "https://vipkadr.az/vakansiya-az-43594/",
+        "https://vipkadr.az/vakansiya-az-43593/",
+        "https://vipkadr.az/vakansiya-az-43590/?sl=az",
+    ]
+    assert ENGINES[engine].job_urls(pages['listing_page_empty.html'], BASE_URL) == []
+
+
+@pytest.mark.parametrize('engine', sorted(ENGINES))
+def test_detail_page(engine):
+    html_content = dict(saved_pages())['detail_full.html']
+    record = ENGINES[engine].job_details(html_content, "https://vipkadr.az/vakansiya-az-43594/")
+    assert record['title'] == 'SATIŞ MENECERİ'
+    assert (record['job_id'], record['views']) == ('43594', '1285')
+    assert record['company'] == 'İnfo Center MMC'
+    assert record['salary'] == '700 - 1 000 AZN'
+    assert record['contact_person'] == 'Aynurxanım'
+    assert record['phone'] == '(050) 123-45-67'
+    assert record['email'] == 'hr@infocenter.az'
+    assert (record['added_date'], record['end_date']) == ('02 İyl 2024', '02 Avq 2024')
+    assert (record['city'], record['age']) == ('Bakı', '20 - 45')
+    assert record['description'].startswith('- Müştərilərlə işləmək;')
+    assert record['requirements'] == '- Ali təhsil- Məsuliyyətli olmaq'
+
+
+def _keeps_cdata():
+    root = etree.fromstring(b'<p><![CDATA[x]]></p>', etree.HTMLParser())
+    return any(node.tag is etree.Comment for node in root.iter())
+
+
+@pytest.mark.skipif(not _keeps_cdata(), reason="this libxml2 drops CDATA sections from HTML")
+def test_cdata_text_is_kept():
+    html_content = dict(saved_pages())['detail_cdata.html']
+    for engine in ENGINES.values():
+        record = engine.job_details(html_content, "https://vipkadr.az/vakansiya-az-43777/")
+        assert record['description'] == 'Backend tərtibatıPython & SQLüzrə'
+
+
+def test_textarea_difference_is_documented():
+    # See the parsers module docstring: only html.parser reads textarea content as markup
+    html_content = '<div class="descriptions"><div><textarea><b>bold</b></textarea></div></div>'
+    assert ENGINES['bs4'].job_details(html_content, 'u')['description'] == 'bold'
+    assert ENGINES['lxml'].job_details(html_content, 'u')['description'] == '<b>bold</b>'
+
+
+def streamed_prefix(html_content, chunk_size=64):
+    """The text a streamed detail fetch would stop at, as the scraper reads it"""
+    watcher = DetailSectionWatcher()
+    for end in range(chunk_size, len(html_content) + chunk_size, chunk_size):
+        if watcher.feed(html_content[end - chunk_size:end]):
+            return html_content[:end]
+    return html_content
+
+
+@pytest.mark.parametrize('name', ['detail_full.html', 'detail_split.html', 'detail_sparse.html'])
+def test_streamed_prefix_gives_the_full_record(name):
+    html_content = dict(saved_pages())[name]
+    url = "https://vipkadr.az/vakansiya-az-43594/"
+    record = ENGINES['lxml'].job_details(streamed_prefix(html_content), url)
+    assert record == ENGINES['lxml'].job_details(html_content, url)
+
+
+def test_streaming_stops_early_only_when_every_field_is_in():
+    pages = dict(saved_pages())
+    assert len(streamed_prefix(pages['detail_full.html'])) < len(pages['detail_full.html'])
+    # Feature rows split around the description end in the second container
+    split = pages['detail_split.html']
+    assert streamed_prefix(split).count('ty-product-features') == 2
+    assert ENGINES['lxml'].job_details(streamed_prefix(split), 'u')['city'] == 'Bakı'
+    # Pages without every feature row are read to the end
+    assert streamed_prefix(pages['detail_sparse.html']) == pages['detail_sparse.html']
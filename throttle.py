@@ -0,0 +1,184 @@
+"""
+Request rate limiting, adaptive concurrency and retry policy for the vipkadr.az scraper
+"""
+
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (seconds or HTTP date) into seconds to wait"""
+    if not value:
+        return None
+    
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+RETRYABLE = 'retryable'
+THROTTLED = 'throttled'
+PERMANENT = 'permanent'
+
+
+class RetryPolicy:
+    """Which failed responses to retry, and how long to wait before doing so
+
+    ``classify()`` sorts a failure into one of three classes:
+
+    - ``throttled``: the server asks us to slow down (429, 503). The wait
+      is its Retry-After, capped at ``max_retry_after``, or else backoff.
+    - ``retryable``: transient failures (connection errors, timeouts,
+      other 5xx, 408, 425), retried with backoff.
+    - ``permanent``: everything else (404, 410, 403, ...), never retried.
+
+    Backoff is "full jitter": a uniform draw between zero and
+    ``base_delay * 2**attempt`` (at most ``max_delay``), so workers that
+    failed together do not retry together.
+    """
+    
+    THROTTLED_STATUSES = frozenset({429, 503})
+    RETRYABLE_STATUSES = frozenset({408, 425, 500, 502, 504})
+    
+    def __init__(self, retries: int = 3, base_delay: float = 1.0, max_delay: float = 60.0,
+                 max_retry_after: float = 300.0, rng: Optional[random.Random] = None):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.rng = rng or random.Random()
+    
+    def classify(self, status: Optional[int]) -> str:
+        """Failure class of a response status; None stands for a request error"""
+        if status is None or status in self.RETRYABLE_STATUSES:
+            return RETRYABLE
+        if status in self.THROTTLED_STATUSES:
+            return THROTTLED
+        if status >= 500:
+            return RETRYABLE
+        return PERMANENT
+    
+    def backoff(self, attempt: int) -> float:
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+    
+    def delay(self, outcome: str, attempt: int, retry_after: Optional[float] = None) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None if it should not be retried"""
+        if outcome == PERMANENT:
+            return None
+        if outcome == THROTTLED and retry_after is not None:
+            # A little jitter on top, so the waiting workers do not return at the same moment
+            return min(retry_after, self.max_retry_after) + self.rng.uniform(0, self.base_delay)
+        return self.backoff(attempt)
+
+
+class TokenBucket:
+    """Token bucket capping the request rate across all workers
+
+    Tokens refill at ``rate`` per second up to ``capacity``; each request
+    takes one. ``pause()`` stops handing out tokens for a while, which is
+    how a server's Retry-After is honoured.
+    """
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+    
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+    
+    def pause(self, seconds: float):
+        """Hand out no tokens for the next ``seconds`` seconds"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on the number of requests in flight
+
+    The limit grows by ``increase`` per window of successful requests while
+    the server is healthy and is multiplied by ``decrease`` when it pushes
+    back: HTTP 429/5xx, connection errors, or average latency rising above
+    ``latency_factor`` times the (slowly drifting) best latency seen. At most one decrease is
+    applied per round trip, so a burst of failures from requests that were
+    already in flight only counts once.
+    """
+    
+    def __init__(self, initial: int, maximum: int, minimum: int = 1,
+                 increase: float = 1.0, decrease: float = 0.5, latency_factor: float = 3.0):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.in_flight = 0
+        self.min_latency = None
+        self.avg_latency = None
+        self.last_decrease = 0.0
+        self._cond = asyncio.Condition()
+    
+    async def acquire(self):
+        """Wait for a free slot under the current limit"""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+    
+    async def release(self, latency: Optional[float] = None, throttled: bool = False):
+        """Free a slot and adjust the limit from the request outcome"""
+        async with self._cond:
+            self.in_flight -= 1
+            self._update(latency, throttled)
+            self._cond.notify_all()
+    
+    def _update(self, latency: Optional[float], throttled: bool):
+        if latency is not None:
+            # Let the baseline drift up slowly so a lasting slowdown is re-learned
+            self.min_latency = latency if self.min_latency is None else min(self.min_latency * 1.01, latency)
+            self.avg_latency = latency if self.avg_latency is None else 0.8 * self.avg_latency + 0.2 * latency
+        
+        congested = (
+            self.avg_latency is not None
+            and self.avg_latency > self.latency_factor * max(self.min_latency, 0.05)
+        )
+        if throttled or congested:
+            now = time.monotonic()
+            if now - self.last_decrease >= (self.avg_latency or 0.0):
+                self.limit = max(self.minimum, self.limit * self.decrease)
+                self.last_decrease = now
+        else:
+            # Roughly +increase per round trip at the current limit
+            self.limit = min(self.maximum, self.limit + self.increase / self.limit)
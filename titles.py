@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Job title canonicalization, so spelling variants of a title roll up together
+
+"OFİS MENECERİ", "Ofis meneceri", "OFİS-MENECER" and "OFİS MENECERİ TƏLƏB
+OLUNUR." are the same job. A title is folded (Azerbaijani case rules,
+plain Latin letters, no punctuation), stripped of recruiting boilerplate
+such as "tələb olunur" and then matched against the known canonical titles
+that share its blocking key (the start of its first word). The closest one
+above the similarity threshold wins; otherwise the title starts a new
+canonical title of its own.
+
+Every raw title ever resolved is kept in a memo, so known titles cost a
+dictionary lookup and only new ones are compared.
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Tuple
+
+from normalize import fold_az
+
+TITLES_FILE = "vipkadr_titles.json"
+
+# Folded phrases that say "wanted" or "we offer" rather than what the job is
+BOILERPLATE = (
+    ('teleb', 'olunur'), ('teleb', 'edilir'), ('teklif', 'edirik'), ('teklif', 'olunur'),
+    ('axtarilir',), ('vakansiya',),
+)
+BLOCK_PREFIX = 4
+
+_TOKEN_RE = re.compile(r'\w+')
+_AZ_UPPER = str.maketrans({'i': 'İ', 'ı': 'I'})
+
+
+def _az_upper(text: str) -> str:
+    return text.translate(_AZ_UPPER).upper()
+
+
+def clean_title(title: Optional[str]) -> Tuple[str, str]:
+    """Return (folded key, display form) of a title without boilerplate"""
+    raw_tokens = _TOKEN_RE.findall(title or '')
+    folded_tokens = [fold_az(token, ascii=True) for token in raw_tokens]
+    keep = [True] * len(raw_tokens)
+    for phrase in BOILERPLATE:
+        for i in range(len(folded_tokens) - len(phrase) + 1):
+            if tuple(folded_tokens[i:i + len(phrase)]) == phrase:
+                keep[i:i + len(phrase)] = [False] * len(phrase)
+    # A title that is nothing but boilerplate keeps its words
+    if not any(keep):
+        keep = [True] * len(raw_tokens)
+    key = ' '.join(token for token, kept in zip(folded_tokens, keep) if kept)
+    display = _az_upper(' '.join(token for token, kept in zip(raw_tokens, keep) if kept))
+    return key, display
+
+
+def _block(key: str) -> str:
+    return key.split(' ', 1)[0][:BLOCK_PREFIX]
+
+
+class TitleCanonicalizer:
+    """Maps raw job titles to canonical titles, remembering every decision
+
+    ``threshold`` is the ``difflib`` similarity ratio between folded titles
+    above which a new title joins an existing canonical title.
+    """
+    
+    def __init__(self, path: Optional[str] = TITLES_FILE, threshold: float = 0.85):
+        self.path = path
+        self.threshold = threshold
+        self.memo: Dict[str, str] = {}
+        self.canonical: Dict[str, str] = {}
+        self.blocks: Dict[str, List[str]] = {}
+        self.changed = False
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                state = json.load(f)
+            self.memo = state['memo']
+            self.canonical = state['canonical']
+            for key in self.canonical:
+                self.blocks.setdefault(_block(key), []).append(key)
+    
+    def resolve(self, title: Optional[str]) -> str:
+        """Canonical title for a raw title"""
+        if not title:
+            return ''
+        known = self.memo.get(title)
+        if known is not None:
+            return known
+        
+        key, display = clean_title(title)
+        if key not in self.canonical:
+            match = self._closest(key)
+            if match is None:
+                self.canonical[key] = display
+                self.blocks.setdefault(_block(key), []).append(key)
+            else:
+                key = match
+        self.memo[title] = self.canonical[key]
+        self.changed = True
+        return self.memo[title]
+    
+    def _closest(self, key: str) -> Optional[str]:
+        best, best_ratio = None, self.threshold
+        for candidate in self.blocks.get(_block(key), ()):
+            matcher = SequenceMatcher(None, key, candidate)
+            if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+                continue
+            ratio = matcher.ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = candidate, ratio
+        return best
+    
+    def annotate(self, record: Dict) -> Dict:
+        """Set the ``title_canonical`` field of a record"""
+        record['title_canonical'] = self.resolve(record.get('title'))
+        return record
+    
+    def save(self):
+        """Write the memo atomically if anything new was resolved"""
+        if not self.path or not self.changed:
+            return
+        part_path = self.path + '.part'
+        with open(part_path, 'w', encoding='utf-8') as f:
+            json.dump({'memo': self.memo, 'canonical': self.canonical}, f, ensure_ascii=False)
+        os.replace(part_path, self.path)
+        self.changed = False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show how scraped job titles are canonicalized")
+    parser.add_argument("csv", nargs='?', default="vipkadr_candidates.csv", help="Scraped postings CSV")
+    parser.add_argument("--memo", default=TITLES_FILE, help=f"Memo file (default: {TITLES_FILE})")
+    parser.add_argument("--show", type=int, default=10, metavar="N", help="Print the N largest groups")
+    args = parser.parse_args()
+    
+    canonicalizer = TitleCanonicalizer(args.memo)
+    groups: Dict[str, Dict[str, int]] = {}
+    with open(args.csv, newline='', encoding='utf-8') as f:
+        for record in csv.DictReader(f):
+            variants = groups.setdefault(canonicalizer.resolve(record['title']), {})
+            variants[record['title']] = variants.get(record['title'], 0) + 1
+    canonicalizer.save()
+    
+    raw_titles = sum(len(variants) for variants in groups.values())
+    print(f"{raw_titles} distinct titles -> {len(groups)} canonical titles")
+    ranked = sorted(groups.items(), key=lambda item: -sum(item[1].values()))
+    for canonical, variants in ranked[:args.show]:
+        print(f"\n{canonical} ({sum(variants.values())} postings)")
+        for variant, count in sorted(variants.items(), key=lambda item: -item[1]):
+            print(f"   {count:>4}  {variant}")
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Time series of view counts per posting, across crawls
+
+Every crawl appends one or more blocks of (job_id, views) samples that
+share the crawl's timestamp. A block stores its job ids sorted, as
+offsets from the smallest id (frame-of-reference deltas), and its view
+counts, each column in 2 bytes per sample when the values fit and 4
+otherwise, so a sample usually costs 4 bytes:
+
+    samples.dat    blocks of packed job id offsets and view counts
+    blocks.idx     fixed-width block table: timestamp, offset, count, base id, widths
+    companies.json job_id -> company, for per-company velocity
+
+Both data files are append-only and memory-mapped. A time range is found
+by binary search over the block table and a posting by binary search over
+a block's job ids, so neither query reads anything outside its range.
+
+    python view_history.py velocity --days 7 --top 20
+    python view_history.py velocity --by company
+    python view_history.py series 43594
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+VIEWS_DIR = "vipkadr_views"
+
+# timestamp, data offset, sample count, base job id, id width, views width
+_BLOCK = struct.Struct('<dQIIBBxx')
+_TYPECODES = {2: 'H', 4: 'I'}
+
+
+def _width(max_value: int) -> int:
+    return 2 if max_value < 1 << 16 else 4
+
+
+def _map(path: str):
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class ViewHistory:
+    """Append-only, memory-mapped store of view counts over time
+    
+    Also works as a scraper writer: ``write()`` collects the views of each
+    record and ``flush()`` appends them as a block stamped with the time
+    the store was opened, so one crawl's samples share a timestamp. Records
+    without a numeric ``job_id`` or ``views`` are skipped. As a
+    ``fresh_only`` writer it is not given records reused from the job
+    store, whose views were read by an earlier crawl.
+    """
+    
+    fresh_only = True
+    
+    def __init__(self, directory: str = VIEWS_DIR, timestamp: Optional[float] = None):
+        self.directory = directory
+        self.timestamp = time.time() if timestamp is None else timestamp
+        os.makedirs(directory, exist_ok=True)
+        self.data_path = os.path.join(directory, 'samples.dat')
+        self.index_path = os.path.join(directory, 'blocks.idx')
+        self.companies_path = os.path.join(directory, 'companies.json')
+        for path in (self.data_path, self.index_path):
+            open(path, 'ab').close()
+        self._drop_torn_block()
+        
+        self.companies: Dict[str, str] = {}
+        if os.path.exists(self.companies_path):
+            with open(self.companies_path, encoding='utf-8') as f:
+                self.companies = json.load(f)
+        self._companies_changed = False
+        self._pending: Dict[int, int] = {}
+        self._data = self._index = None
+        self._remap()
+    
+    def _drop_torn_block(self):
+        """Cut off a block table entry or data a crash left half-written"""
+        index_size = os.path.getsize(self.index_path)
+        whole = index_size - index_size % _BLOCK.size
+        data_end = 0
+        if whole:
+            with open(self.index_path, 'rb') as f:
+                f.seek(whole - _BLOCK.size)
+                _, offset, count, _, id_width, views_width = _BLOCK.unpack(f.read(_BLOCK.size))
+            data_end = offset + self._block_size(count, id_width, views_width)
+        if whole != index_size:
+            os.truncate(self.index_path, whole)
+        if os.path.getsize(self.data_path) > data_end:
+            os.truncate(self.data_path, data_end)
+    
+    @staticmethod
+    def _ids_size(count: int, id_width: int) -> int:
+        # Padded so the views column stays aligned
+        return (count * id_width + 3) & ~3
+    
+    @classmethod
+    def _block_size(cls, count: int, id_width: int, views_width: int) -> int:
+        return cls._ids_size(count, id_width) + count * views_width
+    
+    def _remap(self):
+        self._close_maps()
+        self._data = _map(self.data_path)
+        self._index = _map(self.index_path)
+        self.block_count = len(self._index) // _BLOCK.size
+    
+    def _close_maps(self):
+        for buf in (self._data, self._index):
+            if isinstance(buf, mmap.mmap):
+                buf.close()
+    
+    # Writing
+    
+    def write(self, record: Dict):
+        job_id, views = record.get('job_id'), record.get('views')
+        if not (str(job_id).isdigit() and str(views).isdigit()):
+            return
+        self._pending[int(job_id)] = int(views)
+        company = record.get('company') or ''
+        if company and self.companies.get(str(job_id)) != company:
+            self.companies[str(job_id)] = company
+            self._companies_changed = True
+    
+    def flush(self):
+        if self._pending:
+            self.append(self._pending.items(), self.timestamp)
+            self._pending = {}
+        if self._companies_changed:
+            tmp_path = self.companies_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.companies, f, ensure_ascii=False)
+            os.replace(tmp_path, self.companies_path)
+            self._companies_changed = False
+    
+    def append(self, samples: Iterable[Tuple[int, int]], timestamp: float):
+        """Append (job_id, views) samples taken at ``timestamp`` as one block"""
+        samples = sorted(samples)
+        if not samples:
+            return
+        if self.block_count and timestamp < self._block(self.block_count - 1)[0]:
+            raise ValueError("Blocks must be appended in time order")
+        
+        base = samples[0][0]
+        id_width = _width(samples[-1][0] - base)
+        views_width = _width(max(views for _, views in samples))
+        ids = array(_TYPECODES[id_width], (job_id - base for job_id, _ in samples)).tobytes()
+        views = array(_TYPECODES[views_width], (views for _, views in samples)).tobytes()
+        ids += b'\0' * (self._ids_size(len(samples), id_width) - len(ids))
+        
+        with open(self.data_path, 'ab') as f:
+            offset = f.tell()
+            f.write(ids + views)
+            f.flush()
+            os.fsync(f.fileno())
+        # The table entry goes last, so a crash never points at missing data
+        with open(self.index_path, 'ab') as f:
+            f.write(_BLOCK.pack(timestamp, offset, len(samples), base, id_width, views_width))
+            f.flush()
+            os.fsync(f.fileno())
+        self._remap()
+    
+    def close(self):
+        self.flush()
+        self._close_maps()
+        self._data = self._index = None
+    
+    # Reading
+    
+    def _block(self, i: int):
+        return _BLOCK.unpack_from(self._index, i * _BLOCK.size)
+    
+    def _columns(self, block) -> Tuple[memoryview, memoryview]:
+        _, offset, count, _, id_width, views_width = block
+        ids_end = offset + self._ids_size(count, id_width)
+        data = memoryview(self._data)
+        ids = data[offset:offset + count * id_width].cast(_TYPECODES[id_width])
+        views = data[ids_end:ids_end + count * views_width].cast(_TYPECODES[views_width])
+        return ids, views
+    
+    def _block_range(self, start: Optional[float], end: Optional[float]) -> range:
+        timestamp = lambda i: self._block(i)[0]
+        first = 0 if start is None else bisect_left(range(self.block_count), start, key=timestamp)
+        last = self.block_count if end is None else bisect_right(range(self.block_count), end, key=timestamp)
+        return range(first, last)
+    
+    def __len__(self) -> int:
+        return sum(self._block(i)[2] for i in range(self.block_count))
+    
+    def timestamps(self) -> List[float]:
+        """Distinct crawl timestamps, oldest first"""
+        return sorted({self._block(i)[0] for i in range(self.block_count)})
+    
+    def samples(self, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[Tuple[float, int, int]]:
+        """Yield (timestamp, job_id, views) for every sample between start and end"""
+        for i in self._block_range(start, end):
+            block = self._block(i)
+            base = block[3]
+            ids, views = self._columns(block)
+            for offset, count in zip(ids, views):
+                yield block[0], base + offset, count
+    
+    def series(self, job_id: int, start: Optional[float] = None, end: Optional[float] = None) -> List[Tuple[float, int]]:
+        """(timestamp, views) samples of one posting"""
+        points = []
+        for i in self._block_range(start, end):
+            block = self._block(i)
+            target = job_id - block[3]
+            if target < 0:
+                continue
+            ids, views = self._columns(block)
+            pos = bisect_left(ids, target)
+            if pos < len(ids) and ids[pos] == target:
+                points.append((block[0], views[pos]))
+        return points
+    
+    def velocity(self, start: Optional[float] = None, end: Optional[float] = None) -> Dict[int, float]:
+        """Views gained per day by each posting seen at two or more times in the range"""
+        first: Dict[int, Tuple[float, int]] = {}
+        last: Dict[int, Tuple[float, int]] = {}
+        for timestamp, job_id, views in self.samples(start, end):
+            if job_id not in first:
+                first[job_id] = (timestamp, views)
+            last[job_id] = (timestamp, views)
+        
+        rates = {}
+        for job_id, (t1, v1) in last.items():
+            t0, v0 = first[job_id]
+            if t1 > t0:
+                rates[job_id] = (v1 - v0) * 86400 / (t1 - t0)
+        return rates
+    
+    def company_velocity(self, start: Optional[float] = None, end: Optional[float] = None) -> Dict[str, float]:
+        """Views gained per day summed over each company's postings"""
+        totals: Dict[str, float] = defaultdict(float)
+        for job_id, rate in self.velocity(start, end).items():
+            totals[self.companies.get(str(job_id)) or 'Unknown'] += rate
+        return dict(totals)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query view counts recorded across crawls")
+    parser.add_argument("--dir", default=VIEWS_DIR, help=f"Store directory (default: {VIEWS_DIR})")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    velocity_parser = commands.add_parser('velocity', help="Fastest-growing postings or companies")
+    velocity_parser.add_argument("--days", type=float, metavar="N", help="Only the last N days")
+    velocity_parser.add_argument("--by", choices=('job', 'company'), default='job')
+    velocity_parser.add_argument("--top", type=int, default=20)
+    
+    series_parser = commands.add_parser('series', help="View counts of one posting over time")
+    series_parser.add_argument("job_id", type=int)
+    
+    commands.add_parser('info', help="Show the size of the store")
+    args = parser.parse_args()
+    
+    history = ViewHistory(args.dir)
+    try:
+        if args.command == 'info':
+            size = os.path.getsize(history.data_path) + os.path.getsize(history.index_path)
+            samples = len(history)
+            print(f"{samples} samples in {history.block_count} blocks from {len(history.timestamps())} crawls, "
+                  f"{size / 1024:.1f} KB ({size / samples if samples else 0:.1f} bytes/sample)")
+        elif args.command == 'series':
+            for timestamp, views in history.series(args.job_id):
+                print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(timestamp))}  {views}")
+        else:
+            start = time.time() - args.days * 86400 if args.days else None
+            if args.by == 'company':
+                rates = history.company_velocity(start)
+            else:
+                rates = history.velocity(start)
+            for key, rate in sorted(rates.items(), key=lambda item: -item[1])[:args.top]:
+                label = key if args.by == 'company' else f"#{key} {history.companies.get(str(key), '')}"
+                print(f"{rate:10.1f} views/day  {label}")
+    finally:
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,110 @@
 import asyncio
 import aiohttp
+import codecs
 import json
 import csv
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
 import re
 import time
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from metrics import CrawlMetrics
+from parsers import DetailSectionWatcher, get_engine
+from throttle import (RETRYABLE, THROTTLED, AdaptiveConcurrency, RetryPolicy, TokenBucket,
+                      parse_retry_after)
+from writers import FIELDNAMES, ParquetStreamWriter
 
 logging.basicConfig(level=logging.WARNING)
 logger = logging.getLogger(__name__)
 
+
 class VipKadrScraper:
-    def __init__(self, max_concurrent=10, delay=1):
-        self.base_url = "https://vipkadr.az"
+    def __init__(self, max_concurrent=10, delay=1, job_store=None, requests_per_second=None,
+                 parse_workers=0, parse_queue_size=None, parser='bs4', archive=None,
+                 writers=None, keep_in_memory=True, checkpoint=None, metrics=None, dedup=None,
+                 titles=None, base_url="https://vipkadr.az", stream_details=False,
+                 stream_chunk_size=8192, retry_policy=None, dead_letters=None):
+        """Create a scraper
+
+        ``max_concurrent`` is the ceiling for the adaptive concurrency limit,
+        which starts at half of it and follows server health (AIMD).
+        ``requests_per_second`` caps the request rate through a token bucket;
+        when omitted it is derived from ``delay`` as ``max_concurrent / delay``,
+        the rate the old per-worker sleep allowed at best. With neither, the
+        rate is not capped.
+
+        With ``parse_workers`` > 0, HTML is parsed in a process pool of that
+        size instead of on the event loop. ``parser`` selects the parser
+        engine from ``parsers.ENGINES`` ('bs4' or the faster 'lxml').
+
+        ``archive`` is an ``HtmlArchive``: in record mode every successful
+        response is written to it, in replay mode pages are served from it
+        and no requests are made.
+
+        Each scraped record is passed to every writer in ``writers`` (see
+        ``writers.py``) as soon as it is ready. Writers with a true
+        ``fresh_only`` attribute only get records fetched in this run, not
+        ones reused from the job store. With ``keep_in_memory=False``
+        records are not also collected in ``scraped_data``.
+
+        ``checkpoint`` is a ``CrawlCheckpoint``; ``scrape_pipelined`` saves
+        its progress there and skips whatever an earlier run already did.
+
+        Request, parse and wait timings are recorded in ``self.metrics``
+        (a ``CrawlMetrics``, created if not given).
+
+        ``dedup`` is a ``DuplicateIndex``; every record is indexed before it
+        is written and gets a ``duplicate_of`` field naming the URL of the
+        earlier posting it reposts (empty for originals). ``titles`` is a
+        ``TitleCanonicalizer`` that fills in ``title_canonical``.
+        
+        ``base_url`` is the site to crawl; the benchmark points it at a local
+        stand-in server.
+        
+        With ``stream_details``, detail pages are read in chunks of
+        ``stream_chunk_size`` bytes and the response is closed as soon as
+        every section a record is built from has been received. Pages are
+        read in full while an archive is recording.
+        
+        Failed requests are retried as ``retry_policy`` (a ``RetryPolicy``)
+        decides from their status. URLs that still fail are added to
+        ``dead_letters``, a ``DeadLetterQueue``, when one is given.
+        """
+        self.base_url = base_url.rstrip('/')
         self.max_concurrent = max_concurrent
         self.delay = delay
+        if requests_per_second is None and delay:
+            requests_per_second = max_concurrent / delay
+        self.rate_limiter = TokenBucket(requests_per_second) if requests_per_second else None
+        self.concurrency = AdaptiveConcurrency(
+            initial=max(1, max_concurrent // 2),
+            maximum=max_concurrent
+        )
+        self.job_store = job_store
+        self.archive = archive
+        self.skipped_known = 0
+        self._reused_urls = set()
+        self._probed_pages = {}
+        self.parser = get_engine(parser)
+        self.parse_workers = parse_workers
+        self.parse_pool = None
+        self._parse_slots = asyncio.Semaphore(parse_queue_size or parse_workers * 2 or 1)
+        self.writers = list(writers or [])
+        self.keep_in_memory = keep_in_memory
+        self.checkpoint = checkpoint
+        self.metrics = metrics or CrawlMetrics()
+        self.dedup = dedup
+        self.titles = titles
+        self.stream_details = stream_details
+        self.stream_chunk_size = stream_chunk_size
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.dead_letters = dead_letters
         self.session = None
         self.scraped_data = []
+        self.records_scraped = 0
+        self.job_urls_found = 0
         
     async def __aenter__(self):
         connector = aiohttp.TCPConnector(limit=100, limit_per_host=30)
@@ -30,207 +116,354 @@ class VipKadrScraper:
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
             }
         )
+        if self.parse_workers > 0:
+            self.parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers)
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         if self.session:
             await self.session.close()
+        if self.parse_pool:
+            self.parse_pool.shutdown(cancel_futures=True)
+            self.parse_pool = None
     
-    async def fetch_page(self, url: str, retries=3) -> Optional[str]:
-        """Fetch a single page with retry logic"""
+    async def _read_detail_sections(self, response) -> Tuple[str, int]:
+        """Read a detail page until all of its record's sections have arrived
+
+        Returns the text read so far and its size in bytes; the connection
+        is closed early when the rest of the page is not needed.
+        """
+        decoder = codecs.getincrementaldecoder(response.charset or 'utf-8')(errors='replace')
+        watcher = DetailSectionWatcher()
+        parts = []
+        size = 0
+        async for chunk in response.content.iter_chunked(self.stream_chunk_size):
+            size += len(chunk)
+            text = decoder.decode(chunk)
+            parts.append(text)
+            if watcher.feed(text):
+                self.metrics.early_aborts += 1
+                response.close()
+                return ''.join(parts), size
+        
+        parts.append(decoder.decode(b'', final=True))
+        return ''.join(parts), size
+    
+    async def _fetch(self, url: str, retries=None, headers: Optional[Dict] = None,
+                     stream: bool = False) -> Tuple[Optional[int], Optional[str], Dict]:
+        """Fetch a URL with retry logic, returning (status, content, response headers)
+
+        Failures are retried according to ``retry_policy``: throttled
+        responses wait for their Retry-After, transient ones back off with
+        jitter and permanent ones are not retried. A URL that fails for
+        good goes to the dead-letter queue.
+
+        With ``stream`` the body is read only up to the end of the last
+        detail page section (see ``_read_detail_sections``).
+        """
+        kind = 'listing' if '/cv-bazasi/' in url else 'detail'
+        metrics = self.metrics
+        policy = self.retry_policy
+        # At least one attempt, so a failure always has an outcome to queue
+        retries = max(1, retries or policy.retries)
+        
+        if self.archive is not None and self.archive.replay:
+            content = self.archive.get(url)
+            status = 200 if content is not None else 404
+            metrics.observe_request(kind, status, 0.0, len(content or ''))
+            return status, content, {}
+        
+        status = None
+        error = None
+        outcome = None
         for attempt in range(retries):
+            if attempt:
+                metrics.retries += 1
+            waited = time.monotonic()
+            if self.rate_limiter:
+                await self.rate_limiter.acquire()
+                metrics.observe_wait('rate_limit', time.monotonic() - waited)
+                waited = time.monotonic()
+            await self.concurrency.acquire()
+            metrics.observe_wait('concurrency', time.monotonic() - waited)
+            
+            metrics.in_flight += 1
+            started = time.monotonic()
+            status = None
+            size = 0
+            outcome = None
+            retry_after = None
             try:
-                async with self.session.get(url) as response:
-                    if response.status == 200:
-                        content = await response.text()
-                        pass
-                        return content
+                async with self.session.get(url, headers=headers) as response:
+                    status = response.status
+                    if response.status in (200, 304):
+                        content = None
+                        if response.status == 200 and stream:
+                            content, size = await self._read_detail_sections(response)
+                        elif response.status == 200:
+                            body = await response.read()
+                            size = len(body)
+                            content = body.decode(response.get_encoding())
+                            if self.archive is not None:
+                                self.archive.put(url, content)
+                        if self.dead_letters is not None and url in self.dead_letters:
+                            self.dead_letters.remove(url)
+                        return status, content, dict(response.headers)
                     else:
-                        logger.warning(f"HTTP {response.status} for {url}")
+                        outcome = policy.classify(response.status)
+                        error = f"HTTP {response.status}"
+                        logger.warning(f"HTTP {response.status} for {url} ({outcome})")
+                        if outcome == THROTTLED:
+                            retry_after = parse_retry_after(response.headers.get('Retry-After'))
                         
             except Exception as e:
+                outcome = RETRYABLE
+                error = f"{type(e).__name__}: {e}"
                 logger.error(f"Error fetching {url} (attempt {attempt + 1}): {e}")
-                if attempt < retries - 1:
-                    await asyncio.sleep(2 ** attempt)  # Exponential backoff
-                    
-        return None
+            finally:
+                latency = time.monotonic() - started
+                metrics.in_flight -= 1
+                metrics.observe_request(kind, status, latency, size)
+                # Only throttling and server/connection failures count against the server's health
+                await self.concurrency.release(latency, outcome in (THROTTLED, RETRYABLE))
+                metrics.concurrency_limit = self.concurrency.limit
+            
+            if attempt == retries - 1:
+                break
+            delay = policy.delay(outcome, attempt, retry_after)
+            if delay is None:
+                break
+            # Wait outside the concurrency slot; Retry-After holds back every worker
+            if outcome == THROTTLED and retry_after is not None and self.rate_limiter:
+                self.rate_limiter.pause(delay)
+            else:
+                await asyncio.sleep(delay)
+        
+        metrics.dead_letters += 1
+        if self.dead_letters is not None:
+            self.dead_letters.add(url, kind, outcome, status, error, attempt + 1)
+        return status, None, {}
+    
+    async def fetch_page(self, url: str, retries=None) -> Optional[str]:
+        """Fetch a single page with retry logic"""
+        _, content, _ = await self._fetch(url, retries)
+        return content
     
     def extract_job_urls_from_listing(self, html_content: str) -> List[str]:
         """Extract job URLs from a listing page"""
-        soup = BeautifulSoup(html_content, 'html.parser')
-        job_urls = []
-        
-        # Find all job listing items
-        job_items = soup.find_all('div', class_='ty-column5')
-        
-        for item in job_items:
-            onclick_attr = item.get('onclick', '')
-            if 'window.open(' in onclick_attr:
-                # Extract URL from onclick="window.open('URL')"
-                url_match = re.search(r"window\.open\('([^']+)'\)", onclick_attr)
-                if url_match:
-                    relative_url = url_match.group(1)
-                    full_url = urljoin(self.base_url, relative_url)
-                    job_urls.append(full_url)
-        
-        return job_urls
+        return self.parser.job_urls(html_content, self.base_url)
     
     def extract_job_details(self, html_content: str, job_url: str) -> Dict:
         """Extract detailed job information from individual job page"""
+        return self.parser.job_details(html_content, job_url)
+    
+    async def _run_parser(self, kind: str, func, *args):
+        """Run a parse function in the process pool, or inline without one
+
+        At most ``parse_queue_size`` pages wait for the pool at a time; once
+        that many are pending, fetch workers block here until one finishes.
+        """
+        if self.parse_pool is None:
+            started = time.monotonic()
+            result = func(*args)
+            self.metrics.observe_parse(kind, time.monotonic() - started)
+            return result
+        
+        waited = time.monotonic()
+        async with self._parse_slots:
+            self.metrics.observe_wait('parse_queue', time.monotonic() - waited)
+            started = time.monotonic()
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.parse_pool, func, *args)
+            self.metrics.observe_parse(kind, time.monotonic() - started)
+            return result
+    
+    async def _parse_listing(self, html_content: str) -> List[str]:
+        return await self._run_parser('listing', self.parser.job_urls, html_content, self.base_url)
+    
+    async def _parse_detail(self, html_content: str, job_url: str) -> Dict:
+        return await self._run_parser('detail', self.parser.job_details, html_content, job_url)
+    
+    def _reuse(self, record: Dict) -> Dict:
+        """Mark a record taken from the job store, so fresh_only writers skip it"""
+        self._reused_urls.add(record['url'])
+        return record
+    
+    def emit(self, record: Dict):
+        """Hand a finished record to the writers and, if enabled, scraped_data"""
+        reused = record['url'] in self._reused_urls
+        self._reused_urls.discard(record['url'])
+        self.records_scraped += 1
+        self.metrics.records += 1
+        if self.dedup is not None:
+            self.dedup.annotate(record)
+        if self.titles is not None:
+            self.titles.annotate(record)
+        for writer in self.writers:
+            if reused and getattr(writer, 'fresh_only', False):
+                continue
+            writer.write(record)
+        if self.keep_in_memory:
+            self.scraped_data.append(record)
+    
+    def flush_writers(self):
+        """Flush every writer that buffers records, and the duplicate index"""
+        for writer in self.writers:
+            flush = getattr(writer, 'flush', None)
+            if flush:
+                flush()
+        if self.dedup is not None:
+            self.dedup.flush()
+    
+    def extract_last_page(self, html_content: str) -> Optional[int]:
+        """Extract the last page number from the listing pagination, if present"""
         soup = BeautifulSoup(html_content, 'html.parser')
-        
-        job_data = {
-            'url': job_url,
-            'title': '',
-            'salary': '',
-            'company': '',
-            'contact_person': '',
-            'phone': '',
-            'email': '',
-            'city': '',
-            'work_type': '',
-            'experience': '',
-            'education': '',
-            'gender': '',
-            'age': '',
-            'description': '',
-            'requirements': '',
-            'added_date': '',
-            'end_date': '',
-            'job_id': '',
-            'views': ''
-        }
-        
-        try:
-            # Extract title
-            title_elem = soup.find('h3', class_='fpname')
-            if title_elem:
-                job_data['title'] = title_elem.get_text(strip=True)
-            
-            # Extract job ID and views
-            view_count_elem = soup.find('div', class_='view_count')
-            if view_count_elem:
-                view_text = view_count_elem.get_text()
-                job_id_match = re.search(r'#(\d+)', view_text)
-                if job_id_match:
-                    job_data['job_id'] = job_id_match.group(1)
-                
-                views_match = re.search(r'Baxış.*?(\d+)', view_text)
-                if views_match:
-                    job_data['views'] = views_match.group(1)
-            
-            # Extract company
-            company_elem = soup.find('div', class_='view_count', style='margin-top: 10px')
-            if company_elem:
-                company_text = company_elem.get_text()
-                if 'Şirkət' in company_text:
-                    job_data['company'] = company_text.replace('Şirkət :', '').strip()
-            
-            # Extract product features (salary, contact info, etc.)
-            feature_divs = soup.find_all('div', class_='ty-product-feature')
-            for feature in feature_divs:
-                label_elem = feature.find('span', class_='ty-product-feature__label')
-                value_elem = feature.find('div', class_='ty-product-feature__value')
-                
-                if label_elem and value_elem:
-                    label = label_elem.get_text(strip=True)
-                    value = value_elem.get_text(strip=True)
-                    
-                    if 'Maaş' in label:
-                        job_data['salary'] = value
-                    elif 'Əlaqədar şəxs' in label:
-                        job_data['contact_person'] = value
-                    elif 'Telefon' in label:
-                        # Extract phone from link
-                        phone_link = value_elem.find('a')
-                        if phone_link:
-                            job_data['phone'] = phone_link.get_text(strip=True)
-                        else:
-                            job_data['phone'] = value
-                    elif 'Email' in label:
-                        # Extract email from link
-                        email_link = value_elem.find('a')
-                        if email_link:
-                            href = email_link.get('href', '')
-                            if href.startswith('mailto:'):
-                                job_data['email'] = href.replace('mailto:', '').split('?')[0]
-                        else:
-                            job_data['email'] = value
-                    elif 'Əlavə olunma tarixi' in label:
-                        job_data['added_date'] = value
-                    elif 'Bitmə tarixi' in label:
-                        job_data['end_date'] = value
-                    elif 'İş vaxtı' in label:
-                        job_data['work_type'] = value
-                    elif 'Şəhər' in label:
-                        job_data['city'] = value
-                    elif 'İş təcrübəsi' in label:
-                        job_data['experience'] = value
-                    elif 'Cins' in label:
-                        job_data['gender'] = value
-                    elif 'Yaş' in label:
-                        job_data['age'] = value
-            
-            # Extract description
-            desc_elem = soup.find('div', class_='descriptions')
-            if desc_elem:
-                # Get first div content (job description)
-                first_div = desc_elem.find('div')
-                if first_div:
-                    job_data['description'] = first_div.get_text(strip=True).replace('<br>', '\n')
+        pagination = soup.find(class_=re.compile(r'ty-pagination')) or soup
+        
+        page_numbers = []
+        for link in pagination.find_all('a'):
+            page_attr = link.get('data-ca-page', '')
+            if page_attr.isdigit():
+                page_numbers.append(int(page_attr))
+                continue
             
-            # Extract requirements (from "Tələblər" section)
-            req_section = None
-            h3_elements = soup.find_all('h3')
-            for h3 in h3_elements:
-                if 'Tələblər' in h3.get_text():
-                    req_section = h3.find_next_sibling('div')
-                    break
-            
-            if req_section:
-                job_data['requirements'] = req_section.get_text(strip=True).replace('<br>', '\n')
+            href = link.get('href', '')
+            if 'cv-bazasi' in href:
+                page_match = re.search(r'[?&]page=(\d+)', href)
+                if page_match:
+                    page_numbers.append(int(page_match.group(1)))
         
-        except Exception as e:
-            logger.error(f"Error parsing job details for {job_url}: {e}")
-        
-        return job_data
+        return max(page_numbers) if page_numbers else None
     
-    async def scrape_listing_page(self, page_num: int) -> List[str]:
-        """Scrape a single listing page and return job URLs"""
+    async def _fetch_listing_page(self, page_num: int) -> Tuple[Optional[str], List[str]]:
+        """Fetch a listing page, returning its HTML and job URLs
+
+        The HTML is None when the page could not be fetched, which is not
+        the same as a page without jobs.
+        """
         url = f"{self.base_url}/cv-bazasi/?page={page_num}"
         
         html_content = await self.fetch_page(url)
         if not html_content:
-            return []
+            return None, []
         
-        job_urls = self.extract_job_urls_from_listing(html_content)
-        pass
+        return html_content, await self._parse_listing(html_content)
+    
+    async def _probe_listing_page(self, page_num: int) -> bool:
+        """Fetch a listing page during discovery and report whether it has jobs
+
+        A page that could not be fetched counts as having jobs: only a page
+        the server returned empty marks the end. Overshooting costs one
+        empty page during the crawl, stopping short loses every page after.
+        """
+        html_content, job_urls = await self._fetch_listing_page(page_num)
+        if html_content is None:
+            return True
+        # Keep the result so the crawl does not fetch this page again
+        self._probed_pages[page_num] = job_urls
+        return bool(job_urls)
+    
+    async def find_last_page(self, max_page=10000) -> int:
+        """Find the last non-empty listing page
+
+        Uses the pagination markup of the first page when available and
+        verifies it with a single probe. Otherwise gallops over ``?page=N``
+        (2, 4, 8, ...) until an empty page is hit, then binary-searches
+        the gap. Returns 0 if the first page has no jobs and raises
+        ``RuntimeError`` if it cannot be fetched at all.
+        """
+        html_content, job_urls = await self._fetch_listing_page(1)
+        if html_content is None:
+            raise RuntimeError("Could not fetch the first listing page")
+        self._probed_pages[1] = job_urls
+        if not job_urls:
+            return 0
+        
+        low = 1
+        last_page = self.extract_last_page(html_content)
+        if last_page and last_page > 1:
+            # The pagination may only show a window of pages, so check past it
+            if not await self._probe_listing_page(last_page + 1):
+                return last_page
+            low = last_page + 1
+        
+        # Gallop until an empty page brackets the end
+        step = 1
+        high = min(low + step, max_page)
+        while high > low and await self._probe_listing_page(high):
+            low = high
+            step *= 2
+            high = min(low + step, max_page)
+        if high <= low:
+            return low
+        
+        # Binary search between the last non-empty and first empty page
+        while high - low > 1:
+            mid = (low + high) // 2
+            if await self._probe_listing_page(mid):
+                low = mid
+            else:
+                high = mid
+        
+        return low
+    
+    async def scrape_listing_page(self, page_num: int) -> Optional[List[str]]:
+        """Scrape a single listing page and return job URLs, or None if it could not be fetched"""
+        if page_num in self._probed_pages:
+            return self._probed_pages.pop(page_num)
         
+        html_content, job_urls = await self._fetch_listing_page(page_num)
+        if html_content is None:
+            return None
         return job_urls
     
+    def known_record(self, job_url: str) -> Optional[Dict]:
+        """Return the stored record for a URL if it does not need fetching again"""
+        if self.job_store is None:
+            return None
+        
+        entry = self.job_store.get(job_url)
+        if entry is None or not self.job_store.is_fresh(entry):
+            return None
+        
+        self.skipped_known += 1
+        return self._reuse(entry['record'])
+    
     async def scrape_job_detail(self, job_url: str) -> Optional[Dict]:
         """Scrape detailed information from a single job page"""
-        html_content = await self.fetch_page(job_url)
+        entry = self.job_store.get(job_url) if self.job_store else None
+        headers = {}
+        if entry:
+            # Revalidate the stored copy where the server supports it
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        
+        # A recorded archive must hold whole pages
+        stream = self.stream_details and self.archive is None
+        status, html_content, response_headers = await self._fetch(job_url, headers=headers or None,
+                                                                   stream=stream)
+        if status == 304 and entry:
+            self.job_store.touch(job_url)
+            return self._reuse(entry['record'])
         if not html_content:
             return None
         
-        job_data = self.extract_job_details(html_content, job_url)
-        await asyncio.sleep(self.delay)  # Rate limiting
+        job_data = await self._parse_detail(html_content, job_url)
+        if self.job_store:
+            self.job_store.save(
+                job_data,
+                etag=response_headers.get('ETag'),
+                last_modified=response_headers.get('Last-Modified')
+            )
         
         return job_data
     
     async def scrape_all_pages(self, start_page=1, end_page=None):
         """Scrape all listing pages to get job URLs"""
         if end_page is None:
-            # First, find the last page number
-            first_page_content = await self.fetch_page(f"{self.base_url}/cv-bazasi/?page=1")
-            if first_page_content:
-                soup = BeautifulSoup(first_page_content, 'html.parser')
-                # Try to find pagination to determine last page
-                # This might need adjustment based on the actual pagination structure
-                end_page = 50  # Default fallback
-        
-        pass
+            end_page = await self.find_last_page()
         
         # Create semaphore to limit concurrent requests
         semaphore = asyncio.Semaphore(self.max_concurrent)
@@ -248,7 +481,7 @@ class VipKadrScraper:
         for urls_list in all_job_urls_lists:
             if isinstance(urls_list, list):
                 all_job_urls.extend(urls_list)
-            else:
+            elif urls_list is not None:
                 logger.error(f"Error in page scraping: {urls_list}")
         
         # Remove duplicates
@@ -259,31 +492,394 @@ class VipKadrScraper:
     
     async def scrape_all_jobs(self, job_urls: List[str]):
         """Scrape detailed information for all job URLs"""
-        pass
+        self.scraped_data = []
+        
+        # Reuse stored records that cannot have changed since the last run
+        pending_urls = []
+        for job_url in job_urls:
+            record = self.known_record(job_url)
+            if record is not None:
+                self.emit(record)
+            else:
+                pending_urls.append(job_url)
         
         # Create semaphore to limit concurrent requests
         semaphore = asyncio.Semaphore(self.max_concurrent)
         
         async def scrape_job_with_semaphore(job_url):
             async with semaphore:
-                return await self.scrape_job_detail(job_url)
+                job_data = await self.scrape_job_detail(job_url)
+            # Emit each record as soon as it completes
+            if job_data:
+                self.emit(job_data)
         
         # Scrape all job details concurrently
-        tasks = [scrape_job_with_semaphore(url) for url in job_urls]
-        job_details = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # Filter out None values and exceptions
-        valid_jobs = []
-        for job_data in job_details:
-            if isinstance(job_data, dict) and job_data:
-                valid_jobs.append(job_data)
-            elif not isinstance(job_data, dict):
-                logger.error(f"Error scraping job: {job_data}")
-        
-        self.scraped_data = valid_jobs
-        pass
+        tasks = [scrape_job_with_semaphore(url) for url in pending_urls]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Error scraping job: {result}")
+        
+        return self.scraped_data
+    
+    async def scrape_pipelined(self, start_page=1, end_page=None, queue_size=None, stop_when_known=None):
+        """Scrape listing and detail pages in one pipelined pass
+
+        Listing workers push every newly discovered job URL onto a bounded
+        queue as soon as a page is parsed, and detail workers consume it
+        immediately. All workers share one semaphore, so at most
+        ``max_concurrent`` requests are in flight across both stages.
+
+        Listing pages past the first one that is empty are not requested; a
+        page that fails to fetch is skipped without ending the crawl and is
+        not marked done in the checkpoint.
+        With ``stop_when_known`` (the default when a job store is set) the
+        same applies to the first page whose postings are all in the store;
+        every other stored posting is then taken from the store, since the
+        pages past it only list postings that are already known.
+
+        With a checkpoint, listing pages and detail URLs finished by an
+        earlier run are skipped and its unfinished frontier is fetched first.
+        """
+        checkpoint = self.checkpoint
+        if checkpoint is not None and checkpoint.end_page is not None:
+            start_page = checkpoint.start_page or start_page
+            end_page = checkpoint.end_page
+        if end_page is None:
+            end_page = await self.find_last_page()
+        if checkpoint is not None:
+            checkpoint.start_page = start_page
+            checkpoint.end_page = end_page
+        stop_when_known = self.job_store is not None and stop_when_known is not False
+        
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        queue = asyncio.Queue(maxsize=queue_size or self.max_concurrent * 2)
+        crawl_state = {'stop_page': end_page, 'stopped_early': False}
+        seen_urls = set()
+        resume_urls = []
+        self.scraped_data = []
+        if checkpoint is not None:
+            resume_urls = checkpoint.pending_urls()
+            seen_urls.update(checkpoint.completed)
+            seen_urls.update(checkpoint.frontier)
+        
+        def next_pages():
+            page_num = start_page
+            while page_num <= crawl_state['stop_page']:
+                if checkpoint is None or page_num not in checkpoint.pages_done:
+                    yield page_num
+                page_num += 1
+        
+        pages = next_pages()
+        
+        def stop_after(page_num):
+            if page_num < crawl_state['stop_page']:
+                crawl_state['stop_page'] = page_num
+                crawl_state['stopped_early'] = True
+                if checkpoint is not None:
+                    checkpoint.end_page = page_num
+        
+        def completed(job_url, ok=True):
+            if checkpoint is None:
+                return
+            if ok:
+                checkpoint.complete(job_url)
+            else:
+                checkpoint.fail(job_url)
+            checkpoint.maybe_save(self.flush_writers)
+        
+        async def resume_worker():
+            # Unfinished URLs from an interrupted run go first
+            for job_url in resume_urls:
+                await queue.put(job_url)
+        
+        async def listing_worker():
+            for page_num in pages:
+                try:
+                    waited = time.monotonic()
+                    async with semaphore:
+                        self.metrics.observe_wait('semaphore', time.monotonic() - waited)
+                        job_urls = await self.scrape_listing_page(page_num)
+                except Exception as e:
+                    logger.error(f"Error in page scraping {page_num}: {e}")
+                    continue
+                if job_urls is None:
+                    # Not done and not the end: the dead-letter queue or a resumed run retries it
+                    continue
+                
+                if not job_urls:
+                    stop_after(page_num)
+                elif stop_when_known and all(job_url in self.job_store for job_url in job_urls):
+                    stop_after(page_num)
+                
+                for job_url in job_urls:
+                    # Deduplicate as URLs arrive instead of after the fact
+                    if job_url in seen_urls:
+                        continue
+                    seen_urls.add(job_url)
+                    
+                    record = self.known_record(job_url)
+                    if record is not None:
+                        self.emit(record)
+                        completed(job_url)
+                    else:
+                        if checkpoint is not None:
+                            checkpoint.add(job_url)
+                        await queue.put(job_url)
+                        self.metrics.queue_depth = queue.qsize()
+                
+                if checkpoint is not None:
+                    checkpoint.page_done(page_num)
+        
+        async def detail_worker():
+            while True:
+                job_url = await queue.get()
+                self.metrics.queue_depth = queue.qsize()
+                try:
+                    waited = time.monotonic()
+                    async with semaphore:
+                        self.metrics.observe_wait('semaphore', time.monotonic() - waited)
+                        job_data = await self.scrape_job_detail(job_url)
+                    if job_data:
+                        self.emit(job_data)
+                    completed(job_url, ok=bool(job_data))
+                except Exception as e:
+                    logger.error(f"Error scraping job {job_url}: {e}")
+                    completed(job_url, ok=False)
+                finally:
+                    queue.task_done()
+        
+        detail_tasks = [asyncio.create_task(detail_worker()) for _ in range(self.max_concurrent)]
+        num_listing_workers = max(1, min(self.max_concurrent, end_page - start_page + 1))
+        producers = [listing_worker() for _ in range(num_listing_workers)]
+        if resume_urls:
+            producers.append(resume_worker())
+        try:
+            await asyncio.gather(*producers)
+            await queue.join()
+            
+            if crawl_state['stopped_early'] and self.job_store is not None:
+                # Pages past the stop point only hold postings we already know
+                for record in self.job_store.records():
+                    if record['url'] not in seen_urls:
+                        seen_urls.add(record['url'])
+                        self.emit(self._reuse(record))
+        finally:
+            for task in detail_tasks:
+                task.cancel()
+            await asyncio.gather(*detail_tasks, return_exceptions=True)
+            self.job_urls_found = len(seen_urls)
+            if checkpoint is not None:
+                checkpoint.save(self.flush_writers)
+        
+        return self.scraped_data
+    
+    async def scrape_scheduled(self, scheduler, budget: int, start_page=1, end_page=None):
+        """Spend at most ``budget`` requests on the most valuable pages
+
+        Listing pages are read from ``start_page`` until one is empty or
+        has no posting the ``scheduler`` (a ``RecrawlScheduler``) does not
+        know yet; pages that fail to fetch are skipped. Reads start one page
+        at a time and double, up to ``max_concurrent``, while every page
+        brings new postings, and never go past the last page the
+        pagination shows by more than one page at a time, so few requests
+        are spent on pages that turn out not to be needed. The rest of the
+        budget goes to the detail pages the scheduler ranks highest, and
+        every fetch updates its statistics. With a job store, every stored
+        posting that was not refetched is emitted too, so the output still
+        covers every posting.
+        """
+        self.scraped_data = []
+        seen_urls = set()
+        spent = 0
+        page_num = start_page
+        last_page = end_page
+        window = 1
+        while spent < budget and (end_page is None or page_num <= end_page):
+            size = min(window, budget - spent)
+            if last_page is not None:
+                # Past a pagination hint, which may show only some pages, go one page at a time
+                size = min(size, max(1, last_page - page_num + 1))
+            pages = range(page_num, page_num + size)
+            results = await asyncio.gather(*(self._fetch_listing_page(n) for n in pages),
+                                           return_exceptions=True)
+            spent += size
+            page_num += size
+            
+            new_pages = 0
+            empty_page = False
+            failed_page = False
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error(f"Error in page scraping: {result}")
+                    result = (None, [])
+                html_content, job_urls = result
+                if html_content is None:
+                    # A failed page may still hide new postings, so it does not end discovery
+                    failed_page = True
+                    continue
+                if last_page is None:
+                    last_page = self.extract_last_page(html_content)
+                empty_page = empty_page or not job_urls
+                seen_urls.update(job_urls)
+                new_pages += scheduler.add(job_urls) > 0
+            if empty_page or not (new_pages or failed_page):
+                break
+            if new_pages == size:
+                window = min(window * 2, self.max_concurrent)
+        
+        fetched = set()
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        
+        async def refresh(job_url):
+            async with semaphore:
+                job_data = await self.scrape_job_detail(job_url)
+            if job_data:
+                scheduler.observe(job_data)
+                fetched.add(job_url)
+                self.emit(job_data)
+            else:
+                scheduler.observe_failure(job_url)
+        
+        planned = scheduler.select(max(0, budget - spent))
+        seen_urls.update(planned)
+        self.job_urls_found = len(seen_urls)
+        results = await asyncio.gather(*(refresh(url) for url in planned), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Error scraping job: {result}")
+        
+        if self.job_store is not None:
+            for record in self.job_store.records():
+                if record['url'] not in fetched:
+                    self.emit(self._reuse(record))
+        
+        return self.scraped_data
+    
+    async def drain_dead_letters(self, include_permanent=False, max_drains=None, skip_urls=()) -> int:
+        """Retry the URLs in the dead-letter queue and emit what they yield
+
+        Detail URLs are scraped again; listing pages are read and their
+        postings not in ``skip_urls`` are scraped. A recovered URL leaves
+        the queue, one that fails again stays in it with its drain count
+        increased. Permanent failures are skipped unless
+        ``include_permanent``. Returns the number of recovered URLs.
+        """
+        dead_letters = self.dead_letters
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        skip_urls = set(skip_urls)
+        recovered = 0
+        
+        async def scrape_job(job_url):
+            async with semaphore:
+                job_data = await self.scrape_job_detail(job_url)
+            if job_data:
+                self.emit(job_data)
+            return job_data is not None
+        
+        async def retry(entry):
+            nonlocal recovered
+            url = entry['url']
+            if entry['kind'] == 'listing':
+                async with semaphore:
+                    html_content = await self.fetch_page(url)
+                ok = html_content is not None
+                if ok:
+                    job_urls = [job_url for job_url in await self._parse_listing(html_content)
+                                if job_url not in skip_urls]
+                    skip_urls.update(job_urls)
+                    await asyncio.gather(*(scrape_job(job_url) for job_url in job_urls))
+            elif url in skip_urls:
+                # A later crawl already saved it
+                ok = True
+            else:
+                skip_urls.add(url)
+                ok = await scrape_job(url)
+            
+            if ok:
+                dead_letters.remove(url)
+                recovered += 1
+            else:
+                dead_letters.drained(url)
         
-        return valid_jobs
+        entries = dead_letters.entries(include_permanent=include_permanent, max_drains=max_drains)
+        results = await asyncio.gather(*(retry(entry) for entry in entries), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Error draining dead letter: {result}")
+        
+        self.flush_writers()
+        return recovered
+    
+    async def scrape_frontier(self, frontier, worker_id: str, batch_size: int = 20,
+                              poll_interval: float = 2.0) -> int:
+        """Crawl tasks claimed from a shared frontier until it is finished
+
+        ``frontier`` is a ``frontier.SharedFrontier`` that several workers
+        use at once. Listing tasks add the detail URLs they find to it;
+        detail tasks store their record there and hand it to the writers.
+        Leases on the current batch are renewed while it runs, and failed
+        tasks are given back for another worker to retry. Returns the
+        number of tasks this worker completed.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        held = set()
+        done = 0
+        
+        async def renew_leases():
+            while True:
+                await asyncio.sleep(frontier.lease_seconds / 3)
+                frontier.extend(list(held), worker_id)
+        
+        async def run_task(url, kind):
+            nonlocal done
+            try:
+                if kind == 'listing':
+                    async with semaphore:
+                        html_content = await self.fetch_page(url)
+                    if html_content is None:
+                        frontier.fail(url, worker_id)
+                        return
+                    job_urls = await self._parse_listing(html_content)
+                    self.job_urls_found += frontier.add(job_urls)
+                    frontier.complete(url, worker_id)
+                else:
+                    job_data = self.known_record(url)
+                    if job_data is None:
+                        async with semaphore:
+                            job_data = await self.scrape_job_detail(url)
+                    if job_data is None:
+                        frontier.fail(url, worker_id)
+                        return
+                    self.emit(job_data)
+                    frontier.complete(url, worker_id, job_data)
+                done += 1
+            except Exception as e:
+                logger.error(f"Error in frontier task {url}: {e}")
+                frontier.fail(url, worker_id)
+            finally:
+                held.discard(url)
+        
+        renewer = asyncio.create_task(renew_leases())
+        try:
+            while True:
+                tasks = frontier.claim(worker_id, batch_size)
+                if not tasks:
+                    if frontier.finished():
+                        break
+                    # Other workers hold the remaining leases
+                    await asyncio.sleep(poll_interval)
+                    continue
+                
+                held.update(url for url, _ in tasks)
+                await asyncio.gather(*(run_task(url, kind) for url, kind in tasks))
+                self.flush_writers()
+        finally:
+            renewer.cancel()
+            await asyncio.gather(renewer, return_exceptions=True)
+        
+        return done
     
     def save_to_csv(self, filename: str = "vipkadr_jobs.csv"):
         """Save scraped data to CSV file"""
@@ -291,15 +887,8 @@ class VipKadrScraper:
             logger.warning("No data to save")
             return
         
-        fieldnames = [
-            'job_id', 'title', 'company', 'salary', 'city', 'work_type',
-            'experience', 'education', 'gender', 'age', 'contact_person',
-            'phone', 'email', 'description', 'requirements', 'added_date',
-            'end_date', 'views', 'url'
-        ]
-        
         with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES, extrasaction='ignore')
             writer.writeheader()
             writer.writerows(self.scraped_data)
         
@@ -315,6 +904,16 @@ class VipKadrScraper:
             json.dump(self.scraped_data, jsonfile, ensure_ascii=False, indent=2)
         
         pass
+    
+    def save_to_parquet(self, filename: str = "vipkadr_jobs.parquet"):
+        """Save scraped data to a typed Parquet file (requires pyarrow)"""
+        if not self.scraped_data:
+            logger.warning("No data to save")
+            return
+        
+        with ParquetStreamWriter(filename) as writer:
+            for record in self.scraped_data:
+                writer.write(record)
 
 
 async def main():
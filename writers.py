@@ -0,0 +1,239 @@
+"""
+Streaming, crash-safe output writers for scraped job records
+"""
+
+import csv
+import json
+import os
+import shutil
+from typing import Dict, Iterator, List
+
+from normalize import typed_record
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional
+    pa = pq = None
+
+# Output files of a full crawl
+CSV_FILE = "vipkadr_candidates.csv"
+NDJSON_FILE = "vipkadr_candidates.ndjson"
+JSON_FILE = "vipkadr_candidates.json"
+PARQUET_FILE = "vipkadr_candidates.parquet"
+
+FIELDNAMES = [
+    'job_id', 'title', 'company', 'salary', 'city', 'work_type',
+    'experience', 'education', 'gender', 'age', 'contact_person',
+    'phone', 'email', 'description', 'requirements', 'added_date',
+    'end_date', 'views', 'url', 'duplicate_of', 'title_canonical'
+]
+
+
+class StreamWriter:
+    """Base class for writers that append records as they are scraped
+
+    Records are buffered and written in batches of ``batch_size`` to
+    ``<filename>.part``, which is flushed and fsynced after every batch.
+    ``close()`` writes what is left and atomically renames the part file
+    over ``filename``, so readers never see a half-written file and a crash
+    loses at most the current batch.
+
+    With ``append=True`` the writer continues an earlier run: it picks up
+    the part file a crash left behind, or else the finished file.
+    """
+    
+    def __init__(self, filename: str, batch_size: int = 50, append: bool = False):
+        self.filename = filename
+        self.part_filename = filename + '.part'
+        self.batch_size = batch_size
+        self.count = 0
+        self._buffer: List[Dict] = []
+        
+        if append and not os.path.exists(self.part_filename) and os.path.exists(filename):
+            shutil.copyfile(filename, self.part_filename)
+        self._file = open(self.part_filename, 'a' if append else 'w', newline='', encoding='utf-8')
+        self._start(new_file=self._file.tell() == 0)
+    
+    def _start(self, new_file: bool):
+        """Prepare the file, writing any header the format needs"""
+    
+    def _write_batch(self, records: List[Dict]):
+        raise NotImplementedError
+    
+    def write(self, record: Dict):
+        self._buffer.append(record)
+        self.count += 1
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+    
+    def flush(self):
+        if self._buffer:
+            self._write_batch(self._buffer)
+            self._buffer = []
+        self._sync()
+    
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+    
+    def close(self):
+        """Write remaining records and move the file into place"""
+        if self._file is None:
+            return
+        self.flush()
+        self._file.close()
+        self._file = None
+        os.replace(self.part_filename, self.filename)
+    
+    def discard(self):
+        """Drop everything written so far and leave ``filename`` untouched"""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        os.remove(self.part_filename)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class CSVStreamWriter(StreamWriter):
+    """Streams records to a CSV file with the standard column order"""
+    
+    def __init__(self, filename: str, batch_size: int = 50, append: bool = False,
+                 fieldnames: List[str] = None):
+        self.fieldnames = fieldnames or FIELDNAMES
+        super().__init__(filename, batch_size, append)
+    
+    def _start(self, new_file: bool):
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, extrasaction='ignore')
+        if new_file:
+            self._writer.writeheader()
+    
+    def _write_batch(self, records: List[Dict]):
+        self._writer.writerows(records)
+
+
+class NDJSONStreamWriter(StreamWriter):
+    """Streams records to a newline-delimited JSON file, one object per line"""
+    
+    def _start(self, new_file: bool):
+        if new_file:
+            return
+        # Drop a line cut short by a crash before appending after it
+        with open(self.part_filename, 'rb') as f:
+            data = f.read()
+        complete = data.rfind(b'\n') + 1
+        if complete < len(data):
+            self._file.truncate(complete)
+    
+    def _write_batch(self, records: List[Dict]):
+        self._file.write(''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records))
+
+
+class ParquetStreamWriter(StreamWriter):
+    """Streams records to a typed, columnar Parquet file
+
+    Every batch becomes a row group. Numbers, salary ranges and dates are
+    stored with real types (see ``normalize.typed_record``) and the
+    low-cardinality columns are dictionary-encoded, so analytics can read
+    just the columns they need. Parquet keeps its index in a footer, so the
+    part file is only readable once ``close()`` has run; appending to an
+    earlier run is not supported.
+    """
+    
+    def __init__(self, filename: str, batch_size: int = 500, append: bool = False):
+        if pa is None:
+            raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)")
+        if append:
+            raise ValueError("Parquet files cannot be appended to")
+        self.filename = filename
+        self.part_filename = filename + '.part'
+        self.batch_size = batch_size
+        self.count = 0
+        self._buffer: List[Dict] = []
+        self.schema = parquet_schema()
+        self._file = pq.ParquetWriter(self.part_filename, self.schema, compression='zstd')
+    
+    def _write_batch(self, records: List[Dict]):
+        rows = [typed_record(record) for record in records]
+        self._file.write_table(pa.Table.from_pylist(rows, schema=self.schema))
+    
+    def _sync(self):
+        """Row groups are written as they fill; the footer is written on close"""
+
+
+def parquet_schema():
+    """Arrow schema for typed job records"""
+    category = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('job_id', pa.int64()),
+        ('title', pa.string()),
+        ('title_canonical', pa.string()),
+        ('company', pa.string()),
+        ('salary', pa.string()),
+        ('salary_min', pa.float64()),
+        ('salary_max', pa.float64()),
+        ('salary_mid', pa.float64()),
+        ('salary_currency', category),
+        ('salary_negotiable', pa.bool_()),
+        ('city', category),
+        ('work_type', category),
+        ('experience', category),
+        ('education', category),
+        ('gender', category),
+        ('age', pa.string()),
+        ('age_min', pa.int16()),
+        ('age_max', pa.int16()),
+        ('contact_person', pa.string()),
+        ('phone', pa.string()),
+        ('email', pa.string()),
+        ('description', pa.string()),
+        ('requirements', pa.string()),
+        ('added_date', pa.date32()),
+        ('end_date', pa.date32()),
+        ('views', pa.int32()),
+        ('url', pa.string()),
+        ('duplicate_of', pa.string()),
+    ])
+
+
+def read_ndjson(filename: str) -> Iterator[Dict]:
+    """Yield records from an NDJSON file, skipping a truncated last line"""
+    with open(filename, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def ndjson_to_json(ndjson_filename: str, json_filename: str):
+    """Convert an NDJSON file into an indented JSON array, one record at a time
+
+    The output matches ``json.dump(records, f, ensure_ascii=False, indent=2)``
+    without holding all records in memory.
+    """
+    part_filename = json_filename + '.part'
+    with open(part_filename, 'w', encoding='utf-8') as dst:
+        first = True
+        for record in read_ndjson(ndjson_filename):
+            body = json.dumps(record, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+            dst.write(('[\n  ' if first else ',\n  ') + body)
+            first = False
+        dst.write('[]' if first else '\n]')
+    
+    os.replace(part_filename, json_filename)
+
+
+def ndjson_to_parquet(ndjson_filename: str, parquet_filename: str):
+    """Build the typed Parquet output from a finished NDJSON file (requires pyarrow)"""
+    with ParquetStreamWriter(parquet_filename) as writer:
+        for record in read_ndjson(ndjson_filename):
+            writer.write(record)